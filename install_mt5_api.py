@@ -4,6 +4,39 @@ MetaTrader 5 Python API インストールスクリプト
 import subprocess
 import sys
 import os
+import time
+
+# プロジェクトの依存パッケージ一覧（MetaTrader5はwheel提供バージョンに固定）
+REQUIREMENTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "requirements.txt")
+
+def _pip_install(*args, attempts=3):
+    """
+    pipでパッケージをインストール（ネットワークエラー対策のリトライ付き）
+    
+    Args:
+        *args: pip installに渡す引数（パッケージ名やオプション）
+        attempts: 最大試行回数
+    
+    Returns:
+        bool: インストールに成功した場合True
+    """
+    for attempt in range(attempts):
+        if attempt > 0:
+            time.sleep(2 ** attempt)  # 指数バックオフ
+            print(f"  再試行中... ({attempt + 1}/{attempts})")
+        
+        result = subprocess.run(
+            [sys.executable, "-m", "pip", "install",
+             "--timeout", "1800", "--retries", "10", "--no-cache-dir", *args],
+            capture_output=True,
+            text=True
+        )
+        if result.returncode == 0:
+            return True
+        
+        print(result.stderr)
+    
+    return False
 
 def install_mt5_api():
     """MT5のPython APIをインストール"""
@@ -11,20 +44,25 @@ def install_mt5_api():
     print("MetaTrader 5 Python API インストール")
     print("=" * 60)
     
+    # 方法0: requirements.txtからビルド済みwheelのみでインストール
+    print("\n方法0: requirements.txtからwheelでインストールを試します...")
+    try:
+        if _pip_install("-r", REQUIREMENTS_FILE, "--only-binary=:all:"):
+            print("✓ 依存パッケージ（MetaTrader5を含む）が正常にインストールされました")
+            return True
+        else:
+            print("✗ wheelでのインストールに失敗しました")
+    except Exception as e:
+        print(f"エラー: {e}")
+    
     # 方法1: pipでインストールを試す
     print("\n方法1: pipでインストールを試します...")
     try:
-        result = subprocess.run(
-            [sys.executable, "-m", "pip", "install", "MetaTrader5"],
-            capture_output=True,
-            text=True
-        )
-        if result.returncode == 0:
+        if _pip_install("MetaTrader5"):
             print("✓ MetaTrader5が正常にインストールされました")
             return True
         else:
             print("✗ pipでのインストールに失敗しました")
-            print(result.stderr)
     except Exception as e:
         print(f"エラー: {e}")
     
@@ -33,12 +71,7 @@ def install_mt5_api():
     alternative_names = ["meta-trader5", "metatrader5", "mt5"]
     for name in alternative_names:
         try:
-            result = subprocess.run(
-                [sys.executable, "-m", "pip", "install", name],
-                capture_output=True,
-                text=True
-            )
-            if result.returncode == 0:
+            if _pip_install(name):
                 print(f"✓ {name}が正常にインストールされました")
                 return True
         except Exception as e:
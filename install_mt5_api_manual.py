@@ -1,11 +1,50 @@
 """
 MT5 Python API 手動インストールスクリプト
 MT5のDLLを直接読み込む方法を試します
+非推奨: 通常は install_mt5_api.py（requirements.txtのwheelからインストール）を使用してください
 """
 import os
 import sys
+import json
 import ctypes
 
+# 検出済みパスのキャッシュファイル
+PATH_CACHE_FILE = os.path.expanduser(os.path.join("~", ".mt5_paths.json"))
+
+def cached_probe(key, candidates):
+    """
+    候補パスを順に確認し、最初に存在したパスをキャッシュして返す
+    
+    Args:
+        key: キャッシュのキー（例: "mt5_dir", "mt5_dll"）
+        candidates: 候補パスのイテラブル
+    
+    Returns:
+        str: 見つかったパス、見つからない場合はNone
+    """
+    cache = {}
+    try:
+        with open(PATH_CACHE_FILE, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        pass
+    
+    cached_path = cache.get(key)
+    if cached_path and os.path.exists(cached_path):
+        return cached_path
+    
+    for path in candidates:
+        if os.path.exists(path):
+            cache[key] = path
+            try:
+                with open(PATH_CACHE_FILE, 'w', encoding='utf-8') as f:
+                    json.dump(cache, f, ensure_ascii=False, indent=2)
+            except OSError:
+                pass  # キャッシュの保存に失敗しても検出結果は返す
+            return path
+    
+    return None
+
 def find_mt5_dll():
     """MT5のDLLファイルを検索"""
     possible_paths = [
@@ -21,14 +60,29 @@ def find_mt5_dll():
         "mt5.dll",
     ]
     
-    for mt5_path in possible_paths:
-        if os.path.exists(mt5_path):
-            for dll_name in dll_names:
-                dll_path = os.path.join(mt5_path, dll_name)
-                if os.path.exists(dll_path):
-                    return dll_path
+    return cached_probe("mt5_dll", _scan_dlls(possible_paths, dll_names))
+
+def _scan_dlls(possible_paths, dll_names):
+    """
+    各ディレクトリを1回だけ読み込み、DLL名を大文字小文字を区別せずに照合する
     
-    return None
+    Args:
+        possible_paths: 検索するディレクトリのリスト
+        dll_names: DLLファイル名のリスト
+    
+    Yields:
+        str: 見つかったDLLのパス
+    """
+    for mt5_path in possible_paths:
+        try:
+            entries = {entry.name.lower(): entry.path for entry in os.scandir(mt5_path)}
+        except OSError:
+            continue
+        
+        for dll_name in dll_names:
+            hit = entries.get(dll_name.lower())
+            if hit:
+                yield hit
 
 def install_mt5_api_from_source():
     """MT5のPython APIをソースからインストール"""
@@ -65,7 +119,10 @@ def install_mt5_api_from_source():
     return False
 
 if __name__ == "__main__":
-    install_mt5_api_from_source()
+    from install_mt5_api import install_mt5_api
+    # まずwheelからのインストールを試し、失敗した場合のみ手動の方法を案内する
+    if not install_mt5_api():
+        install_mt5_api_from_source()
 
 
 
@@ -3,20 +3,90 @@
 """
 import sys
 import os
-from src.engine.mt5_connector import MT5Connector
-from src.engine.executor import TradeExecutor
-from src.strategies.bollinger import BollingerStrategy
-from src.strategies.donchian import DonchianStrategy
+import queue
+import signal
+import logging
+import logging.handlers
+import threading
 
-try:
-    import MetaTrader5 as mt5
-except ImportError:
-    print("エラー: MetaTrader5モジュールが見つかりません。")
-    print("\nMetaTrader 5のPython APIをインストールするには:")
-    print("1. MetaTrader 5をインストールしてください")
-    print("2. MT5のインストールディレクトリからPython APIを利用できます")
-    print("3. または、MT5のPython APIパッケージをインストールしてください")
-    sys.exit(1)
+logger = logging.getLogger(__name__)
+
+
+def setup_logging():
+    """
+    ログ出力を設定
+    出力はバックグラウンドスレッド（QueueListener）で行い、トレード処理のスレッドをブロックしない
+    
+    Returns:
+        logging.handlers.QueueListener: 終了時にstop()するリスナー
+    """
+    log_queue = queue.SimpleQueue()
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(logging.Formatter('%(message)s'))
+    listener = logging.handlers.QueueListener(log_queue, console_handler)
+    
+    root_logger = logging.getLogger()
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    # LOG_LEVEL=DEBUG でスキップ理由などの詳細も表示
+    root_logger.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+    # 戦略の判定内容（バーごとのデバッグ出力）はSTRATEGY_LOG_LEVEL=DEBUGの場合のみ表示
+    logging.getLogger('src.strategies').setLevel(os.getenv('STRATEGY_LOG_LEVEL', 'WARNING').upper())
+    
+    listener.start()
+    return listener
+
+
+class ParallelExecutorAdapter:
+    """戦略ごとに専用スレッドでTradeExecutorのチェックを実行するアダプター"""
+    
+    def __init__(self, executor, strategy_timeframes, check_interval=60):
+        """
+        アダプターを初期化
+        
+        Args:
+            executor: TradeExecutorインスタンス
+            strategy_timeframes: 各戦略の時間足の辞書 {strategy_name: timeframe}
+            check_interval: チェック間隔（秒）
+        """
+        self.executor = executor
+        self.strategy_timeframes = strategy_timeframes
+        self.check_interval = check_interval
+    
+    def _run_strategy(self, strategy):
+        """1つの戦略を監視するスレッドのループ（エラー時の再試行・停止はTradeExecutor.run_loopが行う）"""
+        timeframe = self.strategy_timeframes.get(strategy.name)
+        self.executor.run_loop([strategy], timeframe, self.check_interval)
+    
+    def run(self):
+        """全戦略のスレッドを起動し、停止するまで待機（Ctrl+Cで全スレッドを停止）"""
+        self.executor.strategy_timeframes.update(self.strategy_timeframes)
+        
+        # Ctrl+Cでexecutorの停止フラグを立てる（各スレッドは待機中でもすぐに抜ける）
+        previous_handler = None
+        if threading.current_thread() is threading.main_thread():
+            previous_handler = signal.signal(signal.SIGINT, lambda *_: self.executor.stop())
+        
+        threads = [
+            threading.Thread(target=self._run_strategy, args=(strategy,), name=strategy.name, daemon=True)
+            for strategy in self.executor.strategies
+        ]
+        try:
+            for thread in threads:
+                thread.start()
+            # タイムアウト付きで待機し、メインスレッドでシグナルハンドラが実行されるようにする
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=1)
+        finally:
+            self.executor.stop()
+            # チェック中のスレッドは1回分のチェックを終えてから抜けるため、MT5の切断前に待つ
+            for thread in threads:
+                if thread.ident is not None:
+                    thread.join()
+            if previous_handler is not None:
+                signal.signal(signal.SIGINT, previous_handler)
+        
+        logger.info("戦略を停止します...")
 
 
 def main():
@@ -65,12 +135,14 @@ def main():
         # python-dotenvがない場合、.envファイルを直接読み込む
         env_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
         if os.path.exists(env_path):
-            with open(env_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith('#') and '=' in line:
-                        key, value = line.split('=', 1)
-                        os.environ[key.strip()] = value.strip()
+            # 一括で読み込んでから解析し、環境変数は1回の update で設定する
+            with open(env_path, 'rb') as f:
+                data = f.read().decode('utf-8', 'replace')
+            pairs = (
+                line.split('=', 1) for line in data.splitlines()
+                if line.strip() and not line.lstrip().startswith('#') and '=' in line
+            )
+            os.environ.update({key.strip(): value.strip() for key, value in pairs})
     
     MT5_LOGIN = os.getenv('MT5_LOGIN')
     MT5_PASSWORD = os.getenv('MT5_PASSWORD')
@@ -99,6 +171,22 @@ def main():
         print("=" * 60 + "\n")
         return
     
+    # ログイン情報の確認後にインポート（設定不備で終了する場合の起動を速くするため）
+    try:
+        import MetaTrader5 as mt5
+    except ImportError:
+        print("エラー: MetaTrader5モジュールが見つかりません。")
+        print("\nMetaTrader 5のPython APIをインストールするには:")
+        print("1. MetaTrader 5をインストールしてください")
+        print("2. MT5のインストールディレクトリからPython APIを利用できます")
+        print("3. または、MT5のPython APIパッケージをインストールしてください")
+        sys.exit(1)
+    
+    from src.engine.mt5_connector import MT5Connector
+    from src.engine.executor import TradeExecutor
+    from src.strategies.bollinger import BollingerStrategy
+    from src.strategies.donchian import DonchianStrategy
+    
     # MT5接続を初期化
     # MT5のターミナルが既に起動している場合は、Noneを渡して自動検出させる（推奨）
     # MT5のターミナルを手動で起動してログインした後、このプログラムを実行してください
@@ -117,12 +205,16 @@ def main():
     #         break
     
     # MT5接続を作成（ログイン情報を渡す）
-    mt5_connector = MT5Connector(
-        login=MT5_LOGIN,
-        password=MT5_PASSWORD,
-        server=MT5_SERVER,
-        path=mt5_path
-    )
+    try:
+        mt5_connector = MT5Connector(
+            login=MT5_LOGIN,
+            password=MT5_PASSWORD,
+            server=MT5_SERVER,
+            path=mt5_path
+        )
+    except ValueError as e:
+        print(f"\nエラー: {e}")
+        return
     
     # MT5に接続
     print("\nMT5に接続中...")
@@ -176,12 +268,19 @@ def main():
     # トレード実行エンジンを初期化（複数戦略対応）
     # 注意: 各戦略が異なるシンボルを使用する場合、symbolパラメータは最初の戦略のシンボルを使用（後方互換性のため）
     default_lot_size = 0.01  # デフォルトロットサイズ（strategy_lot_sizesで指定されていない場合に使用）
+    
+    # 戦略ごとのロットサイズを起動時に一度だけ解決し、戦略名をキーに統一する
+    resolved_lot_sizes = {
+        strategy.name: strategy_lot_sizes.get(strategy.symbol, strategy_lot_sizes.get(strategy.name, default_lot_size))
+        for strategy in strategies
+    }
+    
     executor = TradeExecutor(
         mt5_connector=mt5_connector,
         symbol=donchian_symbol,  # 後方互換性のため（実際には各戦略のシンボルが使用される）
         lot_size=default_lot_size,
         strategies=strategies,
-        strategy_lot_sizes=strategy_lot_sizes
+        strategy_lot_sizes=resolved_lot_sizes
     )
     
     # 各戦略の時間足を設定（両方とも4時間足）
@@ -207,8 +306,7 @@ def main():
     print(f"     - 決済条件: 中央線到達、または4時間足18本クローズ")
     print(f"\nロットサイズ設定:")
     for strategy in strategies:
-        strategy_lot = strategy_lot_sizes.get(strategy.symbol, strategy_lot_sizes.get(strategy.name, default_lot_size))
-        print(f"  - {strategy.name} ({strategy.symbol}): {strategy_lot}")
+        print(f"  - {strategy.name} ({strategy.symbol}): {resolved_lot_sizes[strategy.name]}")
     print("\nポジション管理:")
     print("  - 各戦略は最大1ポジションのみ保有（magic number + symbolで管理）")
     print("  - 合計最大2ポジション（両戦略同時稼働可能）")
@@ -218,17 +316,31 @@ def main():
     print("=" * 60 + "\n")
     
     try:
-        executor.run(strategy_timeframes=strategy_timeframes, check_interval=300)  # 本番用: 5分ごとにチェック
+        # 戦略ごとに別スレッドで監視（1つの戦略のMT5通信が遅延しても他の戦略を止めない）
+        parallel_executor = ParallelExecutorAdapter(
+            executor,
+            strategy_timeframes=strategy_timeframes,
+            check_interval=300  # 本番用: 5分ごとにチェック
+        )
+        # Ctrl+Cはアダプターが停止要求として処理し、全スレッドの停止後にrun()から戻る
+        parallel_executor.run()
+        print("\n\n戦略を停止しました")
     except KeyboardInterrupt:
         print("\n\n戦略を停止しました")
     finally:
+        # 書き込み待ちのトレードログを書き出す
+        executor.close()
         # MT5から切断
         mt5_connector.disconnect()
         print("プログラムを終了します")
 
 
 if __name__ == "__main__":
-    main()
+    log_listener = setup_logging()
+    try:
+        main()
+    finally:
+        log_listener.stop()
 
 
 
@@ -1,10 +1,57 @@
 """
 MT5 Python API セットアップスクリプト
 MT5のインストールディレクトリからPython APIをセットアップします
+非推奨: 通常は install_mt5_api.py（requirements.txtのwheelからインストール）を使用してください
 """
 import os
 import sys
 import shutil
+from install_mt5_api_manual import cached_probe
+
+def _link_tree(src, dst):
+    """
+    ディレクトリ構造を再作成し、各ファイルをハードリンクで配置する
+    （同一ボリューム内であればデータのコピーが発生しない）
+    
+    Args:
+        src: コピー元ディレクトリ
+        dst: コピー先ディレクトリ
+    
+    Raises:
+        OSError: ハードリンクを作成できない場合
+    """
+    for root, dirs, files in os.walk(src):
+        target_root = os.path.join(dst, os.path.relpath(root, src))
+        os.makedirs(target_root, exist_ok=True)
+        for name in files:
+            os.link(os.path.join(root, name), os.path.join(target_root, name))
+
+def _install_tree(src, dst):
+    """
+    シンボリックリンク → ハードリンク → コピーの順に配置を試す
+    
+    Args:
+        src: コピー元ディレクトリ
+        dst: コピー先ディレクトリ
+    """
+    if hasattr(os, 'symlink'):
+        try:
+            os.symlink(src, dst)
+            print(f"  [OK] シンボリックリンクを作成しました")
+            return
+        except OSError:
+            pass
+    
+    try:
+        _link_tree(src, dst)
+        print(f"  [OK] ハードリンクを作成しました")
+        return
+    except OSError:
+        # 途中まで作成したディレクトリを削除してからコピー
+        shutil.rmtree(dst, ignore_errors=True)
+    
+    shutil.copytree(src, dst)
+    print(f"  [OK] コピーを作成しました")
 
 def setup_mt5_api():
     """MT5のPython APIをセットアップ"""
@@ -19,12 +66,9 @@ def setup_mt5_api():
         os.path.expanduser(r"~\Desktop\MetaTrader 5"),
     ]
     
-    mt5_path = None
-    for path in possible_paths:
-        if os.path.exists(path):
-            mt5_path = path
-            print(f"\nMT5が見つかりました: {mt5_path}")
-            break
+    mt5_path = cached_probe("mt5_dir", possible_paths)
+    if mt5_path:
+        print(f"\nMT5が見つかりました: {mt5_path}")
     
     if not mt5_path:
         print("\n[NG] MT5のインストールディレクトリが見つかりませんでした")
@@ -53,17 +97,8 @@ def setup_mt5_api():
                     if os.path.exists(target_path):
                         print(f"  [INFO] 既に存在します: {target_path}")
                     else:
-                        # シンボリックリンクまたはコピーを作成
-                        if hasattr(os, 'symlink'):
-                            try:
-                                os.symlink(api_path, target_path)
-                                print(f"  [OK] シンボリックリンクを作成しました")
-                            except:
-                                shutil.copytree(api_path, target_path)
-                                print(f"  [OK] コピーを作成しました")
-                        else:
-                            shutil.copytree(api_path, target_path)
-                            print(f"  [OK] コピーを作成しました")
+                        # シンボリックリンク、ハードリンク、コピーの順に作成
+                        _install_tree(api_path, target_path)
                     
                     # パスに追加
                     if api_path not in sys.path:
@@ -88,7 +123,9 @@ def setup_mt5_api():
     return False
 
 if __name__ == "__main__":
-    success = setup_mt5_api()
+    from install_mt5_api import install_mt5_api
+    # まずwheelからのインストールを試し、失敗した場合のみMT5のディレクトリから設定する
+    success = install_mt5_api() or setup_mt5_api()
     if success:
         print("\n" + "=" * 60)
         print("セットアップが完了しました！")
@@ -2,11 +2,16 @@
 トレード実行エンジン
 """
 import time
+import signal
+import logging
+import threading
 from datetime import datetime
+import numpy as np
 import pandas as pd
-from .mt5_connector import MT5Connector
 from .trade_logger import TradeLogger
 from .risk_manager import RiskManager
+from .position import Position
+from ..strategies.bars import to_bars, find_entry_candle
 
 try:
     import MetaTrader5 as mt5
@@ -14,6 +19,46 @@ except ImportError:
     print("エラー: MetaTrader5モジュールが見つかりません。")
     mt5 = None
 
+logger = logging.getLogger(__name__)
+
+
+# ポーリング間隔のデフォルト値（秒）
+DEFAULT_POLL_INTERVAL = 60
+# ポーリング間隔の下限（秒）
+MIN_POLL_INTERVAL = 0.5
+# 足の確定後、データが揃うまで待つ猶予（秒）
+BAR_CLOSE_JITTER = 2.0
+# 接続エラー時の再試行間隔（秒）: 初期値から倍々に延ばし、上限で止める
+ERROR_BACKOFF_INITIAL = 1.0
+ERROR_BACKOFF_MAX = 60.0
+# 戦略が必要とする本数に上乗せして取得する本数
+RATES_SAFETY_MARGIN = 5
+# エントリーシグナルのログ書式（ログレベルで抑制された場合は整形されない）
+ENTRY_LOG_FMT = "[%s] エントリーシグナル検出: 方向=%s, エントリー価格=%.5f, 損切り=%.5f, 利確=%.5f"
+ENTRY_LOG_FMT_NO_TP = "[%s] エントリーシグナル検出: 方向=%s, エントリー価格=%.5f, 損切り=%.5f, 利確=なし（時間ベース決済）"
+
+
+def _timeframe_seconds(timeframe):
+    """
+    MT5の時間足定数を秒数に変換
+    
+    Args:
+        timeframe: MT5の時間足定数（mt5.TIMEFRAME_H4など）
+    
+    Returns:
+        int: 1本あたりの秒数
+    """
+    # MT5の時間足定数: 分足は分数そのもの、時間足は0x4000|時間数、週足は0x8000|1、月足は0xC000|1
+    unit = timeframe & 0xC000
+    value = timeframe & 0x3FFF
+    if unit == 0x4000:
+        return value * 3600
+    if unit == 0x8000:
+        return value * 7 * 86400
+    if unit == 0xC000:
+        return value * 30 * 86400
+    return value * 60
+
 
 class TradeExecutor:
     """トレードの実行を管理するクラス"""
@@ -45,15 +90,62 @@ class TradeExecutor:
         self.symbol = symbol
         self.lot_size = lot_size  # デフォルトロットサイズ（後方互換性のため）
         self.strategy_lot_sizes = strategy_lot_sizes if strategy_lot_sizes is not None else {}  # 戦略ごとのロットサイズ
-        self.positions = {}  # ポジション管理: {ticket: position_info}
+        self.positions = {}  # ポジション管理: {ticket: Position}
         self.strategy_timeframes = {}  # 各戦略の時間足を管理: {strategy_name: timeframe}
-        
-        # トレードロガーを初期化
+        self._last_entry_bar_time = {}  # エントリー判定済みの足の時刻: {strategy_name: bar_time}
+        self._positions_snapshot = {}  # MT5のポジションのスナップショット: {ticket: position}
+        self._positions_by_key = {}  # (symbol, magic)ごとのポジション: {(symbol, magic): [position, ...]}
+        self._pending_entry_candle_times = {}  # まだ検出していないポジションのエントリー時のローソク足時刻: {ticket: candle_time}
+        self._unconfirmed_order_symbols = set()  # 約定したか確認できなかった注文のシンボル（ポジションを取得できるまでエントリーしない）
+        self._inflight_orders = set()  # 送信中のエントリー注文（ロック内で枠を確保し、送信はロックの外で行う）: {(symbol, magic)}
+        self._positions_lock = threading.Lock()  # ポジション更新とエントリー枠の確保の排他制御（戦略ごとのスレッドから呼ばれるため）
+        self._stop = threading.Event()  # run_loop()のループを止めるフラグ（SIGINTまたはstop()でセット）
+        
+        # トレードロガーを初期化（書き込みはロガーのバックグラウンドスレッドで行い、売買判定をディスクI/Oで止めない）
         self.trade_logger = TradeLogger()
         
         # リスクマネージャーを初期化
         self.risk_manager = RiskManager()
         
+        # 全体の最大ポジション数（エントリー判定のたびに設定を辿らないよう事前に解決）
+        self._max_total_positions = self.risk_manager._max_total_positions
+        
+        # 戦略ごとの定数を事前に解決（毎回のhasattr/getattrを避ける）
+        self._strategy_meta = {
+            strategy.name: {
+                'symbol': getattr(strategy, 'symbol', self.symbol),
+                'magic': getattr(strategy, 'magic', None),
+                'min_required': strategy.period + 1 if hasattr(strategy, 'period') else 21,
+                'lookback': getattr(strategy, 'lookback', strategy.period + 1 if hasattr(strategy, 'period') else 50),
+                'lot_size': self._get_lot_size(strategy)
+            }
+            for strategy in self.strategies
+        }
+        
+        # 同じシンボルを使う戦略が隣り合うように並べ替え（同じレートデータを続けて使う、同じシンボル内は指定順）
+        # self.strategyは指定された最初の戦略のまま
+        self.strategies = sorted(self.strategies, key=lambda s: self._strategy_meta[s.name]['symbol'])
+        
+        # シンボルごとに取得するローソク足の本数（同じシンボルを使う戦略の最大値 + 余裕分）
+        self._rates_counts = {}
+        for meta in self._strategy_meta.values():
+            needed = max(meta['min_required'], meta['lookback']) + RATES_SAFETY_MARGIN
+            self._rates_counts[meta['symbol']] = max(self._rates_counts.get(meta['symbol'], 0), needed)
+        
+        # 前回取得したレートデータ（差分更新用）: {(symbol, timeframe): DataFrame}
+        self._bars_cache = {}
+        
+        # ポジションを追跡する対象（戦略のシンボルとmagic number）
+        self._known_symbols = {meta['symbol'] for meta in self._strategy_meta.values()} or {self.symbol}
+        self._known_magics = {meta['magic'] for meta in self._strategy_meta.values() if meta['magic'] is not None}
+        
+        # magic numberから戦略を引くための索引
+        self._strategy_by_magic = {
+            self._strategy_meta[strategy.name]['magic']: strategy
+            for strategy in self.strategies
+            if self._strategy_meta[strategy.name]['magic'] is not None
+        }
+        
         # 日初の残高を記録（日次損失計算用）
         account_info = self.mt5.get_account_info()
         self.initial_balance = account_info.balance if account_info else 0.0
@@ -64,7 +156,7 @@ class TradeExecutor:
         
         Args:
             strategy: 戦略インスタンス
-            
+        
         Returns:
             float: ロットサイズ
         """
@@ -86,27 +178,114 @@ class TradeExecutor:
         Args:
             symbol: シンボル名
             magic_number: Magic number
-            
+        
         Returns:
             bool: ポジションが存在する場合True
         """
         if mt5 is None:
             return False
         
-        positions = self.mt5.get_positions(symbol=symbol, magic=magic_number)
-        return len(positions) > 0
+        # ループ先頭で取得したスナップショットを参照（MT5への問い合わせは行わない）
+        return bool(self._positions_by_key.get((symbol, magic_number)))
+    
+    def _refresh_positions_snapshot(self):
+        """
+        MT5の全ポジションを1回の呼び出しで取得し、チケットと(symbol, magic)の索引を作成
+        
+        Returns:
+            bool: 取得できた場合True（取得できなかった場合は前回のスナップショットを残す）
+        """
+        positions = self.mt5.get_positions_snapshot()
+        if positions is None:
+            return False
+        
+        snapshot = {}
+        by_key = {}
+        for pos in positions:
+            snapshot[pos.ticket] = pos
+            by_key.setdefault((pos.symbol, pos.magic), []).append(pos)
+        
+        self._positions_snapshot = snapshot
+        self._positions_by_key = by_key
+        
+        # 実際のポジションを取得できたため、約定を確認できなかった注文もスナップショットに反映されている
+        if self._unconfirmed_order_symbols:
+            logger.info("ポジションを取得できたため、エントリーの見合わせを解除します: %s",
+                        ", ".join(sorted(self._unconfirmed_order_symbols)))
+            self._unconfirmed_order_symbols.clear()
+        return True
     
-    def run(self, timeframe=None, check_interval=60, strategy_timeframes=None):
+    def _enqueue_trade_log(self, kind, record):
+        """
+        トレードログを書き込み待ちキューに追加（書き込みはTradeLoggerのバックグラウンドスレッドで行う）
+        
+        Args:
+            kind: 'entry' または 'close'
+            record: ログの内容
+        """
+        try:
+            if kind == 'entry':
+                self.trade_logger.log_trade(record)
+            else:
+                self.trade_logger.log_close(record)
+        except Exception as e:
+            logger.warning("  警告: ログ記録に失敗しました: %s", e)
+    
+    def close(self, timeout=5.0):
+        """
+        書き込み待ちのトレードログを書き出してからバックグラウンドスレッドを停止
+        
+        Args:
+            timeout: 書き込み完了を待つ最大秒数
+        """
+        self.trade_logger.close(timeout)
+    
+    def stop(self):
+        """run()・run_loop()のループを停止（待機中でもすぐに抜ける）"""
+        self._stop.set()
+    
+    def _seconds_to_next_bar(self, timeframe):
+        """
+        次の足が確定するまでの秒数を計算
+        
+        Args:
+            timeframe: MT5の時間足定数
+        
+        Returns:
+            float: 次の足の確定（＋猶予）までの秒数
+        """
+        bar_seconds = _timeframe_seconds(timeframe)
+        return bar_seconds - (time.time() % bar_seconds) + BAR_CLOSE_JITTER
+    
+    def _poll_delay(self, timeframes, check_interval=DEFAULT_POLL_INTERVAL, min_poll_interval=MIN_POLL_INTERVAL):
+        """
+        次のチェックまでの待機秒数を計算
+        足の確定直後に起きるようにしつつ、ポジション管理のためcheck_intervalを上限とする
+        
+        Args:
+            timeframes: 監視している時間足のイテラブル
+            check_interval: チェック間隔の上限（秒）
+            min_poll_interval: チェック間隔の下限（秒）
+        
+        Returns:
+            float: 待機秒数
+        """
+        to_next_bar = min((self._seconds_to_next_bar(tf) for tf in timeframes), default=check_interval)
+        return min(check_interval, max(min_poll_interval, to_next_bar))
+    
+    def run(self, timeframe=None, check_interval=DEFAULT_POLL_INTERVAL, strategy_timeframes=None,
+            min_poll_interval=MIN_POLL_INTERVAL):
         """
         戦略を実行（継続的に監視）
         
         Args:
             timeframe: 時間足（Noneの場合はH1）- 単一戦略の場合のデフォルト
-            check_interval: チェック間隔（秒）
+            check_interval: チェック間隔の上限（秒）。足の確定が近い場合はそれに合わせて早く起きる
             strategy_timeframes: 各戦略の時間足の辞書 {strategy_name: timeframe}
+            min_poll_interval: チェック間隔の下限（秒）
         """
         if mt5 is None:
-            print("エラー: MetaTrader5モジュールが利用できません。")
+            logger.error("エラー: MetaTrader5モジュールが利用できません。")
             return
         
         if timeframe is None:
@@ -126,30 +305,164 @@ class TradeExecutor:
         # print(f"チェック間隔: {check_interval}秒")
         # print("-" * 60)
         
+        # Ctrl+Cで停止フラグを立てる（シグナルハンドラはメインスレッドでのみ設定できる）
+        previous_handler = None
+        if threading.current_thread() is threading.main_thread():
+            previous_handler = signal.signal(signal.SIGINT, lambda *_: self._stop.set())
+        
         try:
-            while True:
-                # 現在のポジションを更新
-                self._update_positions()
-                
-                # 各戦略に対してエントリー判定
-                for strategy in self.strategies:
-                    strategy_timeframe = self.strategy_timeframes.get(strategy.name, timeframe)
-                    self._check_entry(strategy, strategy_timeframe)
-                
-                # 各戦略に対してエグジット判定
-                for strategy in self.strategies:
+            self.run_loop(self.strategies, timeframe, check_interval, min_poll_interval)
+            logger.info("戦略を停止します...")
+        finally:
+            if previous_handler is not None:
+                signal.signal(signal.SIGINT, previous_handler)
+    
+    def run_loop(self, strategies, timeframe=None, check_interval=DEFAULT_POLL_INTERVAL,
+                 min_poll_interval=MIN_POLL_INTERVAL):
+        """
+        停止フラグが立つまで戦略のチェックを繰り返す（run()と戦略ごとのスレッドで共通のループ）
+        チェック中のエラーはログに出力して待機後に再試行し、エラーが続く間は待機時間を倍々に延ばす
+        
+        Args:
+            strategies: 対象の戦略のリスト
+            timeframe: strategy_timeframesに登録がない戦略に使用する時間足
+            check_interval: チェック間隔の上限（秒）
+            min_poll_interval: チェック間隔の下限（秒）
+        """
+        timeframes = {self.strategy_timeframes.get(s.name, timeframe) for s in strategies}
+        names = ", ".join(s.name for s in strategies)
+        error_delay = ERROR_BACKOFF_INITIAL
+        while not self._stop.is_set():
+            try:
+                self.tick(strategies, timeframe)
+                failed = not self.mt5.connected
+            except (ConnectionError, TimeoutError) as e:
+                logger.warning("MT5との通信に失敗しました [%s]: %s", names, e)
+                failed = True
+            except Exception as e:
+                # 1回のチェックの失敗でループ（他の戦略のスレッドを含む）を止めない
+                logger.exception("エラーが発生しました [%s]: %s", names, e)
+                failed = True
+            
+            if failed:
+                # エラーが続く間は待機時間を倍々に延ばす
+                delay = error_delay
+                error_delay = min(error_delay * 2, ERROR_BACKOFF_MAX)
+            else:
+                # 次の足の確定、またはcheck_intervalのどちらか早い方まで待機
+                delay = self._poll_delay(timeframes, check_interval, min_poll_interval)
+                error_delay = ERROR_BACKOFF_INITIAL
+            
+            # 停止フラグが立てば待機中でもすぐに抜ける
+            self._stop.wait(delay)
+    
+    def tick(self, strategies, timeframe=None):
+        """
+        1回分のチェック（ポジション更新 → エントリー判定・発注 → エグジット判定）を実行
+        戦略ごとのスレッドから同時に呼ばれてもよい（1つの戦略を渡す）
+        
+        Args:
+            strategies: 対象の戦略のリスト（または1つの戦略）
+            timeframe: strategy_timeframesに登録がない戦略に使用する時間足
+        """
+        if not isinstance(strategies, (list, tuple)):
+            strategies = (strategies,)
+        
+        # このチェック内で共有するキャッシュ（レートデータ・アカウント情報）
+        tick_cache = {}
+        
+        # レートデータはロックの外で先に取得（MT5との通信で他の戦略のスレッドを待たせない）
+        if self.mt5.connected:
+            for strategy in strategies:
+                strategy_timeframe = self.strategy_timeframes.get(strategy.name, timeframe)
+                self._get_rates_cached(self._strategy_meta[strategy.name]['symbol'], strategy_timeframe, tick_cache)
+        
+        # ポジションの更新から最大ポジション数の確認・エントリー判定・枠の確保までを同じロック内で行う
+        # （別のスレッドの戦略と同時にエントリーして最大ポジション数を超えないようにする）
+        orders = []
+        with self._positions_lock:
+            self._update_positions()
+            
+            # 全体の最大ポジション数（送信中の注文を含む）に達している場合はエントリー判定をまとめてスキップ
+            if self._open_slots() > 0:
+                for strategy in strategies:
                     strategy_timeframe = self.strategy_timeframes.get(strategy.name, timeframe)
-                    self._check_exit(strategy, strategy_timeframe)
-                
-                # 待機
-                time.sleep(check_interval)
-                
-        except KeyboardInterrupt:
-            print("\n戦略を停止します...")
-        except Exception as e:
-            print(f"エラーが発生しました: {e}")
-            import traceback
-            traceback.print_exc()
+                    order = self._check_entry(strategy, strategy_timeframe, tick_cache)
+                    if order is not None:
+                        self._inflight_orders.add((order['symbol'], order['magic']))
+                        orders.append(order)
+        
+        # 注文の送信はロックの外で行う（応答が遅れても他の戦略のスレッドを止めない）
+        for order in orders:
+            self._place_entry(order)
+        
+        # エグジット判定は各戦略が自分のmagic numberのポジションだけを扱うため、ロックの外で行う
+        for strategy in strategies:
+            self._check_exits((strategy,), timeframe, tick_cache)
+    
+    def _get_rates_cached(self, symbol, timeframe, tick_cache):
+        """
+        レートデータを取得（同じチェック内では同じ(symbol, timeframe)を1回だけ取得）
+        
+        Args:
+            symbol: シンボル名
+            timeframe: 時間足
+            tick_cache: チェックごとのキャッシュ辞書
+        
+        Returns:
+            pandas.DataFrame: OHLCデータ または None
+        """
+        key = ('rates', symbol, timeframe)
+        if key not in tick_cache:
+            tick_cache[key] = self._fetch_rates(symbol, timeframe)
+        return tick_cache[key]
+    
+    def _fetch_rates(self, symbol, timeframe):
+        """
+        必要な本数だけレートデータを取得
+        前回のデータがあれば、その最新の足以降だけを取得して差分更新する
+        
+        Args:
+            symbol: シンボル名
+            timeframe: 時間足
+        
+        Returns:
+            pandas.DataFrame: OHLCデータ または None
+        """
+        count = self._rates_counts.get(symbol, 100)
+        key = (symbol, timeframe)
+        cached = self._bars_cache.get(key)
+        
+        df = None
+        if cached is not None and len(cached) > 0:
+            # 前回の最新の足（形成中だった足）以降だけを取得して連結
+            latest = self.mt5.get_rates_since(symbol, timeframe, since=cached['time'].iloc[-1])
+            if latest is not None and len(latest) > 0:
+                older = cached[cached['time'] < latest['time'].iloc[0]]
+                df = pd.concat([older, latest], ignore_index=True).iloc[-count:].reset_index(drop=True)
+        
+        if df is None:
+            df = self.mt5.get_rates(symbol, timeframe, count=count)
+            if df is None:
+                return None
+        
+        self._bars_cache[key] = df
+        return df
+    
+    def _get_account_info_cached(self, tick_cache):
+        """
+        アカウント情報を取得（同じチェック内では1回だけ取得）
+        
+        Args:
+            tick_cache: チェックごとのキャッシュ辞書
+        
+        Returns:
+            アカウント情報 または None
+        """
+        key = ('account_info',)
+        if key not in tick_cache:
+            tick_cache[key] = self.mt5.get_account_info()
+        return tick_cache[key]
     
     def _update_positions(self):
         """開いているポジションを更新"""
@@ -162,92 +475,121 @@ class TradeExecutor:
                 if account_info:
                     self.initial_balance = account_info.balance
                     # リスクマネージャーの日次統計をリセット
-                    self.risk_manager.daily_stats = {
-                        "daily_pnl": 0.0,
-                        "consecutive_losses": 0,
-                        "last_reset_date": current_date,
-                        "daily_trades": []
-                    }
+                    self.risk_manager.reset_daily_stats(current_date)
+                    self.last_date_check = current_date
         else:
             self.last_date_check = current_date
         
-        # すべての戦略で使用されるシンボルのポジションを取得
-        symbols = set()
-        for strategy in self.strategies:
-            if hasattr(strategy, 'symbol'):
-                symbols.add(strategy.symbol)
-        if not symbols:
-            symbols.add(self.symbol)  # フォールバック
-        
-        # すべてのシンボルのポジションを取得
-        current_positions = []
-        for symbol in symbols:
-            positions = self.mt5.get_positions(symbol)
-            if positions:
-                current_positions.extend(positions)
-        
-        # 既存のポジションを更新
-        for pos in current_positions:
-            ticket = pos.ticket
-            
-            # エントリー時刻を取得（MT5のポジション時刻を使用）
-            entry_time = datetime.fromtimestamp(pos.time)
-            
-            if ticket not in self.positions:
-                # 新しいポジション
-                self.positions[ticket] = {
-                    'ticket': ticket,
-                    'side': 'buy' if pos.type == mt5.ORDER_TYPE_BUY else 'sell',
-                    'entry_price': pos.price_open,
-                    'entry_time': entry_time,  # エントリー時刻を確実に保存
-                    'volume': pos.volume,
-                    'sl': pos.sl,
-                    'tp': pos.tp,
-                    'comment': pos.comment,  # コメントを保存（戦略名を含む）
-                    'symbol': pos.symbol,  # シンボルを保存
-                    'magic': pos.magic  # Magic numberを保存
-                }
-                print(f"新しいポジションを検出: チケット={ticket}, 方向={self.positions[ticket]['side']}, magic={pos.magic}, エントリー時刻={entry_time}, コメント={pos.comment}")
-            else:
-                # 既存のポジションのエントリー時刻を更新（MT5から取得した最新情報を使用）
-                # プログラム再起動時など、既存ポジションの時刻を確実に保持するため
-                if 'entry_time' not in self.positions[ticket] or self.positions[ticket]['entry_time'] is None:
-                    self.positions[ticket]['entry_time'] = entry_time
-                    print(f"既存ポジションのエントリー時刻を更新: チケット={ticket}, エントリー時刻={entry_time}")
+        # すべてのポジションを1回で取得し、戦略のシンボルとmagic numberに一致するものだけを使用
+        # 取得できない場合（切断時など）は、ポジションが決済されたと誤認しないよう前回の状態を維持
+        if not self._refresh_positions_snapshot():
+            logger.warning("[警告] ポジションを取得できませんでした。前回のポジション情報を使用します")
+            return
+        symbols = self._known_symbols
+        magics = self._known_magics
+        current_positions = [
+            pos for pos in self._positions_snapshot.values()
+            if pos.symbol in symbols and pos.magic in magics
+        ]
+        
+        # 新しいポジションのエントリー時刻をまとめてdatetime64とdatetimeに変換（ローソク足の時刻と同じくMT5のサーバー時刻基準）
+        new_positions = [pos for pos in current_positions if pos.ticket not in self.positions]
+        if new_positions:
+            times_np = np.array([pos.time for pos in new_positions], dtype='int64').astype('datetime64[s]')
+            entry_times = times_np.astype(datetime)
+            for pos, entry_time_np, entry_time in zip(new_positions, times_np, entry_times):
+                ticket = pos.ticket
+                
+                self.positions[ticket] = Position(
+                    ticket=ticket,
+                    side='buy' if pos.type == mt5.ORDER_TYPE_BUY else 'sell',
+                    entry_price=pos.price_open,
+                    entry_time=entry_time,  # エントリー時刻を確実に保存
+                    volume=pos.volume,
+                    sl=pos.sl,
+                    tp=pos.tp,
+                    comment=pos.comment,  # コメントを保存（戦略名を含む）
+                    symbol=pos.symbol,  # シンボルを保存
+                    magic=pos.magic,  # Magic numberを保存
+                    entry_candle_time=self._pending_entry_candle_times.pop(ticket, None),
+                    entry_time_np=entry_time_np
+                )
+                logger.info("新しいポジションを検出: チケット=%s, 方向=%s, magic=%s, エントリー時刻=%s, コメント=%s",
+                            ticket, self.positions[ticket].side, pos.magic, entry_time, pos.comment)
         
         # 決済されたポジションを削除
+        # dictのキービューとの差分で求める（キーの集合をコピーしない）
         active_tickets = {pos.ticket for pos in current_positions}
-        closed_tickets = set(self.positions.keys()) - active_tickets
-        for ticket in closed_tickets:
-            print(f"ポジションが決済されました: チケット={ticket}")
+        for ticket in self.positions.keys() - active_tickets:
+            logger.info("ポジションが決済されました: チケット=%s", ticket)
             del self.positions[ticket]
     
-    def _check_entry(self, strategy, timeframe):
-        """エントリー条件をチェック"""
-        # 戦略のシンボルを使用
-        symbol = strategy.symbol if hasattr(strategy, 'symbol') else self.symbol
+    def _open_slots(self):
+        """新しくエントリーできるポジション数（送信中の注文も使用中として数える）"""
+        return self._max_total_positions - len(self.positions) - len(self._inflight_orders)
+    
+    def _check_entry(self, strategy, timeframe, tick_cache=None):
+        """
+        エントリー条件をチェック（_positions_lockを保持した状態で呼び出す）
+        注文は送信せず、送信する内容を返す（送信は_place_entryでロックの外で行う）
+        
+        Args:
+            strategy: 戦略インスタンス
+            timeframe: 時間足
+            tick_cache: チェックごとのキャッシュ辞書
+        
+        Returns:
+            dict: 送信する注文の内容 または None（エントリーしない場合）
+        """
+        if tick_cache is None:
+            tick_cache = {}
+        
+        # 戦略ごとの定数（__init__で解決済み）
+        meta = self._strategy_meta[strategy.name]
+        symbol = meta['symbol']
         
         # MT5の接続状態を確認
         if not self.mt5.connected:
-            print(f"[警告] MT5の接続が切れています。{strategy.name} ({symbol}) のエントリーチェックをスキップします")
+            logger.warning("[警告] MT5の接続が切れています。%s (%s) のエントリーチェックをスキップします", strategy.name, symbol)
+            return
+        
+        # 約定したか確認できなかった注文がある場合は、二重発注を避けるためポジションを取得できるまでスキップ
+        if symbol in self._unconfirmed_order_symbols:
+            logger.warning("  [%s] %s の注文結果を確認中のため、エントリーをスキップします", strategy.name, symbol)
+            return
+        
+        # 同じ戦略の注文を送信中の場合はスキップ
+        if (symbol, meta['magic']) in self._inflight_orders:
+            logger.debug("  [%s] 注文を送信中のため、エントリーをスキップします", strategy.name)
+            return
+        
+        # 同じmagic numberのポジションが既に存在する場合は、レート取得や指標計算の前にスキップ
+        # 各戦略は1つずつしかポジションを持てない（magic number + symbolで管理）
+        if meta['magic'] is not None and self._has_open_position(symbol, meta['magic']):
+            logger.debug("  [%s] 同じmagic number（%s）のポジションが既に存在するため、エントリーをスキップします", strategy.name, meta['magic'])
             return
         
         # レートデータを取得
-        df = self.mt5.get_rates(symbol, timeframe, count=100)
+        df = self._get_rates_cached(symbol, timeframe, tick_cache)
         if df is None:
             return
         
-        # ドンチャン戦略の場合は最小データ数を確認（period + 1）
-        min_required = 21  # デフォルト
-        if hasattr(strategy, 'period'):
-            min_required = strategy.period + 1
+        # 最小データ数を確認（ドンチャン戦略の場合はperiod + 1、それ以外は21）
+        if len(df) < meta['min_required']:
+            return
         
-        if len(df) < min_required:
+        # 前回判定した足から進んでいない場合はスキップ（確定足が変わらないためシグナルも変わらない）
+        bar_time = df['time'].iloc[-1] if 'time' in df.columns else None
+        if bar_time is not None and self._last_entry_bar_time.get(strategy.name) == bar_time:
             return
         
         # エントリー判定
         entry_signal = strategy.should_entry(df)
         
+        if not entry_signal:
+            # シグナルなしの足は記録（リスク管理で拒否された場合は同じ足で再判定する）
+            self._last_entry_bar_time[strategy.name] = bar_time
+        
         if entry_signal:
             # 現在価格を取得（前のローソク足がクローズした後の現在価格）
             current_price_info = self.mt5.get_current_price(symbol)
@@ -257,44 +599,31 @@ class TradeExecutor:
                 # フォールバック：現在のローソク足の始値を使用
                 entry_price = df['open'].iloc[-1]
             
-            print(f"\n[{datetime.now()}] エントリーシグナル検出! [{strategy.name}]")
-            print(f"  方向: {entry_signal['side']}")
-            print(f"  エントリー価格: {entry_price:.5f}")
-            print(f"  損切り: {entry_signal['sl']:.5f}")
-            if entry_signal.get('tp') is not None:
-                print(f"  利確: {entry_signal['tp']:.5f}")
+            tp = entry_signal.get('tp')
+            if tp is not None:
+                logger.info(ENTRY_LOG_FMT, strategy.name, entry_signal['side'], entry_price, entry_signal['sl'], tp)
             else:
-                print(f"  利確: なし（時間ベース決済）")
+                logger.info(ENTRY_LOG_FMT_NO_TP, strategy.name, entry_signal['side'], entry_price, entry_signal['sl'])
             
             # Magic numberを取得
-            strategy_magic = getattr(strategy, 'magic', None)
+            strategy_magic = meta['magic']
             if strategy_magic is None:
-                print(f"  [エラー] 戦略 {strategy.name} にmagic numberが設定されていません")
+                logger.error("  [エラー] 戦略 %s にmagic numberが設定されていません", strategy.name)
                 return
             
             # ポジション数の制限チェック
-            # 1. 全体のポジション数が2つを超えないようにする
-            max_total_positions = self.risk_manager.config.get("position_limits", {}).get("max_total_positions", 2)
-            if len(self.positions) >= max_total_positions:
-                print(f"  [全体] 既に最大ポジション数（{max_total_positions}つ）に達しているため、エントリーをスキップします")
-                return
-            
-            # 2. 同じmagic numberのポジションが既に存在する場合はスキップ
-            # 各戦略は1つずつしかポジションを持てない（magic number + symbolで管理）
-            if self._has_open_position(symbol, strategy_magic):
-                print(f"  [{strategy.name}] 同じmagic number（{strategy_magic}）のポジションが既に存在するため、エントリーをスキップします")
+            # 1. 全体のポジション数（送信中の注文を含む）が2つを超えないようにする
+            if self._open_slots() <= 0:
+                logger.debug("  [全体] 既に最大ポジション数（%sつ）に達しているため、エントリーをスキップします", self._max_total_positions)
                 return
             
             # 戦略に応じたロットサイズを取得
-            strategy_lot_size = self._get_lot_size(strategy)
+            strategy_lot_size = meta['lot_size']
             
-            # 3. リスクマネージャーによる総合チェック
-            account_info = self.mt5.get_account_info()
+            # 2. リスクマネージャーによる総合チェック
+            account_info = self._get_account_info_cached(tick_cache)
             account_balance = account_info.balance if account_info else 0.0
             
-            # 日次統計を更新（最新のトレードログから）
-            self.risk_manager._update_daily_stats_from_log(self.risk_manager.daily_stats)
-            
             can_entry, reasons = self.risk_manager.can_entry(
                 positions=self.positions,
                 symbol=symbol,
@@ -307,161 +636,199 @@ class TradeExecutor:
             )
             
             if not can_entry:
-                print(f"  [リスク管理] エントリーが拒否されました:")
+                logger.info("  [リスク管理] エントリーが拒否されました:")
                 for reason in reasons:
-                    print(f"    - {reason}")
+                    logger.info("    - %s", reason)
                 return
             
-            # 注文を送信
-            order_type = mt5.ORDER_TYPE_BUY if entry_signal['side'] == 'buy' else mt5.ORDER_TYPE_SELL
+            # エントリー時のローソク足の時刻（4時間足の本数カウント用、戦略がシグナルに含めて返す）
+            entry_candle_time = entry_signal.get('entry_candle_time')
+            if entry_candle_time is None and 'time' in df.columns and len(df) > 0:
+                entry_candle_time = pd.Timestamp(df['time'].iat[-1])
+            
+            # 送信する注文の内容（送信は_place_entryでロックの外で行う）
+            return {
+                'strategy': strategy,
+                'symbol': symbol,
+                'magic': strategy_magic,
+                'side': entry_signal['side'],
+                'entry_price': entry_price,
+                'sl': entry_signal['sl'],
+                'tp': entry_signal['tp'],
+                'volume': strategy_lot_size,
+                'entry_candle_time': entry_candle_time,
+            }
+        return None
+    
+    def _place_entry(self, order):
+        """
+        エントリー注文を送信し、結果を記録（_positions_lockの外で呼び出す）
+        送信が終わったら、_check_entryのロック内で確保した枠を解放する
+        
+        Args:
+            order: _check_entryが返した注文の内容
+        """
+        strategy = order['strategy']
+        symbol = order['symbol']
+        entry_candle_time = order['entry_candle_time']
+        success, ticket, result = False, None, None
+        try:
+            order_type = mt5.ORDER_TYPE_BUY if order['side'] == 'buy' else mt5.ORDER_TYPE_SELL
             success, ticket, result = self.mt5.place_order(
                 symbol=symbol,
                 order_type=order_type,
-                volume=strategy_lot_size,
-                sl=entry_signal['sl'],
-                tp=entry_signal['tp'],
+                volume=order['volume'],
+                sl=order['sl'],
+                tp=order['tp'],
                 comment=f"{strategy.name} entry",
-                magic=strategy_magic
+                magic=order['magic']
             )
+        finally:
+            with self._positions_lock:
+                if success:
+                    # ポジション情報にエントリー時のローソク足時刻を保存
+                    # まだ検出していないポジションは、_update_positionsでPositionを作成する際に設定する
+                    if ticket in self.positions:
+                        self.positions[ticket].entry_candle_time = entry_candle_time
+                    elif entry_candle_time is not None:
+                        self._pending_entry_candle_times[ticket] = entry_candle_time
+                elif success is None:
+                    # 約定している可能性があるため、実際のポジションを取得できるまでこのシンボルのエントリーを見合わせる
+                    self._unconfirmed_order_symbols.add(symbol)
+                self._inflight_orders.discard((symbol, order['magic']))
+        
+        if success:
+            logger.info("  エントリー成功: チケット=%s", ticket)
+            if entry_candle_time is not None:
+                logger.info("  エントリー時のローソク足時刻: %s", entry_candle_time)
             
-            if success:
-                print(f"  エントリー成功: チケット={ticket}")
-                
-                # エントリー時のローソク足の時刻を記録（4時間足の本数カウント用）
-                entry_candle_time = None
-                if 'time' in df.columns and len(df) > 0:
-                    # エントリー時のローソク足（最新のローソク足）の時刻を記録
-                    entry_candle_time = pd.to_datetime(df['time'].iloc[-1])
-                    print(f"  エントリー時のローソク足時刻: {entry_candle_time}")
-                
-                # エントリーログを記録
-                try:
-                    entry_timestamp = datetime.now()
-                    if result and hasattr(result, 'time'):
-                        entry_timestamp = datetime.fromtimestamp(result.time)
-                    
-                    entry_log = {
-                        'timestamp': entry_timestamp,
-                        'strategy': strategy.name,
-                        'symbol': symbol,
-                        'direction': entry_signal['side'],
-                        'entry_price': entry_price,
-                        'stop_loss': entry_signal.get('sl'),
-                        'take_profit': entry_signal.get('tp'),
-                        'volume': strategy_lot_size,
-                        'ticket': ticket
-                    }
-                    self.trade_logger.log_trade(entry_log)
-                except Exception as e:
-                    print(f"  警告: ログ記録に失敗しました: {e}")
-                
-                # ポジション情報にエントリー時のローソク足時刻を保存
-                # _update_positionsで更新されるが、念のためここでも保存
-                if ticket in self.positions:
-                    self.positions[ticket]['entry_candle_time'] = entry_candle_time
-            else:
-                print(f"  エントリー失敗")
+            # エントリーログを記録（書き込みはバックグラウンドスレッドで行う）
+            entry_timestamp = datetime.now()
+            if result and hasattr(result, 'time'):
+                entry_timestamp = datetime.fromtimestamp(result.time)
+            
+            entry_log = {
+                'timestamp': entry_timestamp,
+                'strategy': strategy.name,
+                'symbol': symbol,
+                'direction': order['side'],
+                'entry_price': order['entry_price'],
+                'stop_loss': order['sl'],
+                'take_profit': order['tp'],
+                'volume': order['volume'],
+                'ticket': ticket
+            }
+            self._enqueue_trade_log('entry', entry_log)
+        elif success is None:
+            logger.warning("  エントリー結果不明: ポジションを確認できるまで %s のエントリーを見合わせます", symbol)
+        else:
+            logger.warning("  エントリー失敗")
     
-    def _check_exit(self, strategy, timeframe):
-        """エグジット条件をチェック"""
+    def _check_exits(self, strategies, timeframe=None, tick_cache=None):
+        """
+        エグジット条件をチェック
+        ポジションごとにmagic numberから担当戦略を引き、各ポジションを1回だけ判定する
+        
+        Args:
+            strategies: 対象の戦略のリスト
+            timeframe: strategy_timeframesに登録がない戦略に使用する時間足
+            tick_cache: チェックごとのキャッシュ辞書
+        """
+        if tick_cache is None:
+            tick_cache = {}
+        
         if len(self.positions) == 0:
             return
         
-        # 戦略のシンボルを使用
-        symbol = strategy.symbol if hasattr(strategy, 'symbol') else self.symbol
+        # 対象の戦略のポジションがスナップショットに1つもなければ、接続確認やレート取得の前に終了
+        metas = [self._strategy_meta[strategy.name] for strategy in strategies]
+        if not any(self._positions_by_key.get((meta['symbol'], meta['magic'])) for meta in metas):
+            return
         
         # MT5の接続状態を確認
         if not self.mt5.connected:
-            print(f"[警告] MT5の接続が切れています。{strategy.name} ({symbol}) のエグジットチェックをスキップします")
+            logger.warning("[警告] MT5の接続が切れています。エグジットチェックをスキップします")
             return
         
-        # レートデータを取得
-        df = self.mt5.get_rates(symbol, timeframe, count=100)
-        if df is None or len(df) < 1:
-            return
-        
-        # Magic numberを取得
-        strategy_magic = getattr(strategy, 'magic', None)
-        if strategy_magic is None:
-            return
+        target_magics = {meta['magic'] for meta in metas}
         
-        # 各ポジションをチェック（magic numberでフィルタリング）
+        # 各ポジションをチェック（magic numberで担当戦略を特定）
         for ticket, position in list(self.positions.items()):
-            # この戦略のmagic numberと一致するポジションのみチェック
-            position_magic = position.get('magic')
-            if position_magic != strategy_magic:
+            position_magic = position.magic
+            if position_magic not in target_magics:
+                continue
+            
+            strategy = self._strategy_by_magic.get(position_magic)
+            if strategy is None:
                 continue
             
             # シンボルも一致することを確認
-            position_symbol = position.get('symbol')
-            if position_symbol != symbol:
+            symbol = self._strategy_meta[strategy.name]['symbol']
+            if position.symbol != symbol:
+                continue
+            
+            # レートデータを取得（同じチェック内では共有）
+            strategy_timeframe = self.strategy_timeframes.get(strategy.name, timeframe)
+            df = self._get_rates_cached(symbol, strategy_timeframe, tick_cache)
+            if df is None or len(df) < 1:
                 continue
             
             # エントリー時刻が保存されているか確認
-            entry_time = position.get('entry_time')
+            entry_time = position.entry_time
             if entry_time is None:
-                print(f"[警告] ポジション {ticket} のエントリー時刻が記録されていません。MT5から再取得します...")
-                # MT5から直接ポジション情報を取得してエントリー時刻を更新
-                mt5_positions = self.mt5.get_positions(symbol=symbol, magic=strategy_magic)
-                for mt5_pos in mt5_positions:
-                    if mt5_pos.ticket == ticket:
-                        position['entry_time'] = datetime.fromtimestamp(mt5_pos.time)
-                        print(f"エントリー時刻を更新: チケット={ticket}, エントリー時刻={position['entry_time']}")
-                        break
+                logger.warning("[警告] ポジション %s のエントリー時刻が記録されていません。スナップショットから再取得します...", ticket)
+                # ループ先頭で取得したスナップショットからエントリー時刻を更新
+                mt5_pos = self._positions_snapshot.get(ticket)
+                if mt5_pos is not None:
+                    position.entry_time_np = np.datetime64(int(mt5_pos.time), 's')
+                    entry_time = position.entry_time_np.astype(datetime)
+                    position.entry_time = entry_time
+                    logger.info("エントリー時刻を更新: チケット=%s, エントリー時刻=%s", ticket, entry_time)
             
             # エントリー時のローソク足時刻が未設定の場合は、現在のローソク足時刻を設定
             # （プログラム再起動時など、既存ポジションの場合）
-            entry_candle_time = position.get('entry_candle_time')
-            if entry_candle_time is None and 'time' in df.columns and len(df) > 0:
-                # エントリー時刻から最も近いローソク足の時刻を推定
-                entry_time_dt = pd.to_datetime(entry_time) if not isinstance(entry_time, pd.Timestamp) else entry_time
-                # エントリー時刻以前のローソク足を探す
-                df_times = pd.to_datetime(df['time'])
-                # エントリー時刻以前の最後のローソク足を探す
-                before_entry = df_times[df_times <= entry_time_dt]
-                if len(before_entry) > 0:
-                    entry_candle_time = before_entry.iloc[-1]
-                    position['entry_candle_time'] = entry_candle_time
-                    print(f"エントリー時のローソク足時刻を推定: チケット={ticket}, ローソク足時刻={entry_candle_time}")
+            if position.entry_candle_time is None and position.entry_time_np is not None and 'time' in df.columns:
+                # エントリー時刻以前の最後のローソク足を二分探索で探してポジションに保存
+                # （時刻の配列は戦略と同じ変換結果を使う）
+                entry_candle_time = find_entry_candle(to_bars(df).time, position)
+                if entry_candle_time is not None:
+                    logger.info("エントリー時のローソク足時刻を推定: チケット=%s, ローソク足時刻=%s", ticket, entry_candle_time)
             
             should_exit = strategy.should_exit(position, df)
-                
+            
             if should_exit:
-                print(f"\n[{datetime.now()}] エグジットシグナル検出! [{strategy.name}]")
-                print(f"  チケット: {ticket}, 方向: {position['side']}, magic: {position_magic}")
+                logger.info("[%s] エグジットシグナル検出! [%s]", datetime.now(), strategy.name)
+                logger.info("  チケット: %s, 方向: %s, magic: %s", ticket, position.side, position_magic)
                 
                 # ポジションを決済
                 success, profit, balance_after = self.mt5.close_position(ticket)
                 if success:
-                    print(f"  決済成功: チケット={ticket}, 利益: {profit:.2f}")
+                    logger.info("  決済成功: チケット=%s, 利益: %.2f", ticket, profit)
                     
                     # リスクマネージャーの統計を更新
                     if profit is not None:
                         self.risk_manager.update_daily_stats(profit)
                     
-                    # エグジットログを記録
-                    try:
-                        exit_timestamp = datetime.now()
-                        
-                        close_log = {
-                            'timestamp': exit_timestamp,
-                            'entry_timestamp': position.get('entry_time', exit_timestamp),
-                            'strategy': strategy.name,
-                            'symbol': position.get('symbol', symbol),
-                            'direction': position.get('side'),
-                            'entry_price': position.get('entry_price'),
-                            'stop_loss': position.get('sl'),
-                            'take_profit': position.get('tp'),
-                            'volume': position.get('volume'),
-                            'ticket': ticket,
-                            'profit': profit,
-                            'balance_after': balance_after
-                        }
-                        self.trade_logger.log_close(close_log)
-                    except Exception as e:
-                        print(f"  警告: ログ記録に失敗しました: {e}")
+                    # エグジットログを記録（書き込みはバックグラウンドスレッドで行う）
+                    exit_timestamp = datetime.now()
+                    
+                    close_log = {
+                        'timestamp': exit_timestamp,
+                        'entry_timestamp': position.entry_time or exit_timestamp,
+                        'strategy': strategy.name,
+                        'symbol': position.symbol,
+                        'direction': position.side,
+                        'entry_price': position.entry_price,
+                        'stop_loss': position.sl,
+                        'take_profit': position.tp,
+                        'volume': position.volume,
+                        'ticket': ticket,
+                        'profit': profit,
+                        'balance_after': balance_after
+                    }
+                    self._enqueue_trade_log('close', close_log)
                 else:
-                    print(f"  決済失敗: チケット={ticket}")
+                    logger.warning("  決済失敗: チケット=%s", ticket)
     
     def get_status(self):
         """現在のステータスを取得"""
@@ -3,6 +3,15 @@ MetaTrader 5接続クラス
 """
 import os
 import sys
+import time
+import random
+import logging
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+import pandas as pd
+from .rates_cache import RatesDiskCache, HAS_PYARROW
 
 # 環境変数を読み込む
 try:
@@ -11,65 +20,325 @@ try:
 except ImportError:
     pass
 
-try:
-    import MetaTrader5 as mt5
-except ImportError:
+# MetaTrader5モジュール（初回の接続時に_ensure_mt5()で読み込む）
+# 遅延読み込みはこのモジュールのみ（executor・risk_manager・donchianは読み込み時にimportする）
+mt5 = None
+_mt5_resolved = False
+
+# pipでインストールされていない場合に探すMT5のインストールディレクトリと、その中のPython APIの場所
+_MT5_INSTALL_DIRS = (
+    r"C:\Program Files\MetaTrader 5",
+    r"C:\Program Files (x86)\MetaTrader 5",
+    os.path.expanduser(r"~\Desktop\MetaTrader 5"),
+)
+_MT5_API_SUBDIRS = (
+    ("MQL5", "Libraries", "Python"),
+    ("MetaTrader5",),
+    (),  # ルートディレクトリも試す
+)
+
+
+def _ensure_mt5():
+    """
+    MetaTrader5モジュールを読み込む（2回目以降は読み込み済みの結果を返す）
+    pipでインストールされたものを優先し、見つからない場合のみMT5のインストールディレクトリを探す
+    
+    Returns:
+        MetaTrader5モジュール または None
+    """
+    global mt5, _mt5_resolved
+    if _mt5_resolved:
+        return mt5
+    _mt5_resolved = True
+    
+    try:
+        import MetaTrader5 as module
+        mt5 = module
+        return mt5
+    except ImportError:
+        pass
+    
     # MT5のインストールディレクトリをパスに追加して再試行
-    possible_paths = [
-        r"C:\Program Files\MetaTrader 5",
-        r"C:\Program Files (x86)\MetaTrader 5",
-        os.path.expanduser(r"~\Desktop\MetaTrader 5"),
-    ]
-    
-    mt5 = None
-    for mt5_path in possible_paths:
-        if os.path.exists(mt5_path):
-            # 複数のパスを試す
-            python_api_paths = [
-                os.path.join(mt5_path, "MQL5", "Libraries", "Python"),
-                os.path.join(mt5_path, "MetaTrader5"),
-                mt5_path,  # ルートディレクトリも試す
-            ]
-            
-            for python_api_path in python_api_paths:
-                if os.path.exists(python_api_path):
-                    if python_api_path not in sys.path:
-                        sys.path.insert(0, python_api_path)
-                    try:
-                        import MetaTrader5 as mt5
-                        print(f"[INFO] MT5のPython APIを読み込みました: {python_api_path}")
-                        break
-                    except ImportError:
-                        continue
-            
-            if mt5 is not None:
-                break
+    for mt5_path in _MT5_INSTALL_DIRS:
+        if not os.path.exists(mt5_path):
+            continue
+        for subdir in _MT5_API_SUBDIRS:
+            python_api_path = os.path.join(mt5_path, *subdir)
+            if not os.path.exists(python_api_path):
+                continue
+            if python_api_path not in sys.path:
+                sys.path.insert(0, python_api_path)
+            try:
+                import MetaTrader5 as module
+            except ImportError:
+                continue
+            mt5 = module
+            print(f"[INFO] MT5のPython APIを読み込みました: {python_api_path}")
+            return mt5
     
-    if mt5 is None:
-        print("=" * 60)
-        print("警告: MetaTrader5モジュールが見つかりません")
-        print("=" * 60)
-        print("\nMT5のPython APIをインストールするには:")
-        print("\n方法1: MT5を起動してから実行")
-        print("  - MetaTrader 5を起動してください")
-        print("  - アカウントにログインしてください")
-        print("  - その後、このプログラムを実行してください")
-        print("\n方法2: 公式サイトからダウンロード")
-        print("  - https://www.mql5.com/ja/docs/integration/python_metatrader5")
-        print("  - Python APIパッケージをダウンロードしてインストール")
-        print("\n方法3: MT5が起動している状態で、DLLを直接読み込む")
-        print("  - MT5を起動している状態で、このプログラムを実行してください")
-        print("=" * 60)
+    print("=" * 60)
+    print("警告: MetaTrader5モジュールが見つかりません")
+    print("=" * 60)
+    print("\nMT5のPython APIをインストールするには:")
+    print("\n方法1: MT5を起動してから実行")
+    print("  - MetaTrader 5を起動してください")
+    print("  - アカウントにログインしてください")
+    print("  - その後、このプログラムを実行してください")
+    print("\n方法2: 公式サイトからダウンロード")
+    print("  - https://www.mql5.com/ja/docs/integration/python_metatrader5")
+    print("  - Python APIパッケージをダウンロードしてインストール")
+    print("\n方法3: MT5が起動している状態で、DLLを直接読み込む")
+    print("  - MT5を起動している状態で、このプログラムを実行してください")
+    print("=" * 60)
+    return None
 
-import pandas as pd
-from datetime import datetime, timedelta
-import time
+
+logger = logging.getLogger(__name__)
+
+
+# ログイン再試行の設定（指数バックオフ + ジッター）
+LOGIN_MAX_RETRIES = 5
+LOGIN_BASE_DELAY = 1.0
+LOGIN_MAX_DELAY = 30.0
+LOGIN_JITTER = 0.5
+# 再試行しても回復しないログインエラー（-6: 認証失敗, -2: 引数が無効）
+UNRECOVERABLE_LOGIN_ERRORS = {-6, -2}
+
+# MT5への問い合わせ結果をキャッシュする秒数
+ACCOUNT_INFO_TTL = 5.0
+SYMBOL_INFO_TTL = 60.0
+TICK_TTL = 0.2  # ティックはほぼリアルタイムである必要があるため短くする
+# 同じ問い合わせの実行中に、後から来た呼び出しが結果を待つ最大秒数
+SINGLE_FLIGHT_TIMEOUT = 30.0
+# 複数シンボルをまとめて取得する際の同時実行数（環境変数MT5_POOL_SIZEで変更可能）
+BATCH_MAX_WORKERS = 8
+# IPC接続を維持するためのハートビート間隔（秒）
+HEARTBEAT_INTERVAL = 15.0
+# 注文のデフォルト設定
+DEFAULT_MAGIC = 234000
+ORDER_DEVIATION = 20
+# 注文の再試行の設定（一時的なエラーのみ、指数バックオフ + ジッター）
+ORDER_MAX_RETRIES = 3
+ORDER_BASE_DELAY = 0.2
+ORDER_MAX_DELAY = 2.0
+# 再試行で回復しうる注文エラー（10004: リクオート, 10020: 価格変更, 10021: 価格なし, 10024: リクエスト過多）
+TRANSIENT_ORDER_RETCODES = {10004, 10020, 10021, 10024}
+# 約定したか分からない注文エラー（10012: タイムアウト, 10031: 接続なし）- 二重約定を避けるため再送せず、ポジションを確認する
+AMBIGUOUS_ORDER_RETCODES = {10012, 10031}
+# 結果が不明な注文の後、ポジションを取得できず約定したか確認できなかったことを表す値
+ORDER_RESULT_UNKNOWN = "unknown"
+# MT5がポジションのコメントとして保持する最大文字数（超えた分は切り捨てられる）
+ORDER_COMMENT_MAX_LENGTH = 31
+# 初期化後、ターミナルの応答を待つ最大秒数と確認間隔（秒）
+INIT_READY_TIMEOUT = 3.0
+INIT_READY_POLL_INTERVAL = 0.1
+
+
+@functools.lru_cache(maxsize=1024)
+def tick_time_to_dt(ts):
+    """
+    ティックの時刻（エポック秒）をdatetimeに変換（同じ秒の変換はキャッシュを使う）
+    
+    Args:
+        ts: エポック秒（get_current_priceの'time_epoch'）
+    
+    Returns:
+        datetime: ローカル時刻
+    """
+    return datetime.fromtimestamp(ts)
+
+
+def _backoff_delay(attempt, base_delay=LOGIN_BASE_DELAY, max_delay=LOGIN_MAX_DELAY, jitter=LOGIN_JITTER):
+    """
+    再試行までの待機秒数を計算（指数バックオフ + ジッター）
+    
+    Args:
+        attempt: 再試行の回数（0始まり）
+        base_delay: 初回の待機秒数
+        max_delay: 待機秒数の上限
+        jitter: 待機秒数に加えるランダムな割合の上限
+    
+    Returns:
+        float: 待機秒数
+    """
+    return min(max_delay, base_delay * (2 ** attempt) * (1 + random.uniform(0, jitter)))
+
+
+def _pool_size_from_env():
+    """
+    並列取得用のスレッドプールのサイズを環境変数MT5_POOL_SIZEから取得
+    
+    Returns:
+        int: スレッド数（不正な値の場合はBATCH_MAX_WORKERS。最小1）
+    """
+    value = os.getenv('MT5_POOL_SIZE')
+    if value is None:
+        return BATCH_MAX_WORKERS
+    try:
+        pool_size = int(value)
+    except ValueError:
+        logger.warning("MT5_POOL_SIZEの値が不正です（%r）。%dを使用します", value, BATCH_MAX_WORKERS)
+        return BATCH_MAX_WORKERS
+    return max(1, pool_size)
+
+
+_ERROR_SEPARATOR = "=" * 60
+
+# MT5のエラーコードごとの対処法（エラー時にのみ整形して出力する）
+# 段階（初期化・ログイン・注文）ごとに表を分け、表の対処法に埋め込む値はその段階で必ず渡す
+
+# IPC timeout（ターミナルが起動していない場合など、初期化とログインのどちらでも発生する）
+_IPC_TIMEOUT_HELP = (
+    "\n【重要】IPC timeoutエラー\n"
+    "MT5のターミナルとの通信が確立されていません。\n"
+    "\n対処法:\n"
+    "1. MetaTrader 5のターミナルを手動で起動してください\n"
+    "2. MT5のターミナルで手動ログインしてください:\n"
+    "   - アカウント: {login}\n"
+    "   - パスワード: {password_mask}\n"
+    "   - サーバー: {server}\n"
+    "3. MT5のターミナルでログインが成功したことを確認してください\n"
+    "4. MT5のターミナルが起動した状態で、このプログラムを再度実行してください\n"
+    "\n注意:\n"
+    "- MT5のターミナルを起動してから、このプログラムを実行してください\n"
+    "- MT5のターミナルで手動ログインが成功する必要があります\n"
+    "- ターミナルを起動した後、数秒待ってからプログラムを実行してください"
+)
+
+# 初期化時のエラー（埋め込む値: path, login, password_mask, server）
+_INIT_ERROR_HELP = {
+    # 初期化: Invalid "path" argument
+    -2: (
+        "\n考えられる原因:\n"
+        "1. MT5のパスが無効です\n"
+        "   → 現在のパス: {path}\n"
+        "   → MT5のターミナルが既に起動している場合は、パスをNoneに設定してください\n"
+        "   → または、MT5のインストールディレクトリのパスを正しく指定してください"
+    ),
+    # 初期化: RES_S_OK以外
+    1: (
+        "\n考えられる原因:\n"
+        "1. MetaTrader 5が起動していない\n"
+        "   → MT5を起動してから再度実行してください\n"
+        "2. MT5のインストールパスが正しくない\n"
+        "   → 現在のパス: {path}\n"
+        "   → MT5のインストールディレクトリを確認してください\n"
+        "3. MT5のPython APIが正しくインストールされていない\n"
+        "   → pip install MetaTrader5 を実行してください"
+    ),
+    # 初期化: TRADE_RETCODE_REQUOTE
+    10004: (
+        "\n考えられる原因:\n"
+        "1. MT5が起動していない\n"
+        "2. ネットワーク接続の問題"
+    ),
+    # IPC timeout
+    -10005: _IPC_TIMEOUT_HELP,
+}
+
+# ログイン時のエラー（埋め込む値: login, password_mask, server）
+_LOGIN_ERROR_HELP = {
+    # IPC timeout
+    -10005: _IPC_TIMEOUT_HELP,
+}
+
+# 注文時のエラー（埋め込む値なし）
+_ORDER_ERROR_HELP = {
+    # 注文: AutoTrading disabled by server
+    10026: (
+        "\n" + _ERROR_SEPARATOR + "\n"
+        "【重要】サーバー側で自動取引が無効になっています\n"
+        + _ERROR_SEPARATOR + "\n"
+        "\nこのエラーは、ブローカーのサーバー側で自動取引が制限されている場合に発生します。\n"
+        "\n考えられる原因:\n"
+        "1. デモ口座で自動取引が制限されている\n"
+        "2. ブローカーの設定で自動取引が無効になっている\n"
+        "3. アカウントタイプによって自動取引が許可されていない\n"
+        "\n対処法:\n"
+        "1. ブローカーのサポートに連絡して、自動取引が有効か確認してください\n"
+        "2. アカウント設定で自動取引が有効になっているか確認してください\n"
+        "3. 別のアカウントタイプ（例：リアル口座）で試してください\n"
+        "4. ブローカーのウェブサイトで自動取引の設定を確認してください\n"
+        "\n注意: 一部のブローカーでは、デモ口座で自動取引が制限されている場合があります。\n"
+        + _ERROR_SEPARATOR
+    ),
+    # 注文: AutoTrading disabled by client
+    10027: (
+        "\n" + _ERROR_SEPARATOR + "\n"
+        "【重要】自動取引が無効になっています\n"
+        + _ERROR_SEPARATOR + "\n"
+        "\nMT5のターミナルで自動取引を有効にする必要があります。\n"
+        "\n手順:\n"
+        "1. MT5のターミナルを開く\n"
+        "2. ツール → オプション → エキスパートアドバイザー\n"
+        "3. 「自動取引を許可する」にチェックを入れる\n"
+        "4. または、MT5のターミナルのツールバーで「自動取引」ボタンをクリック\n"
+        "   （通常、ツールバーの上部に「AutoTrading」ボタンがあります）\n"
+        "5. ボタンが緑色になったことを確認してください\n"
+        "6. その後、このプログラムを再度実行してください\n"
+        + _ERROR_SEPARATOR
+    ),
+}
+
+# 表にないエラーコードの場合の対処法
+_INIT_ERROR_DEFAULT_HELP = (
+    "\n不明なエラーコード: {code}\n"
+    "MT5の公式ドキュメントを確認してください"
+)
+_LOGIN_ERROR_DEFAULT_HELP = (
+    "\n考えられる原因:\n"
+    "1. アカウント番号が間違っている\n"
+    "2. パスワードが間違っている\n"
+    "3. サーバー名が間違っている（デモサーバー名を確認してください）\n"
+    "4. アカウントが無効化されている\n"
+    "5. ネットワーク接続の問題\n"
+    "\n確認事項:\n"
+    "- MT5のターミナルで手動ログインできるか確認してください\n"
+    "- デモサーバー名は通常、ブローカー名の後に「- Demo」が付きます\n"
+    "- 例: 「YourBroker-Demo」または「YourBroker Demo」"
+)
+
+
+class _HelpContext(dict):
+    """対処法の整形に使う値（渡されなかった値は「不明」と表示し、KeyErrorにしない）"""
+    
+    def __missing__(self, key):
+        return "不明"
+
+
+def _log_mt5_error(title, error_code, error_description, help_table, default_help="", **context):
+    """
+    MT5のエラーと対処法をまとめて出力（ERRORレベルが無効な場合は整形しない）
+    
+    Args:
+        title: エラーの見出し
+        error_code: MT5のエラーコード
+        error_description: エラーの説明
+        help_table: エラーが発生した段階の対処法の表（_INIT_ERROR_HELPなど）
+        default_help: 表にないエラーコードの場合の対処法
+        **context: 対処法に埋め込む値（path, login, password_mask, server）
+    """
+    if not logger.isEnabledFor(logging.ERROR):
+        return
+    help_text = help_table.get(error_code, default_help).format_map(_HelpContext(context, code=error_code))
+    logger.error("%s\n%s\n%s\nエラーコード: %s\nエラー説明: %s%s",
+                 _ERROR_SEPARATOR, title, _ERROR_SEPARATOR, error_code, error_description, help_text)
+
+
+class _Flight:
+    """実行中の問い合わせ（後から来た呼び出しはeventを待ってresultを受け取る）"""
+    
+    __slots__ = ('event', 'result')
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
 
 
 class MT5Connector:
     """MetaTrader 5への接続を管理するクラス"""
     
-    def __init__(self, login=None, password=None, server=None, path=None):
+    def __init__(self, login=None, password=None, server=None, path=None, rates_cache_dir=None):
         """
         MT5接続を初期化
         
@@ -78,18 +347,44 @@ class MT5Connector:
             password: MT5パスワード（Noneの場合は自動検出）
             server: ブローカーサーバー名（Noneの場合は自動検出）
             path: MT5のインストールパス（Noneの場合は自動検出）
+            rates_cache_dir: レートデータのディスクキャッシュの保存先（Noneの場合は環境変数MT5_RATES_CACHE_DIR、未設定なら無効）
         """
         # 環境変数から取得、なければ引数を使用
         import os
-        self.login = login or os.getenv('MT5_LOGIN')
+        self.login = login or os.getenv('MT5_LOGIN') or None
+        # アカウント番号は整数で扱う（不正な値は接続前に検出する）
+        if self.login is not None:
+            try:
+                self.login = int(self.login)
+            except (TypeError, ValueError):
+                raise ValueError(f"MT5_LOGINは整数のアカウント番号である必要があります: {self.login!r}")
         self.password = password or os.getenv('MT5_PASSWORD')
         self.server = server or os.getenv('MT5_SERVER')
         self.path = path
         self.connected = False
+        self._cache = {}  # MT5への問い合わせ結果: {(kind, key): (value, expires_at)}
+        self._cache_lock = threading.Lock()
+        self._inflight = {}  # 実行中の問い合わせ: {key: _Flight}
+        self._inflight_lock = threading.Lock()
+        self._pool = None  # 複数シンボルの並列取得用（connectで作成、disconnectで終了）
+        self._heartbeat_thread = None
+        self._heartbeat_stop = threading.Event()
+        self._order_tmpl = None  # 注文リクエストの固定部分（MT5の定数を使うためconnectで作成）
+        self._selected_symbols = set()  # 確認・有効化済みのシンボル（セッション中は再確認しない）
+        self._last_bar_times = {}  # get_rates_sinceで前回返した最新の足の時刻（エポック秒）: {(symbol, timeframe): int}
+        
+        # レートデータのディスクキャッシュ（再起動後も確定済みの足を取得し直さない）
+        self._rates_cache = None
+        rates_cache_dir = rates_cache_dir or os.getenv('MT5_RATES_CACHE_DIR')
+        if rates_cache_dir:
+            if HAS_PYARROW:
+                self._rates_cache = RatesDiskCache(rates_cache_dir)
+            else:
+                print("[警告] pyarrowがインストールされていないため、レートデータのディスクキャッシュは無効です")
     
     def connect(self):
         """MT5に接続"""
-        if mt5 is None:
+        if _ensure_mt5() is None:
             print("=" * 60)
             print("エラー: MetaTrader5モジュールが利用できません。")
             print("=" * 60)
@@ -120,41 +415,21 @@ class MT5Connector:
             error_code = error[0]
             error_description = error[1]
             
-            print("=" * 60)
-            print("MT5初期化エラー")
-            print("=" * 60)
-            print(f"エラーコード: {error_code}")
-            print(f"エラー説明: {error_description}")
-            
-            if error_code == -2:  # Invalid "path" argument
-                print("\n考えられる原因:")
-                print("1. MT5のパスが無効です")
-                print(f"   → 現在のパス: {self.path}")
-                print("   → MT5のターミナルが既に起動している場合は、パスをNoneに設定してください")
-                print("   → または、MT5のインストールディレクトリのパスを正しく指定してください")
-            elif error_code == 1:  # RES_S_OK以外
-                print("\n考えられる原因:")
-                print("1. MetaTrader 5が起動していない")
-                print("   → MT5を起動してから再度実行してください")
-                print("2. MT5のインストールパスが正しくない")
-                print(f"   → 現在のパス: {self.path}")
-                print("   → MT5のインストールディレクトリを確認してください")
-                print("3. MT5のPython APIが正しくインストールされていない")
-                print("   → pip install MetaTrader5 を実行してください")
-            elif error_code == 10004:  # TRADE_RETCODE_REQUOTE
-                print("\n考えられる原因:")
-                print("1. MT5が起動していない")
-                print("2. ネットワーク接続の問題")
-            else:
-                print(f"\n不明なエラーコード: {error_code}")
-                print("MT5の公式ドキュメントを確認してください")
+            _log_mt5_error(
+                "MT5初期化エラー", error_code, error_description, _INIT_ERROR_HELP, _INIT_ERROR_DEFAULT_HELP,
+                path=self.path, login=self.login, password_mask=self._password_mask(), server=self.server
+            )
             
             return False
         
         print("MT5の初期化に成功しました")
         
-        # MT5のプロセスが完全に起動するまで少し待機
-        time.sleep(3)  # 待機時間を長くする
+        # MT5のプロセスが応答するまで待機（既に起動している場合はすぐに抜ける）
+        deadline = time.monotonic() + INIT_READY_TIMEOUT
+        while time.monotonic() < deadline:
+            if mt5.terminal_info() is not None and mt5.account_info() is not None:
+                break
+            time.sleep(INIT_READY_POLL_INTERVAL)
         
         # まず、既にログインしているか確認
         account_info = mt5.account_info()
@@ -162,9 +437,9 @@ class MT5Connector:
             print(f"\n既にMT5にログインしています: {account_info.login}")
             print(f"  サーバー: {account_info.server}")
             # 既にログインしている場合、指定されたアカウントと一致するか確認
-            if self.login and str(account_info.login) == str(self.login):
+            if self.login and account_info.login == self.login:
                 print("指定されたアカウントで既にログイン済みです")
-                self.connected = True
+                self._on_connected()
                 return True
         
         # ログイン情報の確認
@@ -179,24 +454,17 @@ class MT5Connector:
             print(f"  アカウント: {self.login}")
             print(f"  サーバー: {self.server}")
             
-            # アカウント番号を整数に変換（文字列の場合は変換）
-            try:
-                login_int = int(self.login) if isinstance(self.login, str) else self.login
-            except (ValueError, TypeError):
-                login_int = self.login
-            
-            # ログインを複数回試行（リトライロジック）
-            max_retries = 3
-            retry_delay = 2
+            # ログインを複数回試行（IPCタイムアウトなど一時的なエラーは間隔を延ばしながら再試行）
             login_success = False
             
-            for attempt in range(max_retries):
+            for attempt in range(LOGIN_MAX_RETRIES):
                 if attempt > 0:
-                    print(f"\nログイン再試行中... ({attempt + 1}/{max_retries})")
-                    time.sleep(retry_delay)
+                    delay = _backoff_delay(attempt - 1)
+                    print(f"\nログイン再試行中... ({attempt + 1}/{LOGIN_MAX_RETRIES}, {delay:.1f}秒後)")
+                    time.sleep(delay)
                 
                 # MT5のlogin()は位置引数として呼び出す必要がある
-                if mt5.login(login_int, self.password, self.server):
+                if mt5.login(self.login, self.password, self.server):
                     login_success = True
                     break
                 else:
@@ -204,44 +472,19 @@ class MT5Connector:
                     error_code = error[0]
                     error_description = error[1]
                     print(f"  試行 {attempt + 1} 失敗: {error_description}")
+                    # 認証情報の誤りなどは再試行しても回復しないため、すぐに中止
+                    if error_code in UNRECOVERABLE_LOGIN_ERRORS:
+                        break
             
             if not login_success:
                 error = mt5.last_error()
                 error_code = error[0]
                 error_description = error[1]
                 
-                print("=" * 60)
-                print("MT5ログインエラー")
-                print("=" * 60)
-                print(f"エラーコード: {error_code}")
-                print(f"エラー説明: {error_description}")
-                
-                if error_code == -10005:  # IPC timeout
-                    print("\n【重要】IPC timeoutエラー")
-                    print("MT5のターミナルとの通信が確立されていません。")
-                    print("\n対処法:")
-                    print("1. MetaTrader 5のターミナルを手動で起動してください")
-                    print("2. MT5のターミナルで手動ログインしてください:")
-                    print(f"   - アカウント: {self.login}")
-                    print(f"   - パスワード: {'*' * len(self.password)}")
-                    print(f"   - サーバー: {self.server}")
-                    print("3. MT5のターミナルでログインが成功したことを確認してください")
-                    print("4. MT5のターミナルが起動した状態で、このプログラムを再度実行してください")
-                    print("\n注意:")
-                    print("- MT5のターミナルを起動してから、このプログラムを実行してください")
-                    print("- MT5のターミナルで手動ログインが成功する必要があります")
-                    print("- ターミナルを起動した後、数秒待ってからプログラムを実行してください")
-                else:
-                    print("\n考えられる原因:")
-                    print("1. アカウント番号が間違っている")
-                    print("2. パスワードが間違っている")
-                    print("3. サーバー名が間違っている（デモサーバー名を確認してください）")
-                    print("4. アカウントが無効化されている")
-                    print("5. ネットワーク接続の問題")
-                    print("\n確認事項:")
-                    print("- MT5のターミナルで手動ログインできるか確認してください")
-                    print("- デモサーバー名は通常、ブローカー名の後に「- Demo」が付きます")
-                    print("- 例: 「YourBroker-Demo」または「YourBroker Demo」")
+                _log_mt5_error(
+                    "MT5ログインエラー", error_code, error_description, _LOGIN_ERROR_HELP, _LOGIN_ERROR_DEFAULT_HELP,
+                    login=self.login, password_mask=self._password_mask(), server=self.server
+                )
                 
                 mt5.shutdown()
                 return False
@@ -272,21 +515,177 @@ class MT5Connector:
             print(f"  サーバー: {account_info.server}")
             print(f"  残高: {account_info.balance:.2f} {account_info.currency}")
         
-        self.connected = True
+        self._on_connected()
         return True
     
+    def _password_mask(self):
+        """エラー表示用にパスワードを伏せ字にする（未設定の場合はその旨を返す）"""
+        return '*' * len(self.password) if self.password else '未設定'
+    
+    def _on_connected(self):
+        """接続成功時の処理（接続状態の設定、並列取得用のスレッドプールとハートビートの開始）"""
+        self.connected = True
+        if self._order_tmpl is None:
+            self._order_tmpl = {
+                "action": mt5.TRADE_ACTION_DEAL,
+                "deviation": ORDER_DEVIATION,
+                "magic": DEFAULT_MAGIC,
+                "comment": "",
+                "type_time": mt5.ORDER_TIME_GTC,
+                "type_filling": mt5.ORDER_FILLING_IOC,
+            }
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=_pool_size_from_env(), thread_name_prefix="mt5")
+        if self._heartbeat_thread is None or not self._heartbeat_thread.is_alive():
+            self._heartbeat_stop.clear()
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat, name="mt5-heartbeat", daemon=True)
+            self._heartbeat_thread.start()
+    
+    def _heartbeat(self):
+        """
+        定期的にアカウント情報を取得してIPC接続を維持（バックグラウンドスレッド）
+        取得結果はキャッシュに入れ、注文前などの接続確認をキャッシュで済ませる
+        """
+        while not self._heartbeat_stop.wait(HEARTBEAT_INTERVAL):
+            if not self.connected:
+                break
+            try:
+                account_info = mt5.account_info()
+            except Exception as e:
+                print(f"[警告] ハートビートに失敗しました: {e}")
+                continue
+            if account_info is not None:
+                with self._cache_lock:
+                    self._cache[('account_info', None)] = (account_info, time.monotonic() + ACCOUNT_INFO_TTL)
+    
     def disconnect(self):
         """MT5から切断"""
+        self._heartbeat_stop.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join(timeout=1)
+            self._heartbeat_thread = None
+        if self._pool is not None:
+            # 実行中の取得の完了は待たない（MT5の終了で結果は使われないため）
+            self._pool.shutdown(wait=False)
+            self._pool = None
         if self.connected:
             mt5.shutdown()
             self.connected = False
+            self._invalidate_cache()
+            self._selected_symbols.clear()
+            self._last_bar_times.clear()
             print("MT5から切断しました")
     
+    def _cached(self, kind, key, ttl, loader):
+        """
+        MT5への問い合わせ結果をTTL付きでキャッシュ（Noneは接続断の可能性があるためキャッシュしない）
+        
+        Args:
+            kind: キャッシュの種類
+            key: キャッシュのキー
+            ttl: キャッシュの有効秒数
+            loader: キャッシュがない場合に呼び出す関数
+        
+        Returns:
+            loaderの戻り値
+        """
+        value = self._cache_get(kind, key)
+        if value is not None:
+            return value
+        
+        value = loader()
+        if value is not None:
+            with self._cache_lock:
+                self._cache[(kind, key)] = (value, time.monotonic() + ttl)
+        return value
+    
+    def _cache_get(self, kind, key):
+        """
+        有効期限内のキャッシュを取得（MT5には問い合わせない）
+        
+        Args:
+            kind: キャッシュの種類
+            key: キャッシュのキー
+        
+        Returns:
+            キャッシュされた値 または None
+        """
+        with self._cache_lock:
+            entry = self._cache.get((kind, key))
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+    
+    def _invalidate_cache(self, kind=None, key=None):
+        """
+        キャッシュを破棄
+        
+        Args:
+            kind: 破棄するキャッシュの種類（Noneの場合はすべて）
+            key: 破棄するキャッシュのキー（Noneの場合はkindのすべて）
+        """
+        with self._cache_lock:
+            if kind is None:
+                self._cache.clear()
+            elif key is not None:
+                self._cache.pop((kind, key), None)
+            else:
+                for cache_key in [k for k in self._cache if k[0] == kind]:
+                    del self._cache[cache_key]
+    
+    def _single_flight(self, key, loader):
+        """
+        同じキーの問い合わせが実行中であればその結果を待って共有し、MT5への重複した問い合わせを避ける
+        
+        Args:
+            key: 問い合わせのキー
+            loader: 問い合わせを行う関数
+        
+        Returns:
+            loaderの戻り値
+        """
+        with self._inflight_lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+        
+        if not leader:
+            # 先行する呼び出しの結果を待つ（タイムアウトした場合は自分で問い合わせる）
+            if flight.event.wait(SINGLE_FLIGHT_TIMEOUT):
+                return flight.result
+            return loader()
+        
+        try:
+            flight.result = loader()
+            return flight.result
+        finally:
+            # 失敗した場合も待っている呼び出しを解放する
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+    
+    def _account_info_cached(self, ttl=ACCOUNT_INFO_TTL):
+        """アカウント情報を取得（ttl秒間キャッシュ）"""
+        return self._cached('account_info', None, ttl, mt5.account_info)
+    
+    def _symbol_info_cached(self, symbol, ttl=SYMBOL_INFO_TTL):
+        """シンボル情報を取得（ttl秒間キャッシュ）"""
+        return self._cached(
+            'symbol_info', symbol, ttl,
+            lambda: self._single_flight(('symbol_info', symbol), lambda: mt5.symbol_info(symbol))
+        )
+    
+    def _tick_cached(self, symbol, ttl=TICK_TTL):
+        """最新のティックを取得（ttl秒間キャッシュ）"""
+        return self._cached('tick', symbol, ttl, lambda: mt5.symbol_info_tick(symbol))
+    
     def get_account_info(self):
         """アカウント情報を取得"""
         if not self.connected:
             return None
-        return mt5.account_info()
+        return self._account_info_cached()
     
     def get_rates(self, symbol, timeframe=None, count=100):
         """
@@ -300,7 +699,146 @@ class MT5Connector:
         Returns:
             pandas.DataFrame: OHLCデータ
         """
-        if mt5 is None:
+        if self._rates_cache is not None:
+            return self._get_rates_disk_cached(symbol, timeframe, count)
+        
+        rates = self.get_rates_np(symbol, timeframe, count)
+        if rates is None:
+            return None
+        return self._rates_to_df(rates)
+    
+    def _rates_to_df(self, rates):
+        """
+        MT5のレートデータをDataFrameに変換
+        
+        Args:
+            rates: copy_rates_*の戻り値（構造化配列）
+        
+        Returns:
+            pandas.DataFrame: OHLCデータ
+        """
+        # 構造化配列の各フィールドから直接DataFrameを作成（カラム名は作成時に小文字に統一）
+        # 時刻はエポック秒のint64をdatetime64として解釈し直す（要素ごとの変換をしない）
+        columns = {}
+        for name in rates.dtype.names:
+            if name == 'time':
+                columns['time'] = rates['time'].astype('int64', copy=False).view('datetime64[s]').astype('datetime64[ns]')
+            else:
+                columns[name.lower()] = rates[name]
+        return pd.DataFrame(columns)
+    
+    def _get_rates_disk_cached(self, symbol, timeframe, count):
+        """
+        ディスクキャッシュにない新しい足だけをMT5から取得し、キャッシュと合わせて返す
+        
+        Args:
+            symbol: 通貨ペア
+            timeframe: 時間足（Noneの場合はH1）
+            count: 取得するローソク足の数
+        
+        Returns:
+            pandas.DataFrame: OHLCデータ（最新のcount本） または None
+        """
+        if timeframe is None and mt5 is not None:
+            timeframe = mt5.TIMEFRAME_H1
+        
+        rates = None
+        cached = self._rates_cache.load(symbol, timeframe)
+        if cached is not None and len(cached) >= count:
+            # キャッシュの最新の足（形成中だった足）以降だけを取得
+            since = int(cached['time'].iloc[-1].timestamp())
+            rates = self._copy_rates_since(symbol, timeframe, since)
+        if rates is None:
+            rates = self.get_rates_np(symbol, timeframe, count)
+            if rates is None:
+                return None
+        
+        merged = self._rates_cache.update(symbol, timeframe, self._rates_to_df(rates))
+        return merged.iloc[-count:].reset_index(drop=True)
+    
+    def get_rates_since(self, symbol, timeframe=None, since=None, count=100):
+        """
+        指定した時刻以降の足だけを取得（差分取得用）
+        
+        Args:
+            symbol: 通貨ペア（例: "EURUSD"）
+            timeframe: 時間足（デフォルト: H1）
+            since: この時刻以降の足を取得（datetime/pandas.Timestamp/エポック秒）。
+                   Noneの場合は前回この関数で返した最新の足から取得し、初回はcount本を取得
+            count: 初回に取得するローソク足の数
+        
+        Returns:
+            pandas.DataFrame: OHLCデータ（sinceの足を含む） または None
+        """
+        if timeframe is None and mt5 is not None:
+            timeframe = mt5.TIMEFRAME_H1
+        
+        key = (symbol, timeframe)
+        if since is None:
+            since = self._last_bar_times.get(key)
+        elif not isinstance(since, (int, float)):
+            # レートデータの時刻と同じく、タイムゾーンなしの時刻はUTCとして扱う
+            since = pd.Timestamp(since).timestamp()
+        
+        if since is None:
+            rates = self.get_rates_np(symbol, timeframe, count)
+        else:
+            rates = self._copy_rates_since(symbol, timeframe, int(since))
+        if rates is None:
+            return None
+        
+        self._last_bar_times[key] = int(rates['time'][-1])
+        return self._rates_to_df(rates)
+    
+    def _copy_rates_since(self, symbol, timeframe, since):
+        """
+        指定した時刻（エポック秒）以降の足をcopy_rates_rangeで取得（同時に同じ要求があれば1回だけ取得）
+        
+        Args:
+            symbol: 通貨ペア
+            timeframe: 時間足
+            since: エポック秒
+        
+        Returns:
+            numpy.ndarray: レートデータの構造化配列 または None
+        """
+        return self._single_flight(
+            ('rates_since', symbol, timeframe, since),
+            lambda: self._copy_rates(symbol, timeframe, None, date_from=since)
+        )
+    
+    def get_rates_np(self, symbol, timeframe=None, count=100):
+        """
+        レートデータをMT5の構造化配列のまま取得（DataFrameを作らないため軽量）
+        
+        Args:
+            symbol: 通貨ペア（例: "EURUSD"）
+            timeframe: 時間足（デフォルト: H1）
+            count: 取得するローソク足の数
+        
+        Returns:
+            numpy.ndarray: time（エポック秒）, open, high, low, close, tick_volume, spread, real_volumeの構造化配列
+        """
+        # 複数のスレッドから同じレートデータを同時に要求された場合は1回だけ取得する
+        return self._single_flight(
+            ('rates', symbol, timeframe, count),
+            lambda: self._copy_rates(symbol, timeframe, count)
+        )
+    
+    def _copy_rates(self, symbol, timeframe, count, date_from=None):
+        """
+        接続とシンボルを確認してからレートデータを取得
+        
+        Args:
+            symbol: 通貨ペア
+            timeframe: 時間足（Noneの場合はH1）
+            count: 取得するローソク足の数
+            date_from: 指定した場合は、この時刻（エポック秒）以降のすべての足を取得（countは無視）
+        
+        Returns:
+            numpy.ndarray: レートデータの構造化配列 または None
+        """
+        if _ensure_mt5() is None:
             print("MetaTrader5モジュールが利用できません")
             return None
         
@@ -312,64 +850,131 @@ class MT5Connector:
             return None
         
         # MT5の接続状態を再確認
-        account_info = mt5.account_info()
+        account_info = self._account_info_cached()
         if account_info is None:
             print(f"[警告] MT5の接続が切れている可能性があります。シンボル {symbol} の取得をスキップします")
             self.connected = False
             return None
         
-        # シンボル情報を取得
-        symbol_info = mt5.symbol_info(symbol)
-        if symbol_info is None:
-            print(f"シンボル {symbol} が見つかりません")
-            print(f"[デバッグ] MT5接続状態: {'接続中' if self.connected else '未接続'}")
-            print(f"[デバッグ] アカウント情報: {'取得可能' if account_info else '取得不可'}")
-            # 利用可能なシンボルを確認（デバッグ用）
-            try:
-                symbols_total = mt5.symbols_total()
-                print(f"[デバッグ] MT5で利用可能なシンボル数: {symbols_total}")
-            except:
-                pass
-            return None
-        
-        # シンボルが有効でない場合は有効化
-        if not symbol_info.visible:
-            if not mt5.symbol_select(symbol, True):
-                print(f"シンボル {symbol} を有効化できませんでした")
+        # シンボルの確認と有効化はセッション中に1回だけ行う（一度有効化したシンボルは有効なまま）
+        if symbol not in self._selected_symbols:
+            # シンボル情報を取得
+            symbol_info = self._symbol_info_cached(symbol)
+            if symbol_info is None:
+                print(f"シンボル {symbol} が見つかりません")
+                print(f"[デバッグ] MT5接続状態: {'接続中' if self.connected else '未接続'}")
+                print(f"[デバッグ] アカウント情報: {'取得可能' if account_info else '取得不可'}")
+                # 利用可能なシンボルを確認（デバッグ用）
+                try:
+                    symbols_total = mt5.symbols_total()
+                    print(f"[デバッグ] MT5で利用可能なシンボル数: {symbols_total}")
+                except:
+                    pass
                 return None
+            
+            # シンボルが有効でない場合は有効化
+            if not symbol_info.visible:
+                if not mt5.symbol_select(symbol, True):
+                    print(f"シンボル {symbol} を有効化できませんでした")
+                    return None
+                # 有効化後のシンボル情報を次回取得し直す
+                self._invalidate_cache('symbol_info', symbol)
+            
+            self._selected_symbols.add(symbol)
         
         # レートデータを取得
-        rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, count)
+        if date_from is not None:
+            # サーバー時刻はUTCより進んでいる場合があるため、終了時刻には余裕を持たせる
+            rates = mt5.copy_rates_range(symbol, timeframe, date_from, int(time.time()) + 86400)
+        else:
+            rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, count)
         
         if rates is None or len(rates) == 0:
             print(f"レートデータを取得できませんでした: {mt5.last_error()}")
             return None
         
-        # DataFrameに変換
-        df = pd.DataFrame(rates)
-        df['time'] = pd.to_datetime(df['time'], unit='s')
-        
-        # カラム名を小文字に統一
-        df.columns = df.columns.str.lower()
-        
-        return df
+        return rates
     
     def get_current_price(self, symbol):
         """現在の価格を取得"""
         if not self.connected:
             return None
         
-        tick = mt5.symbol_info_tick(symbol)
+        tick = self._tick_cached(symbol)
         if tick is None:
             return None
         
+        # 時刻はエポック秒のまま返す（datetimeが必要な場合はtick_time_to_dtで変換）
         return {
             'bid': tick.bid,
             'ask': tick.ask,
             'last': tick.last,
-            'time': datetime.fromtimestamp(tick.time)
+            'time_epoch': tick.time
         }
     
+    def _run_batch(self, fn, symbols):
+        """
+        シンボルごとの取得をスレッドプールで並列に実行
+        
+        Args:
+            fn: シンボルを受け取って結果を返す関数
+            symbols: シンボル名のイテラブル
+        
+        Returns:
+            dict: {symbol: 結果}
+        """
+        if self._pool is None:
+            return {symbol: fn(symbol) for symbol in symbols}
+        
+        futures = {self._pool.submit(fn, symbol): symbol for symbol in symbols}
+        results = {}
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                results[symbol] = future.result()
+            except Exception as e:
+                print(f"[警告] シンボル {symbol} の取得に失敗しました: {e}")
+                results[symbol] = None
+        return results
+    
+    def get_rates_batch(self, symbols, timeframe=None, count=100):
+        """
+        複数シンボルのレートデータを並列に取得
+        
+        Args:
+            symbols: 通貨ペアのリスト
+            timeframe: 時間足（デフォルト: H1）
+            count: 取得するローソク足の数
+        
+        Returns:
+            dict: {symbol: pandas.DataFrame または None}
+        """
+        return self._run_batch(lambda symbol: self.get_rates(symbol, timeframe, count), set(symbols))
+    
+    def get_current_prices(self, symbols):
+        """
+        複数シンボルの現在価格を並列に取得（キャッシュ済みのシンボルはMT5に問い合わせない）
+        
+        Args:
+            symbols: 通貨ペアのリスト
+        
+        Returns:
+            dict: {symbol: get_current_priceの戻り値 または None}
+        """
+        if not self.connected:
+            return {symbol: None for symbol in symbols}
+        
+        results = {}
+        pending = []
+        for symbol in set(symbols):
+            if self._cache_get('tick', symbol) is not None:
+                results[symbol] = self.get_current_price(symbol)
+            else:
+                pending.append(symbol)
+        
+        results.update(self._run_batch(self.get_current_price, pending))
+        return results
+    
     def place_order(self, symbol, order_type, volume, price=None, sl=None, tp=None, comment="", magic=None):
         """
         注文を送信
@@ -387,20 +992,21 @@ class MT5Connector:
         Returns:
             tuple: (success, ticket, result) または (False, None, None)
                    success=Trueの場合、resultはMT5のorder_sendの戻り値
+                   結果が不明な注文で約定したか確認できなかった場合はsuccess=None（失敗と区別する）
         """
         if not self.connected:
             print("MT5に接続されていません")
             return False, None, None
         
         # MT5の接続状態を再確認
-        account_info = mt5.account_info()
+        account_info = self._account_info_cached()
         if account_info is None:
             print(f"[警告] MT5の接続が切れている可能性があります。注文を送信できません")
             self.connected = False
             return False, None, None
         
         # シンボル情報を取得
-        symbol_info = mt5.symbol_info(symbol)
+        symbol_info = self._symbol_info_cached(symbol)
         if symbol_info is None:
             print(f"シンボル {symbol} が見つかりません")
             print(f"[デバッグ] MT5接続状態: {'接続中' if self.connected else '未接続'}")
@@ -408,28 +1014,40 @@ class MT5Connector:
             return False, None, None
         
         # 価格が指定されていない場合は成行注文
+        refresh_price = price is None
         if price is None:
-            if order_type == mt5.ORDER_TYPE_BUY:
-                price = mt5.symbol_info_tick(symbol).ask
-            else:
-                price = mt5.symbol_info_tick(symbol).bid
+            tick = self._tick_cached(symbol)
+            if tick is None:
+                print(f"シンボル {symbol} の現在価格を取得できませんでした")
+                return False, None, None
+            price = tick.ask if order_type == mt5.ORDER_TYPE_BUY else tick.bid
+        
+        # MT5に送る前に注文内容を確認（拒否されることが明らかな注文は送信しない）
+        error = self._validate_order(symbol_info, volume, price, sl, tp)
+        if error:
+            print(f"注文内容が不正なため送信しません: {error}")
+            return False, None, None
+        
+        # 価格・SL・TPをシンボルの桁数に丸める
+        digits = symbol_info.digits
+        price = round(price, digits)
+        sl = round(sl, digits) if sl else sl
+        tp = round(tp, digits) if tp else tp
         
         # リクエストを作成
         # magic numberが指定されていない場合はデフォルト値を使用
-        magic_number = magic if magic is not None else 234000
-        
-        request = {
-            "action": mt5.TRADE_ACTION_DEAL,
-            "symbol": symbol,
-            "volume": volume,
-            "type": order_type,
-            "price": price,
-            "deviation": 20,
-            "magic": magic_number,
-            "comment": comment,
-            "type_time": mt5.ORDER_TIME_GTC,
-            "type_filling": mt5.ORDER_FILLING_IOC,
-        }
+        magic_number = magic if magic is not None else DEFAULT_MAGIC
+        
+        # 固定部分はテンプレートをコピーし、注文ごとに変わる項目だけを設定
+        request = self._order_tmpl.copy()
+        request.update(
+            symbol=symbol,
+            volume=volume,
+            type=order_type,
+            price=price,
+            magic=magic_number,
+            comment=comment,
+        )
         
         # SLとTPは値がある場合のみ追加（MT5では0を設定するとエラーになる場合がある）
         if sl and sl > 0:
@@ -437,8 +1055,29 @@ class MT5Connector:
         if tp and tp > 0:
             request["tp"] = tp
         
-        # 注文を送信
-        result = mt5.order_send(request)
+        # 結果が不明なエラーの際の約定確認用に、送信前のサーバー時刻（最新のティックの時刻）を記録
+        # （成行注文は価格に使ったティック、それ以外はキャッシュ済みのティックを使う）
+        if not refresh_price:
+            tick = self._tick_cached(symbol)
+        sent_after = getattr(tick, 'time', None)
+        
+        # 注文を送信（一時的なエラーの場合は価格を取り直して再送）
+        result, landed = self._send_order(
+            request,
+            refresh_price=refresh_price,
+            confirm=lambda: self._find_landed_position(symbol, magic_number, comment, sent_after)
+        )
+        if landed is ORDER_RESULT_UNKNOWN:
+            # 約定している可能性があるため失敗とは扱わない（呼び出し側で再エントリーを控える）
+            self._invalidate_cache('account_info')
+            logger.warning("注文の結果を確認できませんでした（MT5との通信が切れている可能性があります）: "
+                           "シンボル=%s, magic=%s, retcode=%s", symbol, magic_number,
+                           result.retcode if result is not None else None)
+            return None, None, result
+        if landed is not None:
+            self._invalidate_cache('account_info')
+            print(f"注文の約定を確認しました: チケット={landed.ticket}, シンボル={symbol}, タイプ={order_type}, ロット={volume}")
+            return True, landed.ticket, result
         
         # resultがNoneの場合のエラーハンドリング
         if result is None:
@@ -450,46 +1089,125 @@ class MT5Connector:
         if result.retcode != mt5.TRADE_RETCODE_DONE:
             error_code = result.retcode
             error_comment = result.comment
-            print(f"注文エラー: {error_code} - {error_comment}")
-            
-            # エラー10026: AutoTrading disabled by server
-            if error_code == 10026:
-                print("\n" + "=" * 60)
-                print("【重要】サーバー側で自動取引が無効になっています")
-                print("=" * 60)
-                print("\nこのエラーは、ブローカーのサーバー側で自動取引が制限されている場合に発生します。")
-                print("\n考えられる原因:")
-                print("1. デモ口座で自動取引が制限されている")
-                print("2. ブローカーの設定で自動取引が無効になっている")
-                print("3. アカウントタイプによって自動取引が許可されていない")
-                print("\n対処法:")
-                print("1. ブローカーのサポートに連絡して、自動取引が有効か確認してください")
-                print("2. アカウント設定で自動取引が有効になっているか確認してください")
-                print("3. 別のアカウントタイプ（例：リアル口座）で試してください")
-                print("4. ブローカーのウェブサイトで自動取引の設定を確認してください")
-                print("\n注意: 一部のブローカーでは、デモ口座で自動取引が制限されている場合があります。")
-                print("=" * 60)
-            # エラー10027: AutoTrading disabled by client
-            elif error_code == 10027:
-                print("\n" + "=" * 60)
-                print("【重要】自動取引が無効になっています")
-                print("=" * 60)
-                print("\nMT5のターミナルで自動取引を有効にする必要があります。")
-                print("\n手順:")
-                print("1. MT5のターミナルを開く")
-                print("2. ツール → オプション → エキスパートアドバイザー")
-                print("3. 「自動取引を許可する」にチェックを入れる")
-                print("4. または、MT5のターミナルのツールバーで「自動取引」ボタンをクリック")
-                print("   （通常、ツールバーの上部に「AutoTrading」ボタンがあります）")
-                print("5. ボタンが緑色になったことを確認してください")
-                print("6. その後、このプログラムを再度実行してください")
-                print("=" * 60)
+            logger.error("注文エラー: %s - %s%s", error_code, error_comment,
+                         _ORDER_ERROR_HELP.get(error_code, ""))
             
             return False, None, None
         
+        # 約定により残高・証拠金が変わるため、アカウント情報のキャッシュを破棄
+        self._invalidate_cache('account_info')
+        
         print(f"注文が成功しました: チケット={result.order}, シンボル={symbol}, タイプ={order_type}, ロット={volume}")
         return True, result.order, result
     
+    def _validate_order(self, symbol_info, volume, price, sl=None, tp=None):
+        """
+        注文内容をシンボルの取引条件と照合
+        
+        Args:
+            symbol_info: シンボル情報
+            volume: ロット数
+            price: 価格
+            sl: 損切り価格
+            tp: 利確価格
+        
+        Returns:
+            str: 不正な場合はその理由、問題がない場合は空文字列
+        """
+        if volume <= 0 or volume < symbol_info.volume_min or volume > symbol_info.volume_max:
+            return f"ロット数 {volume} が範囲外です（{symbol_info.volume_min}～{symbol_info.volume_max}）"
+        
+        # 浮動小数点の誤差を考慮してロットの刻みを確認
+        step = symbol_info.volume_step
+        if step > 0:
+            steps = (volume - symbol_info.volume_min) / step
+            if abs(steps - round(steps)) > 1e-6:
+                return f"ロット数 {volume} が刻み {step} に合っていません"
+        
+        # 損切り・利確が現在価格に近すぎないか確認（ストップレベル）
+        min_distance = symbol_info.trade_stops_level * symbol_info.point
+        if min_distance > 0:
+            if sl and sl > 0 and abs(price - sl) < min_distance:
+                return f"損切り {sl} が価格 {price} に近すぎます（最小距離: {min_distance}）"
+            if tp and tp > 0 and abs(price - tp) < min_distance:
+                return f"利確 {tp} が価格 {price} に近すぎます（最小距離: {min_distance}）"
+        
+        return ""
+    
+    def _send_order(self, request, refresh_price=False, confirm=None):
+        """
+        注文を送信（一時的なエラーは再送し、結果が不明なエラーは再送せずに約定を確認）
+        
+        Args:
+            request: order_sendに渡すリクエスト
+            refresh_price: 再送時に最新のティックで価格を更新するか（成行注文の場合）
+            confirm: 結果が不明なエラーの際に約定を確認する関数（約定していれば真の値、
+                     確認できなければORDER_RESULT_UNKNOWNを返す）
+        
+        Returns:
+            tuple: (result, confirmed) - resultはorder_sendの最後の戻り値（Noneの場合あり）、
+                   confirmedは結果が不明なエラーの後にconfirmが返した値（約定していなければNone）
+        """
+        result = None
+        for attempt in range(ORDER_MAX_RETRIES):
+            if attempt > 0:
+                time.sleep(_backoff_delay(attempt - 1, ORDER_BASE_DELAY, ORDER_MAX_DELAY))
+                if refresh_price:
+                    symbol = request["symbol"]
+                    self._invalidate_cache('tick', symbol)
+                    tick = self._tick_cached(symbol)
+                    if tick is not None:
+                        request["price"] = tick.ask if request["type"] == mt5.ORDER_TYPE_BUY else tick.bid
+            
+            result = mt5.order_send(request)
+            if result is None or result.retcode == mt5.TRADE_RETCODE_DONE:
+                break
+            
+            if result.retcode in AMBIGUOUS_ORDER_RETCODES:
+                # 通信の問題で結果が不明な場合は、二重約定を避けるため再送せずに約定したかどうかを確認
+                if confirm is not None:
+                    return result, confirm() or None
+                break
+            
+            if result.retcode not in TRANSIENT_ORDER_RETCODES:
+                # 自動取引の無効化や証拠金不足などは再試行しても回復しない
+                break
+            
+            logger.warning("注文エラー: %s - %s（再試行します %d/%d）",
+                           result.retcode, result.comment, attempt + 1, ORDER_MAX_RETRIES - 1)
+        
+        return result, None
+    
+    def _find_landed_position(self, symbol, magic, comment, sent_after):
+        """
+        結果が不明な注文が約定したかを、送信後に開かれた同じシンボル・magic number・コメントのポジションで確認
+        （結果が不明なエラーが返った場合にだけ呼び出す）
+        
+        Args:
+            symbol: シンボル名
+            magic: Magic number
+            comment: 注文のコメント
+            sent_after: 送信前のサーバー時刻（エポック秒、取得できなかった場合はNone）
+        
+        Returns:
+            約定したポジション、約定していなければNone、
+            ポジションを取得できず確認できなければORDER_RESULT_UNKNOWN
+        """
+        if sent_after is None:
+            return ORDER_RESULT_UNKNOWN
+        
+        # 切断時はpositions_getがNoneを返すため、空（約定なし）とは区別する
+        positions = mt5.positions_get(symbol=symbol)
+        if positions is None:
+            return ORDER_RESULT_UNKNOWN
+        
+        comment = comment[:ORDER_COMMENT_MAX_LENGTH]
+        return next(
+            (pos for pos in positions
+             if pos.magic == magic and pos.comment == comment and pos.time >= sent_after),
+            None
+        )
+    
     def close_position(self, ticket):
         """
         ポジションを決済
@@ -518,39 +1236,68 @@ class MT5Connector:
         # 決済注文を作成
         order_type = mt5.ORDER_TYPE_SELL if position.type == mt5.ORDER_TYPE_BUY else mt5.ORDER_TYPE_BUY
         
-        request = {
-            "action": mt5.TRADE_ACTION_DEAL,
-            "symbol": position.symbol,
-            "volume": position.volume,
-            "type": order_type,
-            "position": ticket,
-            "deviation": 20,
-            "magic": 234000,
-            "comment": "Close position",
-            "type_time": mt5.ORDER_TIME_GTC,
-            "type_filling": mt5.ORDER_FILLING_IOC,
-        }
+        request = self._order_tmpl.copy()
+        request.update(
+            symbol=position.symbol,
+            volume=position.volume,
+            type=order_type,
+            position=ticket,
+            comment="Close position",
+        )
         
-        result = mt5.order_send(request)
+        # 結果が不明なエラーの場合は、ポジションが残っていないことで決済を確認
+        # （切断時はpositions_getがNoneを返すため、Noneは決済を確認できなかったものとして扱う）
+        def confirm_closed():
+            remaining = mt5.positions_get(ticket=ticket)
+            return remaining is not None and len(remaining) == 0
         
-        if result.retcode != mt5.TRADE_RETCODE_DONE:
-            print(f"決済エラー: {result.retcode} - {result.comment}")
-            return False, None, None
+        result, closed = self._send_order(request, confirm=confirm_closed)
         
-        # 決済後の残高を取得
-        account_info = mt5.account_info()
+        if closed is None:
+            # 切断時などはorder_sendがNoneを返す
+            if result is None:
+                print(f"決済エラー: result is None (エラーコード: {mt5.last_error()})")
+                return False, None, None
+            
+            if result.retcode != mt5.TRADE_RETCODE_DONE:
+                print(f"決済エラー: {result.retcode} - {result.comment}")
+                return False, None, None
+        
+        # 決済後の残高を取得（決済で残高が変わるため、キャッシュを破棄してから取得）
+        self._invalidate_cache('account_info')
+        account_info = self._account_info_cached()
         balance_after = account_info.balance if account_info else None
         
         print(f"ポジション {ticket} を決済しました（利益: {profit_before:.2f}）")
         return True, profit_before, balance_after
     
-    def get_positions(self, symbol=None, magic=None):
+    def _positions_get(self, symbol=None, group=None):
+        """
+        MT5からポジションを取得（シンボルまたはグループで絞り込んでから受け取る）
+        
+        Args:
+            symbol: シンボル名（指定した場合はgroupより優先）
+            group: シンボルのグループ条件（例: "*USD*"）
+        
+        Returns:
+            tuple: ポジションのタプル（取得できない場合は空）
+        """
+        if symbol:
+            positions = mt5.positions_get(symbol=symbol)
+        elif group:
+            positions = mt5.positions_get(group=group)
+        else:
+            positions = mt5.positions_get()
+        return positions if positions is not None else ()
+    
+    def get_positions(self, symbol=None, magic=None, group=None):
         """
         開いているポジションを取得
         
         Args:
             symbol: シンボル名（Noneの場合はすべてのシンボル）
             magic: Magic number（Noneの場合はすべてのmagic number）
+            group: symbolを指定しない場合のシンボルのグループ条件（例: "*USD*"）。MT5側で絞り込むため転送量が減る
         
         Returns:
             list: ポジションのリスト
@@ -558,17 +1305,44 @@ class MT5Connector:
         if not self.connected:
             return []
         
-        if symbol:
-            positions = mt5.positions_get(symbol=symbol)
-        else:
-            positions = mt5.positions_get()
-        
-        if positions is None:
-            return []
+        positions = self._positions_get(symbol, group)
         
-        # magic numberでフィルタリング
+        # magic numberでフィルタリング（MT5側にはmagic numberの絞り込みがない）
         if magic is not None:
-            positions = [pos for pos in positions if pos.magic == magic]
+            return [pos for pos in positions if pos.magic == magic]
+        
+        return list(positions)
+    
+    def get_positions_snapshot(self):
+        """
+        開いているすべてのポジションを取得（取得できない場合は空のリストと区別してNoneを返す）
+        
+        Returns:
+            list: ポジションのリスト または None（未接続、または切断などで取得できなかった場合）
+        """
+        if not self.connected:
+            return None
+        
+        positions = mt5.positions_get()
+        return list(positions) if positions is not None else None
+    
+    def get_position(self, symbol=None, magic=None, group=None):
+        """
+        条件に一致する最初のポジションを取得（一致した時点で探索を打ち切る）
+        
+        Args:
+            symbol: シンボル名（Noneの場合はすべてのシンボル）
+            magic: Magic number（Noneの場合はすべてのmagic number）
+            group: symbolを指定しない場合のシンボルのグループ条件
+        
+        Returns:
+            ポジション または None
+        """
+        if not self.connected:
+            return None
         
-        return positions
+        positions = self._positions_get(symbol, group)
+        if magic is None:
+            return positions[0] if positions else None
+        return next((pos for pos in positions if pos.magic == magic), None)
 
@@ -0,0 +1,58 @@
+"""
+ポジション情報
+"""
+
+
+class Position:
+    """保有ポジションの情報（__slots__で属性を固定し、辞書よりも省メモリで高速にアクセス）"""
+    
+    __slots__ = (
+        'ticket',
+        'side',
+        'entry_price',
+        'entry_time',
+        'entry_time_np',
+        'volume',
+        'sl',
+        'tp',
+        'comment',
+        'symbol',
+        'magic',
+        'entry_candle_time',
+    )
+    
+    def __init__(self, ticket, side, entry_price, entry_time, volume, sl, tp, comment, symbol, magic,
+                 entry_candle_time=None, entry_time_np=None):
+        """
+        ポジション情報を初期化
+        
+        Args:
+            ticket: チケット番号
+            side: 方向（'buy' または 'sell'）
+            entry_price: エントリー価格
+            entry_time: エントリー時刻
+            volume: ロット数
+            sl: 損切り価格
+            tp: 利確価格
+            comment: コメント（戦略名を含む）
+            symbol: シンボル名
+            magic: Magic number
+            entry_candle_time: エントリー時のローソク足の時刻（不明な場合はNone）
+            entry_time_np: エントリー時刻のnumpy.datetime64（ローソク足の時刻と同じ基準、不明な場合はNone）
+        """
+        self.ticket = ticket
+        self.side = side
+        self.entry_price = entry_price
+        self.entry_time = entry_time
+        self.volume = volume
+        self.sl = sl
+        self.tp = tp
+        self.comment = comment
+        self.symbol = symbol
+        self.magic = magic
+        self.entry_candle_time = entry_candle_time
+        self.entry_time_np = entry_time_np
+    
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"Position({fields})"
@@ -0,0 +1,115 @@
+"""
+レートデータのディスクキャッシュ
+"""
+import os
+import hashlib
+import threading
+import importlib.util
+import pandas as pd
+
+# DataFrame.to_parquet / read_parquet で使用（有無の確認だけなのでimportはしない）
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+# 1つのファイルに保持する最大本数（古い足から削除）
+RATES_CACHE_MAX_ROWS = 10000
+
+
+class RatesDiskCache:
+    """確定済みのローソク足を(symbol, timeframe)ごとにParquetファイルへ保存するクラス"""
+    
+    def __init__(self, cache_dir=".cache/rates", max_rows=RATES_CACHE_MAX_ROWS):
+        """
+        ディスクキャッシュを初期化
+        
+        Args:
+            cache_dir: キャッシュファイルを保存するディレクトリ
+            max_rows: 1つのファイルに保持する最大本数
+        """
+        self.cache_dir = cache_dir
+        self.max_rows = max_rows
+        self._frames = {}  # 読み込み済みのデータ: {(symbol, timeframe): DataFrame}
+        self._saved_closed_times = {}  # ファイルに保存済みの最新の確定足の時刻: {(symbol, timeframe): Timestamp}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def _path(self, symbol, timeframe):
+        """キャッシュファイルのパス（シンボル名に使えない文字が含まれてもよいようにMD5をファイル名にする）"""
+        digest = hashlib.md5(f"{symbol}:{timeframe}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.parquet")
+    
+    def load(self, symbol, timeframe):
+        """
+        キャッシュ済みのレートデータを取得（ファイルの読み込みは初回のみ）
+        
+        Args:
+            symbol: シンボル名
+            timeframe: 時間足
+        
+        Returns:
+            pandas.DataFrame: 時刻の昇順に並んだOHLCデータ または None
+        """
+        key = (symbol, timeframe)
+        with self._lock:
+            if key in self._frames:
+                return self._frames[key]
+        
+        path = self._path(symbol, timeframe)
+        df = None
+        if os.path.exists(path):
+            try:
+                df = pd.read_parquet(path)
+            except Exception as e:
+                print(f"[警告] レートデータのキャッシュを読み込めませんでした（{path}）: {e}")
+        
+        with self._lock:
+            self._frames[key] = df
+            if df is not None:
+                self._saved_closed_times[key] = _last_closed_time(df)
+        return df
+    
+    def update(self, symbol, timeframe, new_df):
+        """
+        新しく取得したレートデータをキャッシュに追加して保存
+        
+        Args:
+            symbol: シンボル名
+            timeframe: 時間足
+            new_df: 新しく取得したOHLCデータ
+        
+        Returns:
+            pandas.DataFrame: 追加後のOHLCデータ（時刻の昇順、重複なし）
+        """
+        cached = self.load(symbol, timeframe)
+        if cached is not None and len(cached) > 0:
+            # 同じ時刻の足は新しく取得したもの（形成中の足の最新値）で上書き
+            older = cached[cached['time'] < new_df['time'].iloc[0]]
+            merged = pd.concat([older, new_df], ignore_index=True)
+        else:
+            merged = new_df
+        merged = merged.drop_duplicates('time', keep='last').iloc[-self.max_rows:].reset_index(drop=True)
+        
+        key = (symbol, timeframe)
+        closed_time = _last_closed_time(merged)
+        with self._lock:
+            self._frames[key] = merged
+            saved_time = self._saved_closed_times.get(key)
+        
+        # ファイルの書き込みは確定足が進んだ場合のみ（形成中の足の更新だけでは書き込まない）
+        # 形成中の足は次回の読み込み後に最新の値で上書きされるため、保存しなくてよい
+        if closed_time is not None and (saved_time is None or closed_time > saved_time):
+            try:
+                merged.to_parquet(self._path(symbol, timeframe), index=False)
+            except Exception as e:
+                print(f"[警告] レートデータのキャッシュを保存できませんでした: {e}")
+            else:
+                with self._lock:
+                    self._saved_closed_times[key] = closed_time
+        return merged
+
+
+def _last_closed_time(df):
+    """最新の確定足の時刻（最後の行は形成中の足として扱う、確定足がない場合はNone）"""
+    if len(df) < 2:
+        return None
+    return df['time'].iloc[-2]
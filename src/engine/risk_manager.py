@@ -4,18 +4,84 @@
 """
 import json
 import os
-from datetime import datetime, timedelta
+import time
+import threading
+from bisect import bisect_right
+from datetime import datetime
 from typing import Dict, List, Optional, Tuple
+import numpy as np
 
 try:
     import MetaTrader5 as mt5
 except ImportError:
     mt5 = None
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+# 曜日名 → datetime.weekday()の値
+WEEKDAYS = {
+    "monday": 0,
+    "tuesday": 1,
+    "wednesday": 2,
+    "thursday": 3,
+    "friday": 4,
+    "saturday": 5,
+    "sunday": 6,
+}
+MINUTES_PER_WEEK = 7 * 1440
+# 方向 → MT5のポジションタイプ（mt5.ORDER_TYPE_BUY = 0, mt5.ORDER_TYPE_SELL = 1）
+DIRECTION_TO_TYPE = {"buy": 0, "sell": 1}
+# ポジションのリスク計算用の配列の型
+POSITION_RISK_DTYPE = np.dtype([('entry', 'f8'), ('sl', 'f8'), ('volume', 'f8'), ('point', 'f8')])
+# シンボルのポイント（最小価格単位）が取得できない場合に使う値（FXの5桁表示に合わせる）
+FALLBACK_POINT = 1e-5
+# ロット数を整数に変換する倍率（0.001ロット単位）
+VOLUME_SCALE = 1000
+# MT5から取得したポジションを使い回す秒数
+POSITIONS_CACHE_TTL = 0.05
+
+
+class DailyStats:
+    """日次統計（__slots__で属性を固定し、辞書のキー検索なしで更新する）"""
+    
+    __slots__ = (
+        'daily_pnl',
+        'consecutive_losses',
+        'last_reset_date',
+        'daily_trades',
+    )
+    
+    def __init__(self, daily_pnl=0.0, consecutive_losses=0, last_reset_date=None, daily_trades=None):
+        """
+        日次統計を初期化
+        
+        Args:
+            daily_pnl: 当日の損益
+            consecutive_losses: 連続損失回数
+            last_reset_date: 最後にリセットした日付（未リセットの場合はNone）
+            daily_trades: 当日のトレードのリスト
+        """
+        self.daily_pnl = daily_pnl
+        self.consecutive_losses = consecutive_losses
+        self.last_reset_date = last_reset_date
+        self.daily_trades = daily_trades if daily_trades is not None else []
+    
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"DailyStats({fields})"
+
 
 class RiskManager:
     """リスク管理を行うクラス"""
     
+    # 読み込み済みの設定: {設定ファイルのパス: (更新時刻ns, 設定)}（パスごとに最新の1件だけ。ファイルが更新されない限り再解析しない）
+    _CONFIG_CACHE: Dict[str, Tuple[int, dict]] = {}
+    
     def __init__(self, config_path="config.json"):
         """
         リスクマネージャーを初期化
@@ -25,19 +91,45 @@ class RiskManager:
         """
         self.config_path = config_path
         self.config = self._load_config()
-        self.daily_stats = {
-            "daily_pnl": 0.0,
-            "consecutive_losses": 0,
-            "last_reset_date": None,
-            "daily_trades": []
-        }
+        # ニュースのブロック時間帯を事前に計算（開始時刻の昇順）
+        self._news_windows = self._build_news_windows()
+        self._news_starts = [start for start, _, _ in self._news_windows]
+        self._news_block_enabled = bool(self._news_windows)
+        # シンボル → 所属する相関グループのシンボル集合（複数のグループに属する場合は最初のグループ）
+        self._symbol_to_group = {}
+        for pairs in self.config.get("correlation_groups", {}).values():
+            group = frozenset(pairs)
+            for pair in pairs:
+                self._symbol_to_group.setdefault(pair, group)
+        # 取引可能な時間帯を1週間の分単位のビットマップに変換（月曜0:00が先頭）
+        self._trading_hours_enabled = self.config.get("trading_hours", {}).get("enabled", False)
+        self._hours_bitmap = self._build_hours_bitmap()
+        # チェックのたびに参照する設定値は事前に取り出しておく
+        self._max_total_risk = float(self.config.get("system", {}).get("max_total_risk", 1.5))
+        self._max_total_positions = int(self.config.get("position_limits", {}).get("max_total_positions", 2))
+        self.daily_stats = DailyStats()
+        # 日次統計の更新・リセットの排他制御（決済と日付変更の判定が別の戦略のスレッドから呼ばれるため）
+        self._stats_lock = threading.Lock()
+        # MT5から取得したポジション: (取得時刻, ポジション)
+        self._positions_cache = (0.0, ())
+        # シンボルごとのポイント（最小価格単位）: {symbol: point}（MT5から1回だけ取得）
+        self._symbol_points = {}
     
     def _load_config(self) -> dict:
-        """設定ファイルを読み込む"""
+        """設定ファイルを読み込む（同じ更新時刻のファイルは前回の解析結果を使い回す）"""
         if os.path.exists(self.config_path):
             try:
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                path = os.path.abspath(self.config_path)
+                mtime_ns = os.stat(path).st_mtime_ns
+                cached = RiskManager._CONFIG_CACHE.get(path)
+                if cached is not None and cached[0] == mtime_ns:
+                    return cached[1]
+                with open(self.config_path, 'rb') as f:
+                    data = f.read()
+                config = orjson.loads(data) if HAS_ORJSON else json.loads(data.decode('utf-8'))
+                # パスごとに最新の更新時刻の結果だけを保持（古い結果は上書きする）
+                RiskManager._CONFIG_CACHE[path] = (mtime_ns, config)
+                return config
             except Exception as e:
                 print(f"警告: 設定ファイルの読み込みに失敗しました: {e}")
                 return self._get_default_config()
@@ -46,6 +138,52 @@ class RiskManager:
             print("デフォルト設定を使用します")
             return self._get_default_config()
     
+    def _build_news_windows(self) -> List[Tuple[float, float, str]]:
+        """
+        設定のニュースイベントをブロック時間帯（エポック秒）に変換
+        
+        Returns:
+            list: (開始エポック秒, 終了エポック秒, イベント名) のリスト（開始時刻の昇順）
+        """
+        windows = []
+        for event in self.config.get("major_news", []):
+            try:
+                # イベント時刻の前後window_minutes分をブロック
+                event_ts = datetime.fromisoformat(event["time"]).timestamp()
+                window_seconds = event.get("block_minutes", 60) * 60
+                windows.append((event_ts - window_seconds, event_ts + window_seconds, event["name"]))
+            except (ValueError, KeyError) as e:
+                print(f"警告: ニュースイベントの解析に失敗: {e}")
+        windows.sort()
+        return windows
+    
+    def _build_hours_bitmap(self) -> bytearray:
+        """
+        設定の取引時間帯を1週間分（7 * 1440分）のビットマップに変換
+        
+        Returns:
+            bytearray: 取引可能な分は1、それ以外は0
+        """
+        bitmap = bytearray(MINUTES_PER_WEEK)
+        allowed_hours = self.config.get("trading_hours", {}).get("allowed_hours", [])
+        for hour_config in allowed_hours:
+            weekday = WEEKDAYS.get(hour_config.get("day", "").lower())
+            if weekday is None:
+                continue
+            try:
+                start_hour, start_minute = map(int, hour_config.get("start", "00:00").split(":"))
+                end_hour, end_minute = map(int, hour_config.get("end", "23:59").split(":"))
+            except ValueError as e:
+                print(f"警告: 取引時間帯の解析に失敗: {e}")
+                continue
+            # 終了時刻の分も含む（start <= 現在時刻 <= end）
+            offset = weekday * 1440
+            start = offset + start_hour * 60 + start_minute
+            end = offset + end_hour * 60 + end_minute
+            if start <= end:
+                bitmap[start:end + 1] = b"\x01" * (end - start + 1)
+        return bitmap
+    
     def _get_default_config(self) -> dict:
         """デフォルト設定を返す"""
         return {
@@ -114,65 +252,107 @@ class RiskManager:
             }
         }
     
+    def _get_mt5_positions(self):
+        """
+        MT5の全ポジションを取得（直前に取得したものはPOSITIONS_CACHE_TTL秒間使い回す）
+        
+        Returns:
+            tuple: ポジションのタプル（取得できない場合は空）
+        """
+        fetched_at, positions = self._positions_cache
+        now = time.monotonic()
+        if now - fetched_at > POSITIONS_CACHE_TTL:
+            positions = mt5.positions_get() or ()
+            self._positions_cache = (now, positions)
+        return positions
+    
+    def _symbol_point(self, symbol) -> float:
+        """
+        シンボルのポイント（最小価格単位）を取得（初回のみMT5に問い合わせる）
+        
+        Args:
+            symbol: シンボル名
+        
+        Returns:
+            float: ポイント（取得できない場合はFALLBACK_POINT）
+        """
+        point = self._symbol_points.get(symbol)
+        if point is None:
+            info = mt5.symbol_info(symbol) if mt5 is not None else None
+            point = info.point if info is not None and info.point > 0 else FALLBACK_POINT
+            self._symbol_points[symbol] = point
+        return point
+    
     # --- A: システム全体の総リスク管理 ----------------------
     
-    def current_total_risk(self) -> float:
+    def current_total_risk(self, positions=None) -> float:
         """
         現在の全ポジションのリスク（％）を合計して返す。
         計算式：リスク = (SL距離 / エントリー価格) * ロット * 100
         
+        Args:
+            positions: MT5のポジションのリスト（Noneの場合はMT5から取得）
+        
         Returns:
             float: 現在の総リスク（％）
         """
-        if mt5 is None:
-            return 0.0
-        
-        positions = mt5.positions_get()
         if positions is None:
+            if mt5 is None:
+                return 0.0
+            positions = self._get_mt5_positions()
+        
+        if len(positions) == 0:
             return 0.0
         
-        total_risk = 0.0
-        for p in positions:
-            entry = p.price_open
-            sl = p.sl
-            lot = p.volume
-            
-            if sl == 0:
-                continue  # SLが無いポジションは危険なので取らせないのが理想
-            
-            risk_pips = abs(entry - sl)
-            risk_pct = (risk_pips / entry) * lot * 100
-            total_risk += risk_pct
+        # エントリー価格・SL・ロット・ポイントを配列にまとめて一括計算
+        arr = np.fromiter(
+            ((p.price_open, p.sl, p.volume, self._symbol_point(p.symbol)) for p in positions),
+            dtype=POSITION_RISK_DTYPE,
+            count=len(positions)
+        )
         
-        return total_risk
+        # SLが無いポジションは除外（危険なので取らせないのが理想）
+        arr = arr[arr['sl'] != 0]
+        if len(arr) == 0:
+            return 0.0
+        
+        # SL距離（ティック数）とロットを整数で求め、浮動小数点の誤差は最後の割合の計算だけにする
+        point = arr['point']
+        entry = arr['entry']
+        distance_ticks = np.abs(np.rint(entry / point).astype(np.int64) - np.rint(arr['sl'] / point).astype(np.int64))
+        volume_units = np.rint(arr['volume'] * VOLUME_SCALE).astype(np.int64)
+        risk_units = distance_ticks * volume_units
+        return float((risk_units * point / entry).sum() * 100 / VOLUME_SCALE)
     
-    def allowed_to_open(self, new_trade_risk: float) -> bool:
+    def allowed_to_open(self, new_trade_risk: float, positions=None) -> bool:
         """
         新規エントリーの前にシステム全体のリスクをチェック。
         
         Args:
             new_trade_risk: 新規トレードのリスク（％）
+            positions: MT5のポジションのリスト（Noneの場合はMT5から取得）
         
         Returns:
             bool: エントリー可能かどうか
         """
-        total = self.current_total_risk()
-        max_risk = self.config.get("system", {}).get("max_total_risk", 1.5)
+        total = self.current_total_risk(positions)
         
-        if total + new_trade_risk > max_risk:
-            print(f"[RiskManager] 総リスクオーバー: {total + new_trade_risk:.2f}% > {max_risk}%")
+        if total + new_trade_risk > self._max_total_risk:
+            print(f"[RiskManager] 総リスクオーバー: {total + new_trade_risk:.2f}% > {self._max_total_risk}%")
             return False
         
         return True
     
-    def _calculate_trade_risk(self, entry_price: float, sl: float, lot_size: float) -> float:
+    def _calculate_trade_risk(self, entry_price: float, sl: float, lot_size: float,
+                              symbol: Optional[str] = None) -> float:
         """
-        新規トレードのリスク（％）を計算
+        新規トレードのリスク（％）を計算（current_total_riskと同じく整数のティック数で計算）
         
         Args:
             entry_price: エントリー価格
             sl: 損切り価格
             lot_size: ロットサイズ
+            symbol: シンボル名（Noneの場合はFALLBACK_POINTを使用）
         
         Returns:
             float: リスク（％）
@@ -180,13 +360,14 @@ class RiskManager:
         if entry_price == 0 or sl == 0:
             return 0.0
         
-        risk_pips = abs(entry_price - sl)
-        risk_pct = (risk_pips / entry_price) * lot_size * 100
-        return risk_pct
+        point = self._symbol_point(symbol) if symbol is not None else FALLBACK_POINT
+        distance_ticks = abs(round(entry_price / point) - round(sl / point))
+        volume_units = round(lot_size * VOLUME_SCALE)
+        return distance_ticks * volume_units * point / entry_price * 100 / VOLUME_SCALE
     
     # --- B: 相関グループの同方向制限 --------------------------
     
-    def correlated_pair_block(self, symbol: str, direction: str) -> bool:
+    def correlated_pair_block(self, symbol: str, direction: str, positions=None) -> bool:
         """
         symbol が属する相関グループを確認し、
         同方向のポジションが既にあればブロック。
@@ -194,94 +375,81 @@ class RiskManager:
         Args:
             symbol: シンボル
             direction: 方向（'buy' or 'sell'）
+            positions: MT5のポジションのリスト（Noneの場合はMT5から取得）
         
         Returns:
             bool: True=許可, False=ブロック
         """
-        if mt5 is None:
+        if mt5 is None and positions is None:
             return True
         
-        groups = self.config.get("correlation_groups", {})
-        target_group = None
-        
-        for group_name, pairs in groups.items():
-            if symbol in pairs:
-                target_group = pairs
-                break
-        
+        target_group = self._symbol_to_group.get(symbol)
         if not target_group:
             return True  # 相関グループに属してない → OK
         
-        positions = mt5.positions_get()
-        if positions is None:
+        # 方向はループの外で1回だけポジションタイプに変換（不明な方向は同方向になり得ない）
+        target_type = DIRECTION_TO_TYPE.get(direction)
+        if target_type is None:
             return True
         
+        if positions is None:
+            positions = self._get_mt5_positions()
+        
         for p in positions:
-            if p.symbol in target_group:
-                # mt5.ORDER_TYPE_BUY = 0, mt5.ORDER_TYPE_SELL = 1
-                p_direction = "buy" if p.type == 0 else "sell"
-                if (p.type == 0 and direction == "buy") or (p.type == 1 and direction == "sell"):
-                    print(f"[RiskManager] 相関ペア同方向ブロック: {p.symbol} 既に保有中")
-                    return False
+            if p.type == target_type and p.symbol in target_group:
+                print(f"[RiskManager] 相関ペア同方向ブロック: {p.symbol} 既に保有中")
+                return False
         
         return True
     
     # --- C: 極端ニュースフィルター ------------------------------
     
-    def news_block(self) -> bool:
+    def news_block(self, now: Optional[datetime] = None) -> bool:
         """
         極端ニュースの予定を config に書いておき、
         その前後は取引停止。
         
+        Args:
+            now: 現在時刻（Noneの場合は取得する）
+        
         Returns:
             bool: True=許可, False=ブロック
         """
-        now = datetime.now()
+        if not self._news_block_enabled:
+            return True
         
-        major_news = self.config.get("major_news", [])
-        for event in major_news:
-            try:
-                event_time = datetime.fromisoformat(event["time"])
-                window_minutes = event.get("block_minutes", 60)
-                
-                # イベント時刻の前後window_minutes分をブロック
-                time_diff_seconds = abs((event_time - now).total_seconds())
-                if time_diff_seconds <= window_minutes * 60:
-                    print(f"[RiskManager] 重大イベントブロック中: {event['name']}")
-                    return False
-            except (ValueError, KeyError) as e:
-                print(f"警告: ニュースイベントの解析に失敗: {e}")
-                continue
+        now = time.time() if now is None else now.timestamp()
+        
+        # 開始済みの時間帯だけを二分探索で絞り込み、終了していないものがあればブロック
+        for start, end, name in self._news_windows[:bisect_right(self._news_starts, now)]:
+            if now <= end:
+                print(f"[RiskManager] 重大イベントブロック中: {name}")
+                return False
         
         return True
     
     # --- 既存コードとの互換性のためのメソッド ------------------
     
-    def check_trading_hours(self) -> Tuple[bool, str]:
+    def check_trading_hours(self, now: Optional[datetime] = None) -> Tuple[bool, str]:
         """
         取引時間帯をチェック（既存コードとの互換性のため）
         
+        Args:
+            now: 現在時刻（Noneの場合は取得する）
+        
         Returns:
             tuple: (許可可否, 理由メッセージ)
         """
-        if not self.config.get("trading_hours", {}).get("enabled", False):
+        if not self._trading_hours_enabled:
             return True, ""
         
-        now = datetime.now()
-        current_day = now.strftime("%A").lower()
-        current_time = now.strftime("%H:%M")
-        
-        allowed_hours = self.config.get("trading_hours", {}).get("allowed_hours", [])
+        if now is None:
+            now = datetime.now()
+        if self._hours_bitmap[now.weekday() * 1440 + now.hour * 60 + now.minute]:
+            return True, ""
         
-        for hour_config in allowed_hours:
-            if hour_config.get("day", "").lower() == current_day:
-                start_time = hour_config.get("start", "00:00")
-                end_time = hour_config.get("end", "23:59")
-                
-                if start_time <= current_time <= end_time:
-                    return True, ""
-        
-        return False, f"取引時間外です（現在: {current_day} {current_time}）"
+        # 取引時間外の場合のみメッセージを整形
+        return False, f"取引時間外です（現在: {now.strftime('%A').lower()} {now.strftime('%H:%M')}）"
     
     def can_entry(self, positions: dict, symbol: str, direction: str,
                   entry_price: float, sl: float, lot_size: float,
@@ -302,31 +470,39 @@ class RiskManager:
         Returns:
             tuple: (許可可否, 理由メッセージのリスト)
         """
-        reasons = []
-        
-        # 1. 取引時間帯チェック
-        can_trade, msg = self.check_trading_hours()
-        if not can_trade:
-            reasons.append(msg)
-            return False, reasons
-        
-        # 2. ニュースブロックチェック
-        if not self.news_block():
-            reasons.append("重大イベントブロック中")
-            return False, reasons
-        
-        # 3. 相関ペアブロックチェック
-        if not self.correlated_pair_block(symbol, direction):
-            reasons.append(f"相関ペア同方向ブロック: {symbol}")
-            return False, reasons
-        
-        # 4. システム全体のリスクチェック
-        new_trade_risk = self._calculate_trade_risk(entry_price, sl, lot_size)
-        if not self.allowed_to_open(new_trade_risk):
-            reasons.append(f"総リスクオーバー: {self.current_total_risk() + new_trade_risk:.2f}%")
-            return False, reasons
-        
-        return True, reasons
+        # MT5のポジションは、MT5を使うチェックに到達した時点で1回だけ取得して共有
+        mt5_positions = []
+        
+        def get_positions():
+            if not mt5_positions:
+                mt5_positions.append(self._get_mt5_positions() if mt5 is not None else ())
+            return mt5_positions[0]
+        
+        new_trade_risk = self._calculate_trade_risk(entry_price, sl, lot_size, symbol)
+        
+        # 現在時刻は1回だけ取得し、時刻を使うチェックで共有（チェック間で時刻がずれないようにする）
+        now = datetime.now()
+        
+        # (判定, 不許可の理由) を処理の軽い順に並べ、最初に不許可となった時点で打ち切る
+        #   1. ニュースブロック: 予定が無ければ即許可、あっても開始時刻の二分探索のみ
+        #   2. 取引時間帯: 現在時刻の取得とビットマップの参照のみ
+        #   3. 相関ペアブロック: MT5のポジション取得が必要（以降のチェックと共有）
+        #   4. システム全体のリスク: ポジション全体の集計が必要なため最後
+        checks = (
+            (lambda: self.news_block(now),
+             lambda: "重大イベントブロック中"),
+            (lambda: self.check_trading_hours(now)[0],
+             lambda: self.check_trading_hours(now)[1]),
+            (lambda: self.correlated_pair_block(symbol, direction, get_positions()),
+             lambda: f"相関ペア同方向ブロック: {symbol}"),
+            (lambda: self.allowed_to_open(new_trade_risk, get_positions()),
+             lambda: f"総リスクオーバー: {self.current_total_risk(get_positions()) + new_trade_risk:.2f}%"),
+        )
+        
+        failed = next((reason for predicate, reason in checks if not predicate()), None)
+        if failed is None:
+            return True, []
+        return False, [failed()]
     
     def update_daily_stats(self, profit: float):
         """
@@ -335,20 +511,21 @@ class RiskManager:
         Args:
             profit: 決済時の利益
         """
-        self.daily_stats["daily_pnl"] += profit
-        
-        if profit < 0:
-            self.daily_stats["consecutive_losses"] += 1
-        else:
-            self.daily_stats["consecutive_losses"] = 0
+        with self._stats_lock:
+            stats = self.daily_stats
+            stats.daily_pnl += profit
+            
+            if profit < 0:
+                stats.consecutive_losses += 1
+            else:
+                stats.consecutive_losses = 0
     
-    def _update_daily_stats_from_log(self, stats: dict):
+    def reset_daily_stats(self, reset_date):
         """
-        トレードログから日次統計を更新（既存コードとの互換性のため）
+        日次統計をリセット（日付が変わった時に呼び出す）
         
         Args:
-            stats: 統計辞書（更新される）
+            reset_date: リセットした日付
         """
-        # 簡易実装: 実際のログファイルから読み込む場合はここを実装
-        # 現在は空の実装（既存のdaily_statsを使用）
-        pass
+        with self._stats_lock:
+            self.daily_stats = DailyStats(last_reset_date=reset_date)
@@ -3,6 +3,10 @@
 """
 import os
 import csv
+import time
+import queue
+import logging
+from contextlib import contextmanager
 from datetime import datetime
 import threading
 
@@ -19,6 +23,19 @@ except ImportError:
         HAS_MSVCRT = False
 
 
+# 追記用ファイルハンドルのバッファサイズ
+TRADE_LOG_BUFFER_SIZE = 1 << 16
+
+# 書き込みスレッドが1回にまとめて書き出す最大行数と、続く行を待つ最大秒数
+TRADE_LOG_BATCH_ROWS = 128
+TRADE_LOG_BATCH_WINDOW = 0.05
+
+# 書き込みスレッドを止めるための目印
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+
 class TradeLogger:
     """トレードログをCSVファイルに保存するクラス"""
     
@@ -40,6 +57,148 @@ class TradeLogger:
         # CSVファイルが存在しない場合はヘッダーを作成
         if not os.path.exists(log_file):
             self._write_header()
+        
+        # 追記用のファイルハンドルは開いたままにして、行ごとのopen/ロック/closeを避ける
+        self._fh = None
+        self._writer = None
+        self._open()
+        
+        # 書き込みはバックグラウンドスレッドでまとめて行い、呼び出し側はキューに入れるだけにする
+        self._queue = queue.SimpleQueue()
+        self._writer_thread = threading.Thread(target=self._drain, name="trade-logger", daemon=True)
+        self._writer_thread.start()
+    
+    def _open(self):
+        """追記用のファイルハンドルを開く"""
+        self._fh = open(self.log_file, 'a', buffering=TRADE_LOG_BUFFER_SIZE, encoding='utf-8', newline='')
+        self._writer = csv.writer(self._fh)
+    
+    @contextmanager
+    def _handle_lock(self):
+        """開いたままのファイルハンドルに対するファイルロック（他プロセスとの書き出しの競合を防ぐ）"""
+        if HAS_PORTALOCKER:
+            portalocker.lock(self._fh, portalocker.LOCK_EX)
+            try:
+                yield
+            finally:
+                portalocker.unlock(self._fh)
+        elif HAS_MSVCRT:
+            locked = False
+            try:
+                msvcrt.locking(self._fh.fileno(), msvcrt.LK_LOCK, 1)
+                locked = True
+            except (OSError, IOError):
+                # ロックに失敗した場合はスキップ（フォールバック）
+                pass
+            try:
+                yield
+            finally:
+                if locked:
+                    try:
+                        msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+                    except (OSError, IOError):
+                        pass
+        else:
+            # フォールバック: スレッドロックのみ（呼び出し側でself.lockを保持）
+            yield
+    
+    def _drain(self):
+        """キューに入った行をまとめてファイルに書き出す（バックグラウンドスレッド）"""
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            
+            # 続けて届く行を最大TRADE_LOG_BATCH_WINDOW秒待ち、1回の書き出しにまとめる
+            batch = []
+            markers = []
+            stop = False
+            deadline = time.monotonic() + TRADE_LOG_BATCH_WINDOW
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    markers.append(item)
+                else:
+                    batch.append(item)
+                if len(batch) >= TRADE_LOG_BATCH_ROWS:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            
+            try:
+                self._write_rows(batch)
+            except Exception as e:
+                logger.warning("  警告: トレードログの書き込みに失敗しました: %s", e)
+            
+            # flush()で待っている呼び出し側に、ここまでの行の書き出し完了を通知
+            for marker in markers:
+                marker.set()
+            if stop:
+                break
+    
+    def _write_rows(self, rows):
+        """
+        複数行をまとめてファイルに書き出す
+        
+        Args:
+            rows: CSVの行のリスト
+        """
+        if not rows:
+            return
+        with self.lock:
+            if self._fh is None:
+                self._open()
+            self._writer.writerows(rows)
+            with self._handle_lock():
+                self._fh.flush()
+    
+    def flush(self, timeout=None):
+        """
+        キューに入っているログをすべてファイルに書き出すまで待つ
+        
+        Args:
+            timeout: 待機する最大秒数（Noneの場合は無制限）
+        
+        Returns:
+            bool: 書き出しが完了したかどうか
+        """
+        if not self._writer_thread.is_alive():
+            return False
+        marker = threading.Event()
+        self._queue.put(marker)
+        return marker.wait(timeout)
+    
+    def close(self, timeout=5.0):
+        """
+        キューに入っているログを書き出してから書き込みスレッドを止め、ファイルを閉じる
+        
+        Args:
+            timeout: 書き込み完了を待つ最大秒数
+        """
+        if self._writer_thread.is_alive():
+            self._queue.put(_STOP)
+            self._writer_thread.join(timeout)
+            if self._writer_thread.is_alive():
+                logger.warning("警告: トレードログの書き込みが完了しないまま終了します")
+                return
+        with self.lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+                self._writer = None
+    
+    def __del__(self):
+        try:
+            self.close(timeout=1.0)
+        except Exception:
+            pass
     
     def _write_header(self):
         """CSVファイルのヘッダーを書き込む"""
@@ -157,9 +316,7 @@ class TradeLogger:
             ''   # balance_after（エントリー時は空欄）
         ]
         
-        with self._lock_file(mode='a') as f:
-            writer = csv.writer(f)
-            writer.writerow(row)
+        self._queue.put(row)
     
     def log_close(self, close_dict):
         """
@@ -200,7 +357,5 @@ class TradeLogger:
             close_dict.get('balance_after', '')
         ]
         
-        with self._lock_file(mode='a') as f:
-            writer = csv.writer(f)
-            writer.writerow(row)
+        self._queue.put(row)
 
@@ -0,0 +1,144 @@
+"""
+ローソク足データの配列表現（列ごとのnumpy配列）
+"""
+import threading
+import weakref
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+
+# 列ごとのnumpy配列（timeはint64のナノ秒、列がない場合はNone）
+Bars = namedtuple('Bars', ['time', 'open', 'high', 'low', 'close'])
+
+# 変換結果を保持するDataFrameの最大件数
+BARS_CACHE_SIZE = 32
+
+# 変換結果: {id(df): (DataFrameへの弱参照, 本数, Bars)}
+_bars_cache = {}
+_bars_cache_lock = threading.Lock()
+
+
+def _column(df, name):
+    """列をfloat64のnumpy配列として取得（dtypeが一致する場合はコピーしない）"""
+    if name not in df.columns:
+        return None
+    return df[name].to_numpy(dtype=np.float64)
+
+
+def to_bars(df):
+    """
+    DataFrameを列ごとのnumpy配列（Bars）に変換
+    同じDataFrameに対する変換結果は使い回すため、同じレートデータを判定する複数の戦略で変換は1回で済む
+    （変換後にDataFrameの値を書き換えた場合は反映されない）
+    
+    Args:
+        df: 価格データ（DataFrame または Bars）
+    
+    Returns:
+        Bars: 列ごとのnumpy配列（Barsが渡された場合はそのまま返す）
+    """
+    if isinstance(df, Bars):
+        return df
+    
+    key = id(df)
+    n = len(df)
+    with _bars_cache_lock:
+        entry = _bars_cache.get(key)
+    # idは解放済みのオブジェクトと重複することがあるため、弱参照で同じDataFrameか確認する
+    if entry is not None and entry[0]() is df and entry[1] == n:
+        return entry[2]
+    
+    time = None
+    if 'time' in df.columns:
+        # datetime64[ns]へ変換済みの場合はコピーせずにint64として参照
+        time = df['time'].values.astype('datetime64[ns]', copy=False).view('i8')
+    bars = Bars(time, _column(df, 'open'), _column(df, 'high'), _column(df, 'low'), _column(df, 'close'))
+    
+    try:
+        ref = weakref.ref(df)
+    except TypeError:
+        return bars
+    
+    with _bars_cache_lock:
+        _bars_cache[key] = (ref, n, bars)
+        # 古いもの（先に追加したもの）から削除
+        while len(_bars_cache) > BARS_CACHE_SIZE:
+            del _bars_cache[next(iter(_bars_cache))]
+    return bars
+
+
+def _position_value(position, name):
+    """ポジション情報（Positionまたはdict）から値を取得（ない場合はNone）"""
+    if isinstance(position, dict):
+        return position.get(name)
+    return getattr(position, name, None)
+
+
+def _entry_ns(position):
+    """ポジションのエントリー時刻をint64のナノ秒で取得（ない場合はNone）"""
+    entry_time_np = _position_value(position, 'entry_time_np')
+    if entry_time_np is not None:
+        return np.datetime64(entry_time_np, 'ns').astype(np.int64)
+    entry_time = _position_value(position, 'entry_time')
+    if not entry_time:
+        return None
+    # 文字列・datetime・Timestampのいずれでも1回の変換で済ませる
+    return np.int64(pd.Timestamp(entry_time).value)
+
+
+def find_entry_candle(times, position):
+    """
+    ポジションのエントリー時のローソク足時刻を取得
+    記録されていない場合はエントリー時刻以前の最後のローソク足を二分探索で探し、
+    見つかった時刻をポジション情報に保存する（探索はポジションごとに1回だけ）
+    
+    Args:
+        times: 時刻の配列（int64のナノ秒、昇順）
+        position: ポジション情報（Positionまたはdict）
+    
+    Returns:
+        pandas.Timestamp: エントリー時のローソク足時刻 または None（エントリーが時刻配列より前の場合もNone）
+    """
+    entry_candle_time = _position_value(position, 'entry_candle_time')
+    if entry_candle_time is not None:
+        return entry_candle_time
+    
+    entry_ns = _entry_ns(position)
+    if entry_ns is None:
+        return None
+    
+    index = int(np.searchsorted(times, entry_ns, side='right')) - 1
+    if index < 0:
+        return None
+    
+    entry_candle_time = pd.Timestamp(int(times[index]))
+    if isinstance(position, dict):
+        position['entry_candle_time'] = entry_candle_time
+    elif hasattr(position, 'entry_candle_time'):
+        position.entry_candle_time = entry_candle_time
+    return entry_candle_time
+
+
+def entry_before_window(times, position):
+    """
+    エントリーが時刻配列の最初のローソク足より前か判定
+    取得したレートの範囲より前にエントリーしたポジションは、少なくとも範囲内の本数は経過している
+    
+    Args:
+        times: 時刻の配列（int64のナノ秒、昇順）
+        position: ポジション情報（Positionまたはdict）
+    
+    Returns:
+        bool: 最初のローソク足より前にエントリーしている場合True（エントリー時刻が不明な場合はFalse）
+    """
+    if times is None or len(times) < 1:
+        return False
+    entry_candle_time = _position_value(position, 'entry_candle_time')
+    if entry_candle_time is not None:
+        entry_ns = np.datetime64(entry_candle_time, 'ns').astype(np.int64)
+    else:
+        entry_ns = _entry_ns(position)
+        if entry_ns is None:
+            return False
+    return bool(entry_ns < times[0])
@@ -1,17 +1,62 @@
 """
 ボリンジャーバンド戦略
 """
+import math
+import logging
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from collections import deque
+from datetime import datetime
+from .bars import to_bars, find_entry_candle, entry_before_window
+
+logger = logging.getLogger(__name__)
+
+
+# ボリンジャーバンドの期間と標準偏差の倍率
+BB_PERIOD = 20
+BB_NUM_STD = 2
+
+# ATRの期間
+ATR_PERIOD = 14
+
+# 時間経過による決済: エントリー時のローソク足の後にこの本数の足が確定したら決済
+EXIT_MAX_BARS = 18
+
+# 差分更新による丸め誤差の蓄積を防ぐため、この本数ごとに合計を計算し直す
+STATE_RESYNC_BARS = 1000
 
 
 class BollingerStrategy:
+    __slots__ = (
+        'symbol',
+        'name',
+        'magic',
+        'last_entry_date',
+        'lookback',
+        '_window',
+        '_sum',
+        '_sumsq',
+        '_tr_window',
+        '_tr_sum',
+        '_last_seen_time',
+        '_bars_since_resync',
+    )
+    
     def __init__(self, symbol="EURUSD"):
         self.symbol = symbol
         self.name = "bollinger"
         self.magic = 1001  # ボリンジャーバンド戦略のmagic number
         self.last_entry_date = None  # 1日1回制限のため
+        self.lookback = 21  # 判定に必要なローソク足の本数（ボリンジャーバンド20期間 + 前の足）
+        
+        # 確定足のローリング状態（新しい足が確定するたびにO(1)で更新）
+        self._window = deque(maxlen=BB_PERIOD)  # 直近の確定足の終値
+        self._sum = 0.0  # 終値の合計
+        self._sumsq = 0.0  # 終値の2乗の合計
+        self._tr_window = deque(maxlen=ATR_PERIOD)  # 直近の確定足のTrue Range
+        self._tr_sum = 0.0  # True Rangeの合計
+        self._last_seen_time = None  # 状態に反映済みの最新の確定足の時刻
+        self._bars_since_resync = 0
         
     def _calculate_bollinger_bands(self, df, period=20, num_std=2):
         """ボリンジャーバンドを計算"""
@@ -35,30 +80,186 @@ class BollingerStrategy:
         if len(df) < period + 1:
             return None
         
-        high = df['high']
-        low = df['low']
-        close = df['close']
+        high = df['high'].to_numpy(dtype=np.float64)
+        low = df['low'].to_numpy(dtype=np.float64)
+        close = df['close'].to_numpy(dtype=np.float64)
+        prev_close = np.roll(close, 1)
+        prev_close[0] = np.nan
         
-        # True Rangeの計算
-        tr1 = high - low
-        tr2 = abs(high - close.shift(1))
-        tr3 = abs(low - close.shift(1))
-        
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+        # True Rangeの計算（先頭の足は前の終値がないため高値-安値。fmaxはNaNを無視する）
+        tr = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
         
         # ATR（期間の平均）
-        atr = tr.rolling(window=period).mean()
+        return pd.Series(tr, index=df.index).rolling(window=period).mean()
+    
+    def _bollinger_tail(self, close, period=20, num_std=2):
+        """
+        判定に必要なボリンジャーバンドの値だけを末尾のスライスから計算
+        
+        Args:
+            close: 終値の配列（numpy.ndarray）
+            period: 期間
+            num_std: 標準偏差の倍率
+        
+        Returns:
+            tuple: (前の足の上限, 前の足の下限, 現在の足の中央線) または None
+        """
+        if len(close) < period + 1:
+            return None
+        
+        # 前の足（-2）までのperiod本（pandasのrolling().std()と同じく不偏標準偏差）
+        prev_window = close[-period - 1:-1]
+        prev_sma = prev_window.mean()
+        prev_std = prev_window.std(ddof=1)
+        
+        prev_upper = prev_sma + prev_std * num_std
+        prev_lower = prev_sma - prev_std * num_std
+        current_middle = close[-period:].mean()
+        
+        return prev_upper, prev_lower, current_middle
+    
+    def _atr_tail(self, high, low, close, period=14):
+        """
+        最新の足のATRだけを末尾のスライスから計算
+        
+        Args:
+            high: 高値の配列（numpy.ndarray）
+            low: 安値の配列（numpy.ndarray）
+            close: 終値の配列（numpy.ndarray）
+            period: 期間
+        
+        Returns:
+            float: 最新の足のATR または None
+        """
+        if len(close) < period + 1:
+            return None
+        
+        h = high[-period:]
+        l = low[-period:]
+        prev_close = close[-period - 1:-1]
+        
+        # True Range = max(高値-安値, |高値-前の終値|, |安値-前の終値|)
+        tr = np.maximum(np.maximum(h - l, np.abs(h - prev_close)), np.abs(l - prev_close))
+        
+        return tr.mean()
+    
+    def _reset_state(self, close, high, low):
+        """
+        末尾の確定足からローリング状態を作り直す（初回・足が連続しない場合）
+        
+        Args:
+            close: 終値の配列（最新の足は形成中として扱う）
+            high: 高値の配列
+            low: 安値の配列
+        """
+        closes = close[-BB_PERIOD - 1:-1]
+        self._window = deque(closes.tolist(), maxlen=BB_PERIOD)
+        self._sum = float(closes.sum())
+        self._sumsq = float(np.dot(closes, closes))
+        
+        # 確定足のTrue Range（前の終値が必要なため1本多く使う）
+        h = high[-ATR_PERIOD - 1:-1]
+        l = low[-ATR_PERIOD - 1:-1]
+        prev_close = close[-ATR_PERIOD - 2:-2]
+        tr = np.maximum(np.maximum(h - l, np.abs(h - prev_close)), np.abs(l - prev_close))
+        self._tr_window = deque(tr.tolist(), maxlen=ATR_PERIOD)
+        self._tr_sum = float(tr.sum())
+        
+        self._bars_since_resync = 0
+    
+    def _push_bar(self, close, high, low, prev_close):
+        """
+        確定した足を1本ローリング状態に追加
+        
+        Args:
+            close: 確定した足の終値
+            high: 確定した足の高値
+            low: 確定した足の安値
+            prev_close: その1本前の足の終値
+        """
+        if len(self._window) == BB_PERIOD:
+            evicted = self._window[0]
+            self._sum -= evicted
+            self._sumsq -= evicted * evicted
+        self._window.append(close)
+        self._sum += close
+        self._sumsq += close * close
+        
+        tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        if len(self._tr_window) == ATR_PERIOD:
+            self._tr_sum -= self._tr_window[0]
+        self._tr_window.append(tr)
+        self._tr_sum += tr
+        
+        self._bars_since_resync += 1
+        if self._bars_since_resync >= STATE_RESYNC_BARS:
+            self._sum = math.fsum(self._window)
+            self._sumsq = math.fsum(x * x for x in self._window)
+            self._tr_sum = math.fsum(self._tr_window)
+            self._bars_since_resync = 0
+    
+    def _rolling_values(self, times, close, high, low):
+        """
+        ローリング状態を最新の確定足まで進めて、判定に必要な値を取得
+        
+        Args:
+            times: 時刻の配列（int64のナノ秒、時刻列がない場合はNone）
+            close: 終値の配列
+            high: 高値の配列
+            low: 安値の配列
+        
+        Returns:
+            tuple: (前の足の上限, 前の足の下限, 現在の足の中央線, 現在の足のATR)
+                   状態を使えない場合（時刻列がない・本数不足）はNone
+        """
+        if times is None or len(close) < BB_PERIOD + 1:
+            return None
         
-        return atr
+        last_closed_time = int(times[-2])
+        if last_closed_time != self._last_seen_time or self._window[-1] != close[-2]:
+            # 前回から確定足が1本だけ進んでいれば差分更新、それ以外は作り直す
+            if (self._last_seen_time is not None and times[-3] == self._last_seen_time
+                    and self._window[-1] == close[-3]):
+                self._push_bar(float(close[-2]), float(high[-2]), float(low[-2]), float(close[-3]))
+            else:
+                self._reset_state(close, high, low)
+            self._last_seen_time = last_closed_time
+        
+        # 前の足（-2）までの20本のバンド（pandasのrolling().std()と同じく不偏標準偏差）
+        prev_sma = self._sum / BB_PERIOD
+        prev_var = max((self._sumsq - self._sum * prev_sma) / (BB_PERIOD - 1), 0.0)
+        prev_std = math.sqrt(prev_var)
+        prev_upper = prev_sma + prev_std * BB_NUM_STD
+        prev_lower = prev_sma - prev_std * BB_NUM_STD
+        
+        # 現在の足（形成中）を含む中央線とATR
+        current_close = float(close[-1])
+        current_middle = (self._sum - self._window[0] + current_close) / BB_PERIOD
+        current_high = float(high[-1])
+        current_low = float(low[-1])
+        last_close = float(close[-2])
+        current_tr = max(current_high - current_low, abs(current_high - last_close), abs(current_low - last_close))
+        current_atr = (self._tr_sum - self._tr_window[0] + current_tr) / ATR_PERIOD
+        
+        return prev_upper, prev_lower, current_middle, current_atr
     
     def should_entry(self, df):
-        """エントリー条件を満たすか判定"""
-        if df is None or len(df) < 21:  # ボリンジャーバンド20期間 + ATR14期間 + 前の足
+        """エントリー条件を満たすか判定（dfはDataFrameまたはBars）"""
+        if df is None:
+            return None
+        
+        # 列ごとのnumpy配列に変換（同じDataFrameは他の戦略と変換結果を共有し、全期間のrollingは行わず末尾のみ使用）
+        bars = to_bars(df)
+        times = bars.time
+        close = bars.close
+        high = bars.high
+        low = bars.low
+        if len(close) < 21:  # ボリンジャーバンド20期間 + ATR14期間 + 前の足
             return None
         
         # 現在の日付を取得（1日1回制限のため）
-        if 'time' in df.columns:
-            current_date = pd.to_datetime(df['time'].iloc[-1]).date()
+        if times is not None:
+            current_date = pd.Timestamp(int(times[-1])).date()
         else:
             current_date = datetime.now().date()
         
@@ -66,68 +267,52 @@ class BollingerStrategy:
         if self.last_entry_date == current_date:
             return None
         
-        # ボリンジャーバンドを計算
-        upper_band, middle_band, lower_band = self._calculate_bollinger_bands(df)
-        
-        if upper_band is None or middle_band is None or lower_band is None:
-            return None
-        
-        # 前の足（インデックス-2）と現在の足（インデックス-1）を取得
-        if len(df) < 2:
-            return None
+        # ボリンジャーバンドとATRを計算（確定足の状態を差分更新し、使えない場合は末尾のスライスから計算）
+        values = self._rolling_values(times, close, high, low)
+        if values is not None:
+            prev_upper, prev_lower, current_middle, current_atr = values
+        else:
+            bands = self._bollinger_tail(close, period=BB_PERIOD, num_std=BB_NUM_STD)
+            if bands is None:
+                return None
+            prev_upper, prev_lower, current_middle = bands
+            current_atr = None
         
         # 前のローソク足（-2）のデータを取得
-        prev_close = df['close'].iloc[-2]
-        prev_open = df['open'].iloc[-2]
-        prev_high = df['high'].iloc[-2]
-        prev_low = df['low'].iloc[-2]
-        prev_upper = upper_band.iloc[-2]
-        prev_lower = lower_band.iloc[-2]
+        prev_close = close[-2]
+        prev_high = high[-2]
+        prev_low = low[-2]
         
         # エントリー条件チェック
         # 前のローソク足（-2）がボリンジャーバンドの外側から内側に戻ったことを確認
-        side = None
+        # 上外→内：前のローソク足のhighが上限を超えていたが、終値が上限以下でクローズした
+        cond_sell = prev_high > prev_upper and prev_close <= prev_upper
+        # 下外→内：前のローソク足のlowが下限を下回っていたが、終値が下限以上でクローズした
+        cond_buy = prev_low < prev_lower and prev_close >= prev_lower
         
-        # 上外→内：前のローソク足が上限を超えていた（highが上限を超えている）が、
-        # 終値が上限以下でクローズした
-        # （より柔軟な条件：highが上限を超えていて、closeが上限以下）
-        if prev_high > prev_upper and prev_close <= prev_upper:
+        if cond_sell:
             side = "sell"  # ショート
-            print(f"[Bollinger] ショートエントリー条件検出:")
-            print(f"  prev_high: {prev_high:.5f} > prev_upper: {prev_upper:.5f}")
-            print(f"  prev_close: {prev_close:.5f} <= prev_upper: {prev_upper:.5f}")
-        
-        # 下外→内：前のローソク足が下限を下回っていた（lowが下限を下回っている）が、
-        # 終値が下限以上でクローズした
-        # （より柔軟な条件：lowが下限を下回っていて、closeが下限以上）
-        elif prev_low < prev_lower and prev_close >= prev_lower:
+        elif cond_buy:
             side = "buy"  # ロング
-            print(f"[Bollinger] ロングエントリー条件検出:")
-            print(f"  prev_low: {prev_low:.5f} < prev_lower: {prev_lower:.5f}")
-            print(f"  prev_close: {prev_close:.5f} >= prev_lower: {prev_lower:.5f}")
+        else:
+            side = None
+        
+        # 判定に使った値を1行で出力（DEBUGが無効な場合は整形されない）
+        logger.debug("[Bollinger] side=%s h=%.5f u=%.5f l=%.5f lb=%.5f c=%.5f cond_sell=%s cond_buy=%s",
+                     side, prev_high, prev_upper, prev_low, prev_lower, prev_close, cond_sell, cond_buy)
         
         if side is None:
-            # デバッグ情報を出力
-            print(f"[Bollinger] エントリー条件を満たしていません:")
-            print(f"  prev_high: {prev_high:.5f}, prev_upper: {prev_upper:.5f}")
-            print(f"  prev_low: {prev_low:.5f}, prev_lower: {prev_lower:.5f}")
-            print(f"  prev_close: {prev_close:.5f}")
-            print(f"  上外→内条件: prev_high > prev_upper and prev_close <= prev_upper")
-            print(f"    → {prev_high > prev_upper} and {prev_close <= prev_upper} = {prev_high > prev_upper and prev_close <= prev_upper}")
-            print(f"  下外→内条件: prev_low < prev_lower and prev_close >= prev_lower")
-            print(f"    → {prev_low < prev_lower} and {prev_close >= prev_lower} = {prev_low < prev_lower and prev_close >= prev_lower}")
             return None
         
         # ATRを計算して損切りを設定
-        atr = self._calculate_atr(df, period=14)
-        if atr is None or pd.isna(atr.iloc[-1]):
+        if current_atr is None:
+            current_atr = self._atr_tail(high, low, close, period=ATR_PERIOD)
+        if current_atr is None or np.isnan(current_atr):
             return None
         
-        current_atr = atr.iloc[-1]
-        current_price = df['close'].iloc[-1]
+        current_price = close[-1]
         
         # 損切り：ATRの3倍
-        current_middle = middle_band.iloc[-1]
         if side == "buy":
             sl = current_price - (current_atr * 3)
             tp = float(current_middle)  # 利確は中央線（should_exitでも判定）
@@ -141,32 +326,31 @@ class BollingerStrategy:
         return {
             "side": side,
             "sl": float(sl),
-            "tp": tp
+            "tp": tp,
+            # エントリー時のローソク足の時刻（決済時の経過本数のカウントに使用）
+            "entry_candle_time": pd.Timestamp(int(times[-1])) if times is not None else None
         }
     
     def should_exit(self, position, df):
-        """決済条件を満たすか判定"""
-        if position is None or df is None or len(df) < 1:
+        """決済条件を満たすか判定（dfはDataFrameまたはBars）"""
+        if position is None or df is None:
             return False
         
-        # エントリー時刻を取得（72時間後の強制決済のため）
-        entry_time = None
-        if hasattr(position, 'entry_time'):
-            entry_time = position.entry_time
-        elif isinstance(position, dict) and 'entry_time' in position:
-            entry_time = position['entry_time']
+        bars = to_bars(df)
+        close = bars.close
+        if len(close) < 1:
+            return False
         
         # まず、ボリンジャーバンドの中央線到達で決済するかチェック
         # （中央線到達の場合は、ローソク足の本数に関係なく決済）
         
         # ボリンジャーバンドの中央線を取得
-        upper_band, middle_band, lower_band = self._calculate_bollinger_bands(df)
-        if middle_band is None or len(middle_band) == 0:
+        if len(close) < 20:
             # 中央線が計算できない場合は、ローソク足の本数チェックに進む
             pass
         else:
-            current_close = df['close'].iloc[-1]
-            current_middle = middle_band.iloc[-1]
+            current_close = close[-1]
+            current_middle = close[-20:].mean()
             
             # ポジションの方向を取得
             side = None
@@ -181,59 +365,43 @@ class BollingerStrategy:
                 # ショートの場合：終値が中央線を下回る
                 if side == "buy":
                     if current_close > current_middle:
-                        print(f"[Bollinger] 中央線到達により決済: 終値={current_close:.5f}, 中央線={current_middle:.5f}")
+                        logger.debug("[Bollinger] 中央線到達により決済: 終値=%.5f, 中央線=%.5f", current_close, current_middle)
                         return True
                 elif side == "sell":
                     if current_close < current_middle:
-                        print(f"[Bollinger] 中央線到達により決済: 終値={current_close:.5f}, 中央線={current_middle:.5f}")
+                        logger.debug("[Bollinger] 中央線到達により決済: 終値=%.5f, 中央線=%.5f", current_close, current_middle)
                         return True
         
         # 中央線到達がなかった場合、4時間足18本経過で決済
-        entry_candle_time = None
-        if isinstance(position, dict) and 'entry_candle_time' in position:
-            entry_candle_time = position['entry_candle_time']
-        
-        # エントリー時のローソク足時刻が記録されていない場合は、エントリー時刻から推定
-        if entry_candle_time is None:
-            entry_time = None
-            if isinstance(position, dict) and 'entry_time' in position:
-                entry_time = position['entry_time']
-            
-            if entry_time:
-                # エントリー時刻をdatetimeに変換
-                if isinstance(entry_time, str):
-                    entry_time = pd.to_datetime(entry_time)
-                elif isinstance(entry_time, pd.Timestamp):
-                    pass
-                elif isinstance(entry_time, datetime):
-                    entry_time = pd.to_datetime(entry_time)
-                else:
-                    entry_time = pd.to_datetime(entry_time)
-                
-                # エントリー時刻以前の最後のローソク足を探す
-                if 'time' in df.columns:
-                    df_times = pd.to_datetime(df['time'])
-                    before_entry = df_times[df_times <= entry_time]
-                    if len(before_entry) > 0:
-                        entry_candle_time = before_entry.iloc[-1]
+        # ローソク足の時刻（int64のナノ秒）
+        df_times = bars.time
+        if df_times is None:
+            return False
+        
+        # 取得したレートより前にエントリーしている場合は本数を数えられないため、18本以上経過したものとして決済
+        if entry_before_window(df_times, position):
+            logger.debug("[Bollinger] エントリーが取得したレートより前のため決済: 最初のローソク足=%s",
+                         pd.Timestamp(int(df_times[0])))
+            return True
+        
+        # エントリー時のローソク足時刻は通常エントリー時に記録済み
+        # 記録されていない場合（辞書で渡された場合など）のみエントリー時刻から推定し、ポジション情報に保存する
+        entry_candle_time = find_entry_candle(df_times, position)
         
         # エントリー時のローソク足時刻が取得できた場合、4時間足18本経過をチェック
-        if entry_candle_time is not None and 'time' in df.columns:
-            # 現在のローソク足の時刻を取得（最新のローソク足）
-            current_candle_time = pd.to_datetime(df['time'].iloc[-1])
-            
-            # エントリー時のローソク足から現在のローソク足までの本数を計算
-            # 4時間足なので、時刻の差分から本数を計算
-            time_diff = current_candle_time - entry_candle_time
-            # 4時間 = 4 * 60 * 60 = 14400秒
-            candles_elapsed = int(time_diff.total_seconds() / 14400)
+        if entry_candle_time is not None:
+            # エントリー時のローソク足から現在のローソク足（最新のローソク足）までの本数を
+            # 時刻の差ではなく足の位置の差から数える（週末・休場で足がない時間は数えない）
+            entry_ns = np.datetime64(entry_candle_time, 'ns').astype(np.int64)
+            candles_elapsed = len(df_times) - int(np.searchsorted(df_times, entry_ns, side='right'))
             
             # デバッグ情報を出力
-            print(f"[Bollinger] ローソク足経過チェック: エントリー時のローソク足={entry_candle_time}, 現在のローソク足={current_candle_time}, 経過本数={candles_elapsed}本")
+            logger.debug("[Bollinger] ローソク足経過チェック: エントリー時のローソク足=%s, 現在のローソク足=%s, 経過本数=%d本",
+                         entry_candle_time, pd.Timestamp(int(df_times[-1])), candles_elapsed)
             
             # 18本経過で決済
-            if candles_elapsed >= 18:
-                print(f"[Bollinger] 4時間足18本経過により決済: 経過本数={candles_elapsed}本")
+            if candles_elapsed >= EXIT_MAX_BARS:
+                logger.debug("[Bollinger] 4時間足18本経過により決済: 経過本数=%d本", candles_elapsed)
                 return True
         
         return False
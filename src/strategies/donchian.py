@@ -2,9 +2,83 @@
 ドンチャンブレイクアウト戦略
 4時間足10期間のドンチャンラインを実線が突破してクローズした時のみエントリー
 """
+import logging
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from collections import OrderedDict, deque
+from .bars import to_bars, find_entry_candle, entry_before_window
+
+try:
+    import MetaTrader5 as mt5
+except ImportError:
+    mt5 = None
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+logger = logging.getLogger(__name__)
+
+
+def _rolling_max_min(high, low, period):
+    """
+    単調キューで過去period本の最高値・最安値を1回の走査で計算（Numbaでコンパイルして使用）
+    
+    Args:
+        high: 高値の配列（float64）
+        low: 安値の配列（float64）
+        period: 期間
+    
+    Returns:
+        tuple: (最高値の配列, 最安値の配列)（最初のperiod - 1本はNaN）
+    """
+    n = high.shape[0]
+    upper = np.full(n, np.nan)
+    lower = np.full(n, np.nan)
+    
+    # 値が単調減少（最高値用）・単調増加（最安値用）になるようにインデックスを保持するキュー
+    max_idx = np.empty(n, np.int64)
+    min_idx = np.empty(n, np.int64)
+    max_head = 0
+    max_tail = 0
+    min_head = 0
+    min_tail = 0
+    
+    for i in range(n):
+        # 新しい値以下（以上）の値は今後最高値（最安値）にならないため末尾から取り除く
+        while max_tail > max_head and high[max_idx[max_tail - 1]] <= high[i]:
+            max_tail -= 1
+        max_idx[max_tail] = i
+        max_tail += 1
+        while min_tail > min_head and low[min_idx[min_tail - 1]] >= low[i]:
+            min_tail -= 1
+        min_idx[min_tail] = i
+        min_tail += 1
+        
+        # 期間外になった先頭を取り除く
+        if max_idx[max_head] <= i - period:
+            max_head += 1
+        if min_idx[min_head] <= i - period:
+            min_head += 1
+        
+        if i >= period - 1:
+            upper[i] = high[max_idx[max_head]]
+            lower[i] = low[min_idx[min_head]]
+    
+    return upper, lower
+
+
+if HAS_NUMBA:
+    _rolling_max_min = njit(cache=True)(_rolling_max_min)
+
+
+# ドンチャンチャネルの計算結果を保持する最大件数
+CHANNEL_CACHE_SIZE = 16
+
+# 時間経過による決済: エントリー時のローソク足の後にこの本数の足が確定したら決済
+EXIT_MAX_BARS = 12
 
 
 class DonchianStrategy:
@@ -21,6 +95,17 @@ class DonchianStrategy:
         self.magic = 2001  # ドンチャンブレイクアウト戦略のmagic number
         self.period = period
         self.last_entry_date = None  # 1日1回制限のため
+        self.lookback = max(period + 1, 13)  # 判定に必要なローソク足の本数（ドンチャン期間 + 前の足、決済の12本経過 + 現在足）
+        self._channel_cache = OrderedDict()  # ドンチャンチャネルの計算結果: {(本数, 最新の足の時刻・高値・安値, 期間): (upper, lower)}
+        self.point = self.refresh_point()  # シンボルのpoint（許容誤差の計算に使用）
+        
+        # 確定足の最高値・最安値の単調キュー（新しい足が確定するたびに差分更新）
+        self._hi_deque = deque()  # (足の通し番号, 高値)（高値が単調減少）
+        self._lo_deque = deque()  # (足の通し番号, 安値)（安値が単調増加）
+        self._last_bar_index = -1  # 最後にキューに追加した確定足の通し番号
+        self._last_bar_time = None  # 最後にキューに追加した確定足の時刻
+        self._last_bar_high = None
+        self._last_bar_low = None
     
     def _calculate_donchian_channels(self, df, period=None):
         """
@@ -37,88 +122,97 @@ class DonchianStrategy:
             period = self.period
         
         if len(df) < period:
-            print(f"Donchian channels: insufficient data (len={len(df)}, period={period})")
+            logger.debug("Donchian channels: insufficient data (len=%d, period=%d)", len(df), period)
             return None, None
         
         # highとlowの存在確認
         if 'high' not in df.columns:
-            print(f"ERROR: 'high' column missing! Available columns: {df.columns.tolist()}")
+            logger.error("ERROR: 'high' column missing! Available columns: %s", df.columns.tolist())
             return None, None
         
         if 'low' not in df.columns:
-            print(f"ERROR: 'low' column missing! Available columns: {df.columns.tolist()}")
+            logger.error("ERROR: 'low' column missing! Available columns: %s", df.columns.tolist())
             return None, None
         
-        # 上限: 過去N期間の最高値
-        upper_band = df['high'].rolling(window=period).max()
+        # 同じデータ（本数と最新の足が同じ）に対する計算結果は使い回す
+        # 最新の足は形成中で高値・安値が変わるため、キーに含める
+        key = None
+        if 'time' in df.columns:
+            key = (len(df), df['time'].iat[-1], df['high'].iat[-1], df['low'].iat[-1], period)
+            cached = self._channel_cache.get(key)
+            if cached is not None:
+                self._channel_cache.move_to_end(key)
+                return cached
         
-        # 下限: 過去N期間の最低値
-        lower_band = df['low'].rolling(window=period).min()
+        if HAS_NUMBA:
+            # 上限・下限: 過去N期間の最高値・最低値（単調キューで1回の走査）
+            upper, lower = _rolling_max_min(
+                df['high'].to_numpy(dtype=np.float64),
+                df['low'].to_numpy(dtype=np.float64),
+                period
+            )
+            upper_band = pd.Series(upper, index=df.index)
+            lower_band = pd.Series(lower, index=df.index)
+        else:
+            # 上限: 過去N期間の最高値
+            upper_band = df['high'].rolling(window=period).max()
+            
+            # 下限: 過去N期間の最低値
+            lower_band = df['low'].rolling(window=period).min()
         
         # デバッグ: 計算結果の確認
         if upper_band.isna().all() or lower_band.isna().all():
-            print(f"ERROR: Donchian channels calculation failed (all NaN)")
+            logger.error("ERROR: Donchian channels calculation failed (all NaN)")
             return None, None
         
+        if key is not None:
+            self._channel_cache[key] = (upper_band, lower_band)
+            if len(self._channel_cache) > CHANNEL_CACHE_SIZE:
+                self._channel_cache.popitem(last=False)
+        
         return upper_band, lower_band
     
-    def should_entry(self, df):
+    def _last_two_bands(self, high, low, period=None):
         """
-        エントリー条件を満たすか判定
-        実線（close）がドンチャンラインを突破してクローズした時のみエントリー
+        前の足と現在足のドンチャンチャネルの値だけを末尾のスライスから計算
+        （全期間のrolling系列を作らない。バックテストなど系列全体が必要な場合は_calculate_donchian_channelsを使う）
         
         Args:
-            df: 価格データ（DataFrame）
+            high: 高値の配列（numpy.ndarray、period + 1本以上）
+            low: 安値の配列（numpy.ndarray、period + 1本以上）
+            period: 期間（Noneの場合はself.periodを使用）
         
         Returns:
-            dict: エントリーシグナル情報 または None
+            tuple: (prev_upper, prev_lower, current_upper, current_lower)
         """
-        if df is None or len(df) < self.period + 1:
-            return None
-        
-        # --- debug 出力（テスト時だけ有効に） ---
-        print("Donchian debug len:", len(df))
-        print("Donchian debug columns:", df.columns.tolist())
-        print("Donchian debug df head:")
-        print(df[['time', 'open', 'high', 'low', 'close']].head() if all(col in df.columns for col in ['time', 'open', 'high', 'low', 'close']) else df.head())
-        print("last times:", df['time'].iloc[-3:].tolist())
-        print("last closes:", df['close'].iloc[-3:].tolist())
+        if period is None:
+            period = self.period
         
-        # highとlowの存在確認
-        if 'high' not in df.columns or 'low' not in df.columns:
-            print(f"ERROR: 'high' or 'low' column missing! Available columns: {df.columns.tolist()}")
-            return None
+        return (
+            high[-period - 1:-1].max(),
+            low[-period - 1:-1].min(),
+            high[-period:].max(),
+            low[-period:].min(),
+        )
+    
+    def refresh_point(self):
+        """
+        シンボルのpointをMT5から取得し直す（ブローカーが桁数を変更した場合などに呼び出す）
+        MT5から取得できない場合はシンボル名から推測する
         
-        upper_band, lower_band = self._calculate_donchian_channels(df)
-        if upper_band is None or lower_band is None:
-            print("ERROR: Failed to calculate donchian channels")
-            return None
+        Returns:
+            float: シンボルのpoint
+        """
+        point = None
+        if mt5 is not None:
+            try:
+                info = mt5.symbol_info(self.symbol)
+                if info is not None and info.point > 0:
+                    point = info.point
+            except Exception:
+                point = None
         
-        # 前の足（-2）と現在足（-1）
-        prev_close = df['close'].iloc[-2]
-        prev_high = df['high'].iloc[-2]
-        prev_low = df['low'].iloc[-2]
-        prev_upper = upper_band.iloc[-2]
-        prev_lower = lower_band.iloc[-2]
-        current_close = df['close'].iloc[-1]
-        current_upper = upper_band.iloc[-1]
-        current_lower = lower_band.iloc[-1]
-        
-        # --- 許容誤差をシンボルの point ベースにする ---
-        try:
-            import MetaTrader5 as mt5
-            info = mt5.symbol_info(self.symbol)
-            if info is not None and hasattr(info, 'point') and info.point > 0:
-                point = info.point
-            else:
-                # シンボル名から推測
-                if 'JPY' in self.symbol:
-                    point = 0.001  # JPYペアは0.001
-                elif 'XAU' in self.symbol or 'GOLD' in self.symbol:
-                    point = 0.01  # ゴールドは0.01
-                else:
-                    point = 0.00001  # その他の通貨ペアは0.00001
-        except Exception as e:
+        if point is None:
             # シンボル名から推測
             if 'JPY' in self.symbol:
                 point = 0.001  # JPYペアは0.001
@@ -127,34 +221,208 @@ class DonchianStrategy:
             else:
                 point = 0.00001  # その他の通貨ペアは0.00001
         
-        tol = point * 0.5  # 誤差許容（0.5ティック分）
+        self.point = point
+        return point
+    
+    def _push_bar(self, index, high, low):
+        """
+        確定した足を単調キューに追加し、期間外になった足を取り除く
+        
+        Args:
+            index: 足の通し番号
+            high: 高値
+            low: 安値
+        """
+        hi = self._hi_deque
+        while hi and hi[-1][1] <= high:
+            hi.pop()
+        hi.append((index, high))
+        while hi[0][0] <= index - self.period:
+            hi.popleft()
+        
+        lo = self._lo_deque
+        while lo and lo[-1][1] >= low:
+            lo.pop()
+        lo.append((index, low))
+        while lo[0][0] <= index - self.period:
+            lo.popleft()
+    
+    def _update_channel_state(self, times, high, low):
+        """
+        単調キューを最新の確定足（-2）まで進める
+        前回の最新の確定足から続くデータであれば新しい足だけを追加し、それ以外は末尾から作り直す
+        
+        Args:
+            times: 時刻の配列（int64のナノ秒、時刻列がない場合はNone）
+            high: 高値の配列（numpy.ndarray）
+            low: 安値の配列（numpy.ndarray）
+        
+        Returns:
+            bool: 単調キューを使えるかどうか（時刻列がない・本数不足の場合はFalse）
+        """
+        period = self.period
+        if times is None or len(times) < period + 1:
+            return False
+        
+        last_closed = len(times) - 2
+        
+        start = None
+        if self._last_bar_time is not None:
+            # 前回の最新の確定足の位置を二分探索し、値も一致すれば続きのデータとみなす
+            j = int(np.searchsorted(times[:last_closed + 1], self._last_bar_time))
+            if (j <= last_closed and times[j] == self._last_bar_time
+                    and high[j] == self._last_bar_high and low[j] == self._last_bar_low):
+                if j == last_closed:
+                    return True
+                if last_closed - j <= period:
+                    start = j + 1
+        
+        if start is None:
+            # 初回・データが連続しない場合は、末尾のperiod本の確定足から作り直す
+            self._hi_deque.clear()
+            self._lo_deque.clear()
+            start = last_closed - period + 1
+        
+        for pos in range(start, last_closed + 1):
+            self._last_bar_index += 1
+            self._push_bar(self._last_bar_index, float(high[pos]), float(low[pos]))
+        
+        self._last_bar_time = times[last_closed]
+        self._last_bar_high = high[last_closed]
+        self._last_bar_low = low[last_closed]
+        return True
+    
+    def _channel_values(self, current_high, current_low):
+        """
+        単調キューから前の足と現在足のドンチャンチャネルの値を取得
+        
+        Args:
+            current_high: 現在足（形成中）の高値
+            current_low: 現在足（形成中）の安値
+        
+        Returns:
+            tuple: (prev_upper, prev_lower, current_upper, current_lower)
+        """
+        hi = self._hi_deque
+        lo = self._lo_deque
+        
+        # 前の足までのperiod本: キューの先頭
+        prev_upper = hi[0][1]
+        prev_lower = lo[0][1]
+        
+        # 現在足の期間は、確定足のうち最も古い1本を除いたものと現在足
+        # 単調キューの各要素は1つ前の要素より後ろの足の中での最大値（最小値）なので、
+        # 先頭が最も古い足であれば2番目の要素を使う
+        oldest = self._last_bar_index - self.period + 1
+        if hi[0][0] > oldest:
+            rest_high = hi[0][1]
+        else:
+            rest_high = hi[1][1] if len(hi) > 1 else -np.inf
+        if lo[0][0] > oldest:
+            rest_low = lo[0][1]
+        else:
+            rest_low = lo[1][1] if len(lo) > 1 else np.inf
         
-        # デバッグ出力: point値と許容誤差を表示
-        print(f"Donchian debug symbol: {self.symbol}, point: {point}, tolerance: {tol}")
-        print(f"prev_high: {prev_high}, prev_low: {prev_low}, prev_close: {prev_close}")
-        print(f"prev_upper: {prev_upper}, prev_lower: {prev_lower}")
+        return prev_upper, prev_lower, max(rest_high, current_high), min(rest_low, current_low)
+    
+    @staticmethod
+    def _signal_core(prev_high, prev_low, prev_upper, prev_lower, tol):
+        """
+        前の足の高値・安値とドンチャンチャネルからエントリー方向と損切りを判定
+        
+        Args:
+            prev_high: 前の足の高値
+            prev_low: 前の足の安値
+            prev_upper: 前の足までのperiod本の最高値
+            prev_lower: 前の足までのperiod本の最安値
+            tol: 許容誤差
         
-        side = None
+        Returns:
+            tuple: (side, sl)（シグナルなしの場合は(None, None)）
+        """
         # 前のローソク足のhighが上限を超えていたらロング（突破確認）
         # 許容誤差を考慮: prev_high >= prev_upper - tol でもOK
         if prev_high >= prev_upper - tol:
-            side = "buy"
-            print(f"Donchian BUY signal: prev_high({prev_high}) >= prev_upper({prev_upper}) - tol({tol})")
+            # SLは反対のドンチャンライン（currentではなくprevを使う選択肢もあり）
+            return "buy", float(prev_lower)
         # 前のローソク足のlowが下限を下回っていたらショート（突破確認）
         # 許容誤差を考慮: prev_low <= prev_lower + tol でもOK
-        elif prev_low <= prev_lower + tol:
-            side = "sell"
-            print(f"Donchian SELL signal: prev_low({prev_low}) <= prev_lower({prev_lower}) + tol({tol})")
+        if prev_low <= prev_lower + tol:
+            return "sell", float(prev_upper)
+        return None, None
+    
+    def should_entry(self, df):
+        """
+        エントリー条件を満たすか判定
+        実線（close）がドンチャンラインを突破してクローズした時のみエントリー
         
-        if side is None:
-            print(f"Donchian no signal: prev_high({prev_high}) not >= prev_upper({prev_upper}) - tol({tol}) and prev_low({prev_low}) not <= prev_lower({prev_lower}) + tol({tol})")
+        Args:
+            df: 価格データ（DataFrame または Bars）
+        
+        Returns:
+            dict: エントリーシグナル情報 または None
+        """
+        if df is None:
             return None
         
-        # SLは反対のドンチャンライン（currentではなくprevを使う選択肢もあり）
-        if side == "buy":
-            sl = float(prev_lower)
+        # 列ごとのnumpy配列に変換（同じDataFrameは他の戦略と変換結果を共有する）
+        bars = to_bars(df)
+        high = bars.high
+        low = bars.low
+        
+        # 列の有無と本数を先に確認し、満たさない場合は計算やログ出力の前に終了
+        if high is None or low is None:
+            logger.error("ERROR: 'high' or 'low' column missing! Available columns: %s",
+                         [name for name in bars._fields if getattr(bars, name) is not None])
+            return None
+        
+        period = self.period
+        if len(high) < period + 1:
+            return None
+        
+        # --- debug 出力（DEBUGレベルが有効な場合のみ組み立てる） ---
+        if logger.isEnabledFor(logging.DEBUG) and isinstance(df, pd.DataFrame):
+            ohlc = ['time', 'open', 'high', 'low', 'close']
+            logger.debug("Donchian debug len: %d", len(df))
+            logger.debug("Donchian debug columns: %s", df.columns.tolist())
+            logger.debug("Donchian debug df head:\n%s",
+                         df[ohlc].head() if all(col in df.columns for col in ohlc) else df.head())
+            if 'time' in df.columns:
+                logger.debug("last times: %s", df['time'].iloc[-3:].tolist())
+            logger.debug("last closes: %s", df['close'].iloc[-3:].tolist())
+        
+        # --- 許容誤差をシンボルの point ベースにする（pointは初期化時に取得済み） ---
+        point = self.point
+        tol = point * 0.5  # 誤差許容（0.5ティック分）
+        
+        if self._update_channel_state(bars.time, high, low):
+            # 確定足の単調キューから差分更新した値を使用
+            prev_upper, prev_lower, _, _ = self._channel_values(high[-1], low[-1])
         else:
-            sl = float(prev_upper)
+            # 判定には前の足の値しか使わないため、末尾のスライスから直接計算
+            prev_upper, prev_lower, _, _ = self._last_two_bands(high, low, period)
+        
+        # 前の足（-2）の高値・安値とチャネルから判定
+        prev_high = high[-2]
+        prev_low = low[-2]
+        side, sl = self._signal_core(prev_high, prev_low, prev_upper, prev_lower, tol)
+        
+        # デバッグ出力: 判定に使った値を表示
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Donchian debug symbol: %s, point: %s, tolerance: %s", self.symbol, point, tol)
+            logger.debug("prev_high: %s, prev_low: %s, prev_close: %s", prev_high, prev_low,
+                         bars.close[-2] if bars.close is not None else None)
+            logger.debug("prev_upper: %s, prev_lower: %s", prev_upper, prev_lower)
+            if side == "buy":
+                logger.debug("Donchian BUY signal: prev_high(%s) >= prev_upper(%s) - tol(%s)", prev_high, prev_upper, tol)
+            elif side == "sell":
+                logger.debug("Donchian SELL signal: prev_low(%s) <= prev_lower(%s) + tol(%s)", prev_low, prev_lower, tol)
+            else:
+                logger.debug("Donchian no signal: prev_high(%s) not >= prev_upper(%s) - tol(%s) and prev_low(%s) not <= prev_lower(%s) + tol(%s)",
+                             prev_high, prev_upper, tol, prev_low, prev_lower, tol)
+        
+        if side is None:
+            return None
         
         tp = None
         
@@ -167,67 +435,149 @@ class DonchianStrategy:
             "tp": tp
         }
     
+    @classmethod
+    def should_entry_batch(cls, arrays, points, period=10):
+        """
+        複数シンボルのエントリー判定を配列演算でまとめて行う
+        判定内容はshould_entryと同じ（前の足のhighが上限に達していればロング、lowが下限に達していればショート）
+        
+        Args:
+            arrays: シンボルごとの価格データ {symbol: {'high': ndarray, 'low': ndarray}}（末尾が現在足）
+            points: シンボルごとのpoint {symbol: point}
+            period: ドンチャン期間
+        
+        Returns:
+            dict: {symbol: エントリーシグナル情報 または None}（本数が足りないシンボルはNone）
+        """
+        signals = dict.fromkeys(arrays)
+        symbols = [
+            symbol for symbol, bars in arrays.items()
+            if len(bars['high']) >= period + 1 and len(bars['low']) >= period + 1
+        ]
+        if not symbols:
+            return signals
+        
+        # 各シンボルの末尾period + 1本を (シンボル数, period + 1) の配列にまとめる
+        highs = np.stack([np.asarray(arrays[symbol]['high'][-period - 1:], dtype=np.float64) for symbol in symbols])
+        lows = np.stack([np.asarray(arrays[symbol]['low'][-period - 1:], dtype=np.float64) for symbol in symbols])
+        tol = np.array([points[symbol] for symbol in symbols], dtype=np.float64) * 0.5  # 誤差許容（0.5ティック分）
+        
+        # 前の足までのperiod本の上限・下限と、前の足の高値・安値
+        prev_upper = highs[:, :-1].max(axis=1)
+        prev_lower = lows[:, :-1].min(axis=1)
+        prev_high = highs[:, -2]
+        prev_low = lows[:, -2]
+        
+        side_code, sl = cls._signal_codes(prev_high, prev_low, prev_upper, prev_lower, tol)
+        
+        for i in np.flatnonzero(side_code):
+            signals[symbols[i]] = {
+                "side": "buy" if side_code[i] > 0 else "sell",
+                "sl": float(sl[i]),
+                "tp": None
+            }
+        
+        return signals
+    
+    @staticmethod
+    def _signal_codes(prev_high, prev_low, prev_upper, prev_lower, tol):
+        """
+        _signal_coreの判定を配列演算で分岐なしに行う
+        
+        Args:
+            prev_high: 前の足の高値の配列
+            prev_low: 前の足の安値の配列
+            prev_upper: 前の足までのperiod本の最高値の配列
+            prev_lower: 前の足までのperiod本の最安値の配列
+            tol: 許容誤差（スカラーまたは配列）
+        
+        Returns:
+            tuple: (side_code, sl)（side_code: 1=ロング, -1=ショート, 0=シグナルなし（int8）、シグナルなしのslはNaN）
+        """
+        # ロングを優先し、ロングでない場合のみショート（_signal_coreのif/elifと同じ）
+        # NaN（チャネルが計算できない足）との比較はFalseになるためシグナルなしになる
+        buy = prev_high >= prev_upper - tol
+        sell = ~buy & (prev_low <= prev_lower + tol)
+        side_code = buy.astype(np.int8) - sell.astype(np.int8)
+        # SLは反対のドンチャンライン
+        sl = np.where(buy, prev_lower, np.where(sell, prev_upper, np.nan))
+        return side_code, sl
+    
+    def signal_series(self, df, period=None):
+        """
+        全期間の各足を現在足とした場合のエントリー判定をまとめて計算（バックテスト用）
+        各足の判定内容はshould_entryと同じ（前の足の高値・安値と前の足までのチャネルで判定）
+        
+        Args:
+            df: 価格データ（DataFrame）
+            period: 期間（Noneの場合はself.periodを使用）
+        
+        Returns:
+            tuple: (side_code, sl)（side_code: 1=ロング, -1=ショート, 0=シグナルなし）または (None, None)
+        """
+        upper_band, lower_band = self._calculate_donchian_channels(df, period)
+        if upper_band is None:
+            return None, None
+        
+        bars = to_bars(df)
+        side_code, sl = self._signal_codes(
+            bars.high, bars.low,
+            upper_band.to_numpy(dtype=np.float64), lower_band.to_numpy(dtype=np.float64),
+            self.point * 0.5
+        )
+        
+        # 各足の判定は1本前の確定足の値で行うため、1本後ろにずらす（最初の足はシグナルなし）
+        side_code = np.concatenate((np.zeros(1, dtype=np.int8), side_code[:-1]))
+        sl = np.concatenate(([np.nan], sl[:-1]))
+        return side_code, sl
+    
     def should_exit(self, position, df):
         """
         決済条件を満たすか判定
         4時間足12本クローズで決済
         
         Args:
-            position: ポジション情報（dict）
-            df: 価格データ（DataFrame）
+            position: ポジション情報（Positionまたはdict）
+            df: 価格データ（DataFrame または Bars）
         
         Returns:
             bool: 決済すべきかどうか
         """
-        if position is None or df is None or len(df) < 1:
+        if position is None or df is None:
+            return False
+        
+        # ローソク足の時刻をint64のナノ秒として参照（他の戦略と変換結果を共有する）
+        t = to_bars(df).time
+        if t is None or len(t) < 1:
             return False
         
+        # 取得したレートより前にエントリーしている場合は本数を数えられないため、12本以上経過したものとして決済
+        if entry_before_window(t, position):
+            logger.debug("[Donchian] エントリーが取得したレートより前のため決済: 最初のローソク足=%s",
+                         pd.Timestamp(int(t[0])))
+            return True
+        
         # エントリー時のローソク足時刻を取得
-        entry_candle_time = None
-        if isinstance(position, dict) and 'entry_candle_time' in position:
-            entry_candle_time = position['entry_candle_time']
-        
-        # エントリー時のローソク足時刻が記録されていない場合は、エントリー時刻から推定
-        if entry_candle_time is None:
-            entry_time = None
-            if isinstance(position, dict) and 'entry_time' in position:
-                entry_time = position['entry_time']
-            
-            if entry_time:
-                # エントリー時刻をdatetimeに変換
-                if isinstance(entry_time, str):
-                    entry_time = pd.to_datetime(entry_time)
-                elif isinstance(entry_time, pd.Timestamp):
-                    pass
-                elif isinstance(entry_time, datetime):
-                    entry_time = pd.to_datetime(entry_time)
-                else:
-                    entry_time = pd.to_datetime(entry_time)
-                
-                # エントリー時刻以前の最後のローソク足を探す
-                if 'time' in df.columns:
-                    df_times = pd.to_datetime(df['time'])
-                    before_entry = df_times[df_times <= entry_time]
-                    if len(before_entry) > 0:
-                        entry_candle_time = before_entry.iloc[-1]
+        # 記録されていない場合はエントリー時刻以前の最後のローソク足を二分探索で探し、ポジション情報に保存する
+        entry_candle_time = find_entry_candle(t, position)
+        entry_candle_ns = None
+        if entry_candle_time is not None:
+            entry_candle_ns = np.datetime64(entry_candle_time, 'ns').astype(np.int64)
         
         # エントリー時のローソク足時刻が取得できた場合、4時間足12本経過をチェック
-        if entry_candle_time is not None and 'time' in df.columns:
-            # 現在のローソク足の時刻を取得（最新のローソク足）
-            current_candle_time = pd.to_datetime(df['time'].iloc[-1])
-            
-            # エントリー時のローソク足から現在のローソク足までの本数を計算
-            # 4時間足なので、時刻の差分から本数を計算
-            time_diff = current_candle_time - entry_candle_time
-            # 4時間 = 4 * 60 * 60 = 14400秒
-            candles_elapsed = int(time_diff.total_seconds() / 14400)
+        if entry_candle_ns is not None:
+            # エントリー時のローソク足から現在のローソク足（最新のローソク足）までの本数を
+            # 時刻の差ではなく足の位置の差から数える（週末・休場で足がない時間は数えない）
+            candles_elapsed = len(t) - int(np.searchsorted(t, entry_candle_ns, side='right'))
             
             # デバッグ情報を出力
-            print(f"[Donchian] ローソク足経過チェック: エントリー時のローソク足={entry_candle_time}, 現在のローソク足={current_candle_time}, 経過本数={candles_elapsed}本")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[Donchian] ローソク足経過チェック: エントリー時のローソク足=%s, 現在のローソク足=%s, 経過本数=%d本",
+                             pd.Timestamp(int(entry_candle_ns)), pd.Timestamp(int(t[-1])), candles_elapsed)
             
             # 12本経過で決済
-            if candles_elapsed >= 12:
-                print(f"[Donchian] 4時間足12本経過により決済: 経過本数={candles_elapsed}本")
+            if candles_elapsed >= EXIT_MAX_BARS:
+                logger.debug("[Donchian] 4時間足12本経過により決済: 経過本数=%d本", candles_elapsed)
                 return True
         
         # 利食い設定はなしなので、12本経過のみで決済
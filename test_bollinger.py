@@ -7,6 +7,13 @@ from datetime import datetime, timedelta
 from src.strategies.bollinger import BollingerStrategy
 
 
+def _random_walk(rng, num_candles, base_price):
+    """ランダムウォークの価格データを生成（最初の足はbase_price）"""
+    changes = rng.normal(0, 0.001, num_candles)  # 小さなランダム変動
+    changes[0] = 0.0
+    return base_price + np.cumsum(changes)
+
+
 def generate_sample_data(num_candles=50, base_price=1.1000, trigger_entry=False):
     """テスト用のサンプルデータを生成
     
@@ -15,19 +22,18 @@ def generate_sample_data(num_candles=50, base_price=1.1000, trigger_entry=False)
         base_price: 基準価格
         trigger_entry: Trueの場合、エントリー条件を満たすデータを生成
     """
-    np.random.seed(42)
+    # グローバルな乱数状態を使わず、関数内で独立した乱数生成器を使う
+    rng = np.random.default_rng(42)
     
     # 時間データを生成
+    # 1時間ごとの時刻（datetimeのリストではなくint64の配列を持つDatetimeIndex）
     start_time = datetime.now() - timedelta(days=num_candles)
-    times = [start_time + timedelta(hours=i) for i in range(num_candles)]
+    times = pd.date_range(start=start_time, periods=num_candles, freq='h')
     
     if trigger_entry:
         # エントリー条件を満たすデータを生成
         # まず、通常のデータを生成
-        prices = [base_price]
-        for i in range(1, num_candles):
-            change = np.random.normal(0, 0.001)
-            prices.append(prices[-1] + change)
+        prices = _random_walk(rng, num_candles, base_price)
         
         # データフレームを作成
         df_temp = pd.DataFrame({
@@ -54,36 +60,26 @@ def generate_sample_data(num_candles=50, base_price=1.1000, trigger_entry=False)
             df_temp.loc[df_temp.index[-1], 'close'] = current_upper - 0.001
             
             # OHLCデータを生成
-            prices = df_temp['close'].tolist()
+            prices = df_temp['close'].to_numpy()
         else:
             # フォールバック: シンプルなアプローチ
-            prices = [base_price]
-            for i in range(1, num_candles):
-                change = np.random.normal(0, 0.001)
-                prices.append(prices[-1] + change)
+            prices = _random_walk(rng, num_candles, base_price)
     else:
         # 価格データを生成（ランダムウォーク）
-        prices = [base_price]
-        for i in range(1, num_candles):
-            change = np.random.normal(0, 0.001)  # 小さなランダム変動
-            prices.append(prices[-1] + change)
-    
-    # OHLCデータを生成
-    data = []
-    for i, (time, close) in enumerate(zip(times, prices)):
-        high = close + abs(np.random.normal(0, 0.0005))
-        low = close - abs(np.random.normal(0, 0.0005))
-        open_price = prices[i-1] if i > 0 else close
-        
-        data.append({
-            'time': time,
-            'open': open_price,
-            'high': high,
-            'low': low,
-            'close': close
-        })
-    
-    return pd.DataFrame(data)
+        prices = _random_walk(rng, num_candles, base_price)
+    
+    # OHLCデータを生成（始値は前の足の終値、最初の足は終値と同じ）
+    highs = prices + np.abs(rng.normal(0, 0.0005, num_candles))
+    lows = prices - np.abs(rng.normal(0, 0.0005, num_candles))
+    opens = np.concatenate(([prices[0]], prices[:-1]))
+    
+    return pd.DataFrame({
+        'time': times,
+        'open': opens,
+        'high': highs,
+        'low': lows,
+        'close': prices
+    })
 
 
 def test_entry_conditions():
@@ -134,15 +130,14 @@ def test_entry_conditions():
         print(f"  現在価格: {df_trigger['close'].iloc[-1]:.5f}")
         print(f"  前の価格: {df_trigger['close'].iloc[-2]:.5f}")
     
-    # デバッグ: 実際の条件を確認
-    upper_actual, middle_actual, lower_actual = strategy._calculate_bollinger_bands(df_trigger)
-    if upper_actual is not None and len(df_trigger) >= 2:
+    # デバッグ: 実際の条件を確認（上で計算したバンドを使い回す）
+    if upper is not None and len(df_trigger) >= 2:
         prev_close_actual = df_trigger['close'].iloc[-2]
         current_close_actual = df_trigger['close'].iloc[-1]
-        prev_upper_actual = upper_actual.iloc[-2]
-        prev_lower_actual = lower_actual.iloc[-2]
-        current_upper_actual = upper_actual.iloc[-1]
-        current_lower_actual = lower_actual.iloc[-1]
+        prev_upper_actual = upper.iloc[-2]
+        prev_lower_actual = lower.iloc[-2]
+        current_upper_actual = upper.iloc[-1]
+        current_lower_actual = lower.iloc[-1]
         
         print(f"\nデバッグ情報:")
         print(f"  前の足の終値: {prev_close_actual:.5f}")
@@ -214,7 +209,6 @@ def test_exit_conditions(entry_result=None, df=None):
     current_middle = middle.iloc[-1]
     
     # エグジット条件を満たすように新しいデータを追加
-    new_df = df.copy()
     if position['side'] == 'buy':
         # ロングの場合：価格を中央線より上に
         new_price = current_middle + 0.001
@@ -230,19 +224,21 @@ def test_exit_conditions(entry_result=None, df=None):
         'close': new_price
     }
     
-    new_df = pd.concat([new_df, pd.DataFrame([new_candle])], ignore_index=True)
+    # 元のデータはコピーせず、連結で1本追加した新しいDataFrameを1回だけ作る
+    new_df = pd.concat([df, pd.DataFrame([new_candle])], ignore_index=True)
     
     # エグジット判定
     should_exit = strategy.should_exit(position, new_df)
     
+    # 表示用の中央線（1回だけ計算）
+    new_middle = strategy._calculate_bollinger_bands(new_df)[1].iloc[-1]
+    
     if should_exit:
         print(f"\n[OK] エグジットシグナル検出!")
-        print(f"  現在価格: {new_df['close'].iloc[-1]:.5f}")
-        print(f"  中央線: {strategy._calculate_bollinger_bands(new_df)[1].iloc[-1]:.5f}")
     else:
         print(f"\n[NG] エグジット条件を満たしていません")
-        print(f"  現在価格: {new_df['close'].iloc[-1]:.5f}")
-        print(f"  中央線: {strategy._calculate_bollinger_bands(new_df)[1].iloc[-1]:.5f}")
+    print(f"  現在価格: {new_df['close'].iloc[-1]:.5f}")
+    print(f"  中央線: {new_middle:.5f}")
 
 
 def test_time_limit_exit(entry_result=None, df=None):
@@ -288,6 +284,74 @@ def test_time_limit_exit(entry_result=None, df=None):
         print(f"\n[NG] エグジット条件を満たしていません")
 
 
+def _check_rolling(strategy, times, close, high, low):
+    """
+    差分更新したローリング状態の値が、末尾のスライスからの再計算と一致するか確認
+    
+    Returns:
+        bool: 一致した場合True（合計の差分更新による丸め誤差は許容）
+    """
+    incremental = strategy._rolling_values(times, close, high, low)
+    prev_upper, prev_lower, current_middle = strategy._bollinger_tail(close)
+    current_atr = strategy._atr_tail(high, low, close)
+    return bool(np.allclose(incremental, (prev_upper, prev_lower, current_middle, current_atr), rtol=1e-9, atol=1e-12))
+
+
+def test_rolling_state():
+    """ローリング状態の差分更新のテスト（足の進行・複数本の進行・形成中の足の更新・作り直し）"""
+    print("\n" + "=" * 60)
+    print("ローリング状態の差分更新のテスト")
+    print("=" * 60)
+    
+    # 1回に取得するレートデータの本数（本番と同じく判定に必要な本数 + 余裕分）
+    window = 26
+    df = generate_sample_data(num_candles=200)
+    times = df['time'].to_numpy(dtype='datetime64[ns]').view('i8')
+    close = df['close'].to_numpy(dtype=np.float64)
+    high = df['high'].to_numpy(dtype=np.float64)
+    low = df['low'].to_numpy(dtype=np.float64)
+    
+    # 確定足が1本ずつ進む場合
+    strategy = BollingerStrategy(symbol="EURUSD")
+    for end in range(window, len(close) + 1):
+        start = end - window
+        assert _check_rolling(strategy, times[start:end], close[start:end], high[start:end], low[start:end]), f"end={end}"
+    print("[OK] 確定足が1本ずつ進む場合: 再計算と一致しました")
+    
+    # ポーリングの間に複数本の足が確定した場合
+    for step in (2, 3, 7, 30):
+        strategy = BollingerStrategy(symbol="EURUSD")
+        for end in range(window, len(close) + 1, step):
+            start = end - window
+            assert _check_rolling(strategy, times[start:end], close[start:end], high[start:end], low[start:end]), \
+                f"step={step}, end={end}"
+    print("[OK] 複数本の足が進んだ場合: 再計算と一致しました")
+    
+    # 形成中の足（最新の足）の値だけが更新される場合
+    strategy = BollingerStrategy(symbol="EURUSD")
+    for end in range(window, 80):
+        start = end - window
+        c = close[start:end].copy()
+        h = high[start:end].copy()
+        l = low[start:end].copy()
+        for delta in (0.0, 0.0005, -0.001, 0.01):
+            c[-1] = close[end - 1] + delta
+            h[-1] = max(high[end - 1], c[-1])
+            l[-1] = min(low[end - 1], c[-1])
+            assert _check_rolling(strategy, times[start:end], c, h, l), f"end={end}, delta={delta}"
+    print("[OK] 形成中の足の更新後: 再計算と一致しました")
+    
+    # データが連続しない場合（最新の確定足の修正・時刻の巻き戻し）は作り直す
+    strategy = BollingerStrategy(symbol="EURUSD")
+    assert _check_rolling(strategy, times[100:126], close[100:126], high[100:126], low[100:126])
+    c = close[101:127].copy()
+    c[-2] += 0.002
+    assert _check_rolling(strategy, times[101:127], c, high[101:127], low[101:127])
+    assert _check_rolling(strategy, times[102:128], close[102:128], high[102:128], low[102:128])
+    assert _check_rolling(strategy, times[40:66], close[40:66], high[40:66], low[40:66])
+    print("[OK] 作り直し後: 再計算と一致しました")
+
+
 def main():
     """メインテスト関数"""
     print("\n" + "=" * 60)
@@ -304,6 +368,9 @@ def main():
         # 72時間制限のテスト（エントリー結果を使用）
         test_time_limit_exit(entry_result, df)
         
+        # ローリング状態の差分更新のテスト
+        test_rolling_state()
+        
         print("\n" + "=" * 60)
         print("テスト完了")
         print("=" * 60)
@@ -0,0 +1,131 @@
+"""
+ドンチャンブレイクアウト戦略のテスト（単調キューによる差分更新と全体の再計算の一致を確認）
+"""
+import pandas as pd
+import numpy as np
+from src.strategies.donchian import DonchianStrategy
+
+
+# 1回に取得するレートデータの本数（本番と同じくドンチャン期間 + 決済の本数 + 余裕分）
+WINDOW = 18
+
+
+def generate_sample_data(num_candles=120, base_price=1.1000, seed=42):
+    """
+    テスト用の4時間足のサンプルデータを生成
+    
+    Args:
+        num_candles: ローソク足の数
+        base_price: 基準価格
+        seed: 乱数のシード
+    
+    Returns:
+        tuple: (時刻の配列（int64のナノ秒）, 高値の配列, 安値の配列)
+    """
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(start="2024-01-01", periods=num_candles, freq='4h')
+    prices = base_price + np.cumsum(rng.normal(0, 0.001, num_candles))
+    highs = prices + np.abs(rng.normal(0, 0.0005, num_candles))
+    lows = prices - np.abs(rng.normal(0, 0.0005, num_candles))
+    return times.values.view('i8'), highs, lows
+
+
+def _check_channel(strategy, times, high, low):
+    """
+    差分更新した単調キューの値が、末尾のスライスからの再計算と一致するか確認
+    
+    Returns:
+        bool: 一致した場合True
+    """
+    assert strategy._update_channel_state(times, high, low)
+    incremental = strategy._channel_values(float(high[-1]), float(low[-1]))
+    recomputed = strategy._last_two_bands(high, low)
+    return incremental == tuple(float(v) for v in recomputed)
+
+
+def test_bar_advances():
+    """確定足が1本ずつ進む場合"""
+    print("\n--- 確定足が1本ずつ進む場合のテスト ---")
+    strategy = DonchianStrategy(period=10)
+    times, high, low = generate_sample_data()
+    
+    for end in range(WINDOW, len(times) + 1):
+        start = end - WINDOW
+        assert _check_channel(strategy, times[start:end], high[start:end], low[start:end]), f"end={end}"
+    print("[OK] すべての足で再計算と一致しました")
+
+
+def test_skipped_bars():
+    """ポーリングの間に複数本の足が確定した場合（期間内・期間を超える場合）"""
+    print("\n--- 複数本の足が進んだ場合のテスト ---")
+    times, high, low = generate_sample_data()
+    
+    for step in (2, 3, 5, 10, 11, 15):
+        strategy = DonchianStrategy(period=10)
+        for end in range(WINDOW, len(times) + 1, step):
+            start = end - WINDOW
+            assert _check_channel(strategy, times[start:end], high[start:end], low[start:end]), f"step={step}, end={end}"
+    print("[OK] 進んだ本数に関係なく再計算と一致しました")
+
+
+def test_forming_bar_updates():
+    """形成中の足（最新の足）の高値・安値だけが更新される場合"""
+    print("\n--- 形成中の足の更新のテスト ---")
+    strategy = DonchianStrategy(period=10)
+    times, high, low = generate_sample_data()
+    
+    for end in range(WINDOW, 60):
+        start = end - WINDOW
+        t = times[start:end]
+        h = high[start:end].copy()
+        l = low[start:end].copy()
+        # 同じ足の中で高値の更新・安値の更新・チャネルの突破を順に起こす
+        for dh, dl in ((0.0, 0.0), (0.0005, 0.0), (0.0005, -0.0005), (0.01, -0.01)):
+            h[-1] = high[end - 1] + dh
+            l[-1] = low[end - 1] + dl
+            assert _check_channel(strategy, t, h, l), f"end={end}, dh={dh}, dl={dl}"
+    print("[OK] 形成中の足の更新後も再計算と一致しました")
+
+
+def test_window_resets():
+    """データが連続しない場合（過去の足の修正・時刻の巻き戻し・別のデータ）は作り直す"""
+    print("\n--- 単調キューの作り直しのテスト ---")
+    strategy = DonchianStrategy(period=10)
+    times, high, low = generate_sample_data()
+    
+    assert _check_channel(strategy, times[30:48], high[30:48], low[30:48])
+    
+    # 最新の確定足の値が修正された場合
+    h = high[31:49].copy()
+    h[-2] += 0.02
+    assert _check_channel(strategy, times[31:49], h, low[31:49])
+    assert _check_channel(strategy, times[32:50], high[32:50], low[32:50])
+    
+    # 時刻が巻き戻った場合
+    assert _check_channel(strategy, times[10:28], high[10:28], low[10:28])
+    
+    # 別のシードで生成したデータ（同じ時刻で価格が異なる）
+    _, other_high, other_low = generate_sample_data(seed=7)
+    assert _check_channel(strategy, times[10:28], other_high[10:28], other_low[10:28])
+    assert _check_channel(strategy, times[11:29], other_high[11:29], other_low[11:29])
+    print("[OK] 作り直し後も再計算と一致しました")
+
+
+def main():
+    """メインテスト関数"""
+    print("\n" + "=" * 60)
+    print("ドンチャンブレイクアウト戦略 差分更新テスト")
+    print("=" * 60)
+    
+    test_bar_advances()
+    test_skipped_bars()
+    test_forming_bar_updates()
+    test_window_resets()
+    
+    print("\n" + "=" * 60)
+    print("テスト完了")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
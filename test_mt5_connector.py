@@ -0,0 +1,349 @@
+"""
+MT5Connectorのテスト（MetaTrader5モジュールを差し替え、ターミナルなしで実行）
+"""
+import os
+import logging
+from contextlib import contextmanager
+from types import SimpleNamespace
+import src.engine.mt5_connector as connector_module
+from src.engine.mt5_connector import MT5Connector, DEFAULT_MAGIC
+
+
+# テストで使うサーバー時刻（エポック秒、最新のティックの時刻）
+TICK_TIME = 1700000000
+
+
+class StubMT5:
+    """テスト用のMetaTrader5モジュールの代わり（使用する関数と定数のみ）"""
+    
+    TRADE_ACTION_DEAL = 1
+    ORDER_TIME_GTC = 0
+    ORDER_FILLING_IOC = 1
+    ORDER_TYPE_BUY = 0
+    ORDER_TYPE_SELL = 1
+    TRADE_RETCODE_DONE = 10009
+    
+    def __init__(self, init_ok=True, login_ok=True, error=(1, "Success"), account=None,
+                 order_results=(), positions=()):
+        self.init_ok = init_ok
+        self.login_ok = login_ok
+        self.error = error
+        self.account = account
+        self.shutdown_called = False
+        # order_send・positions_getが呼び出しごとに返す値（最後の値は以降も返し続ける）
+        self.order_results = list(order_results)
+        self.positions = list(positions)
+        self.sent_requests = []
+        self.positions_calls = 0
+    
+    def initialize(self, path=None):
+        return self.init_ok
+    
+    def last_error(self):
+        return self.error
+    
+    def terminal_info(self):
+        return SimpleNamespace()
+    
+    def account_info(self):
+        return self.account
+    
+    def login(self, login, password, server):
+        return self.login_ok
+    
+    def shutdown(self):
+        self.shutdown_called = True
+    
+    def symbol_info(self, symbol):
+        return SimpleNamespace(digits=5, volume_min=0.01, volume_max=100.0, volume_step=0.01,
+                               trade_stops_level=0, point=0.00001)
+    
+    def symbol_info_tick(self, symbol):
+        return SimpleNamespace(ask=1.10020, bid=1.10000, time=TICK_TIME)
+    
+    def order_send(self, request):
+        self.sent_requests.append(dict(request))
+        return self.order_results.pop(0) if len(self.order_results) > 1 else self.order_results[0]
+    
+    def positions_get(self, **kwargs):
+        self.positions_calls += 1
+        return self.positions.pop(0) if len(self.positions) > 1 else self.positions[0]
+
+
+def _order_result(retcode, order=0):
+    """order_sendの戻り値"""
+    return SimpleNamespace(retcode=retcode, comment=f"retcode {retcode}", order=order)
+
+
+def _position(ticket, magic=DEFAULT_MAGIC, symbol="EURUSD", comment="", time=TICK_TIME - 3600):
+    """positions_getが返すポジション（既定では送信前から開いているポジション）"""
+    return SimpleNamespace(ticket=ticket, magic=magic, symbol=symbol, type=StubMT5.ORDER_TYPE_BUY,
+                           volume=0.01, profit=1.5, comment=comment, time=time)
+
+
+class _Records(logging.Handler):
+    """ログの出力内容を保持するハンドラー"""
+    
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+    
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+@contextmanager
+def _patched(**values):
+    """mt5_connectorモジュールの変数を一時的に差し替え、終了時に元に戻す"""
+    originals = {name: getattr(connector_module, name) for name in values}
+    for name, value in values.items():
+        setattr(connector_module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in originals.items():
+            setattr(connector_module, name, value)
+
+
+def _use_stub(stub, **values):
+    """MT5Connectorが使うMetaTrader5モジュールを一時的に差し替える（応答待ちをしない）"""
+    return _patched(mt5=stub, _mt5_resolved=True, INIT_READY_TIMEOUT=0.0, **values)
+
+
+def _connect_with_stub(stub):
+    """
+    差し替えたモジュールで接続し、結果とエラーログを返す
+    
+    Returns:
+        tuple: (connectの戻り値, エラーログのメッセージのリスト)
+    """
+    records = _Records()
+    connector_module.logger.addHandler(records)
+    try:
+        with _use_stub(stub):
+            connector = MT5Connector(login="12345678", password="secret", server="Broker-Demo")
+            result = connector.connect()
+    finally:
+        connector_module.logger.removeHandler(records)
+    return result, records.messages
+
+
+@contextmanager
+def _order_connector(stub):
+    """差し替えたモジュールで接続済みのMT5Connectorを作成（再試行の待機はしない）"""
+    with _use_stub(stub, ORDER_BASE_DELAY=0.0, ORDER_MAX_DELAY=0.0):
+        connector = MT5Connector(login="12345678", password="secret", server="Broker-Demo")
+        connector.connected = True
+        connector._order_tmpl = {"action": stub.TRADE_ACTION_DEAL, "type_filling": stub.ORDER_FILLING_IOC}
+        yield connector
+
+
+def _place_buy(connector):
+    """EURUSDの成行買い注文を送信"""
+    return connector.place_order("EURUSD", StubMT5.ORDER_TYPE_BUY, 0.01, sl=1.09000, tp=1.11000)
+
+
+def test_init_ipc_timeout():
+    """初期化時のIPC timeout（-10005）: 例外にならず、対処法を出力してFalseを返す"""
+    print("\n--- 初期化エラー（IPC timeout）のテスト ---")
+    result, messages = _connect_with_stub(StubMT5(init_ok=False, error=(-10005, "IPC timeout")))
+    
+    assert result is False
+    assert len(messages) == 1
+    assert "IPC timeout" in messages[0]
+    assert "12345678" in messages[0] and "******" in messages[0] and "Broker-Demo" in messages[0]
+    print("[OK] 対処法を出力して接続失敗を返しました")
+
+
+def test_init_unknown_error():
+    """初期化時の表にないエラー: エラーコードを含む既定の対処法を出力する"""
+    print("\n--- 初期化エラー（表にないエラーコード）のテスト ---")
+    result, messages = _connect_with_stub(StubMT5(init_ok=False, error=(-99, "Unknown")))
+    
+    assert result is False
+    assert "不明なエラーコード: -99" in messages[0]
+    print("[OK] 既定の対処法を出力しました")
+
+
+def test_login_invalid_params():
+    """ログイン時の引数エラー（-2）: 例外にならず、ログインの対処法を出力してFalseを返す"""
+    print("\n--- ログインエラー（-2）のテスト ---")
+    stub = StubMT5(login_ok=False, error=(-2, "Invalid params"))
+    result, messages = _connect_with_stub(stub)
+    
+    assert result is False
+    assert stub.shutdown_called
+    assert len(messages) == 1
+    assert "アカウント番号が間違っている" in messages[0]
+    # 初期化時のパスの対処法ではない
+    assert "現在のパス" not in messages[0]
+    print("[OK] ログインの対処法を出力して接続失敗を返しました")
+
+
+def test_login_ipc_timeout():
+    """ログイン時のIPC timeout（-10005）: ログイン情報を埋め込んだ対処法を出力する"""
+    print("\n--- ログインエラー（IPC timeout）のテスト ---")
+    with _patched(LOGIN_MAX_RETRIES=1):  # 再試行の待機をしない
+        result, messages = _connect_with_stub(StubMT5(login_ok=False, error=(-10005, "IPC timeout")))
+    
+    assert result is False
+    assert "IPC timeout" in messages[0] and "12345678" in messages[0]
+    print("[OK] 対処法を出力して接続失敗を返しました")
+
+
+def test_order_error_help():
+    """注文時のエラー: 注文の表の対処法を出力する"""
+    print("\n--- 注文エラーの対処法のテスト ---")
+    records = _Records()
+    connector_module.logger.addHandler(records)
+    try:
+        connector_module._log_mt5_error("注文エラー", 10027, "AutoTrading disabled by client",
+                                        connector_module._ORDER_ERROR_HELP)
+        connector_module._log_mt5_error("注文エラー", 10013, "Invalid request",
+                                        connector_module._ORDER_ERROR_HELP)
+    finally:
+        connector_module.logger.removeHandler(records)
+    
+    assert "自動取引を許可する" in records.messages[0]
+    assert "Invalid request" in records.messages[1]
+    print("[OK] 注文の対処法を出力しました")
+
+
+def test_order_retry_transient():
+    """一時的なエラー（リクオート）: 価格を取り直して再送し、成功を返す"""
+    print("\n--- 注文の再送（一時的なエラー）のテスト ---")
+    stub = StubMT5(account=SimpleNamespace(balance=10000.0),
+                   order_results=[_order_result(10004), _order_result(10009, order=501)],
+                   positions=[()])
+    with _order_connector(stub) as connector:
+        success, ticket, _ = _place_buy(connector)
+    
+    assert success is True and ticket == 501
+    assert len(stub.sent_requests) == 2
+    # 結果が不明なエラーが返らない限りポジションは取得しない
+    assert stub.positions_calls == 0
+    print("[OK] 再送して成功しました")
+
+
+def test_order_unrecoverable():
+    """回復しないエラー（自動取引の無効化）: 再送せずに失敗を返す"""
+    print("\n--- 注文の失敗（回復しないエラー）のテスト ---")
+    stub = StubMT5(account=SimpleNamespace(balance=10000.0),
+                   order_results=[_order_result(10027)], positions=[()])
+    with _order_connector(stub) as connector:
+        success, ticket, _ = _place_buy(connector)
+    
+    assert success is False and ticket is None
+    assert len(stub.sent_requests) == 1
+    print("[OK] 再送せずに失敗を返しました")
+
+
+def test_order_ambiguous_landed():
+    """結果が不明なエラー（タイムアウト）で約定していた場合: 再送せずに送信後に開かれたポジションを返す"""
+    print("\n--- 結果が不明な注文（約定済み）のテスト ---")
+    stub = StubMT5(account=SimpleNamespace(balance=10000.0),
+                   order_results=[_order_result(10012)],
+                   positions=[(_position(100), _position(101, time=TICK_TIME + 1))])
+    with _order_connector(stub) as connector:
+        success, ticket, _ = _place_buy(connector)
+    
+    assert success is True and ticket == 101
+    assert len(stub.sent_requests) == 1
+    assert stub.positions_calls == 1
+    print("[OK] 送信後に開かれたポジションを約定として返しました")
+
+
+def test_order_ambiguous_not_landed():
+    """結果が不明なエラーで約定していなかった場合: 再送せずに失敗を返す"""
+    print("\n--- 結果が不明な注文（未約定）のテスト ---")
+    stub = StubMT5(account=SimpleNamespace(balance=10000.0),
+                   order_results=[_order_result(10031)], positions=[(_position(100),)])
+    with _order_connector(stub) as connector:
+        success, ticket, _ = _place_buy(connector)
+    
+    assert success is False and ticket is None
+    assert len(stub.sent_requests) == 1
+    
+    # 送信後に開かれたポジションでも、コメント（戦略）やmagic numberが異なるものは約定と誤認しない
+    stub = StubMT5(account=SimpleNamespace(balance=10000.0),
+                   order_results=[_order_result(10012)],
+                   positions=[(_position(101, comment="Other entry", time=TICK_TIME + 1),
+                               _position(102, magic=DEFAULT_MAGIC + 1, time=TICK_TIME + 1))])
+    with _order_connector(stub) as connector:
+        success, ticket, _ = _place_buy(connector)
+    
+    assert success is False and ticket is None
+    print("[OK] 失敗を返しました")
+
+
+def test_order_ambiguous_disconnected():
+    """結果が不明なエラーの後にポジションを取得できない場合: 失敗ではなく不明（None）を返す"""
+    print("\n--- 結果が不明な注文（確認できない）のテスト ---")
+    stub = StubMT5(account=SimpleNamespace(balance=10000.0),
+                   order_results=[_order_result(10012)], positions=[None])
+    with _order_connector(stub) as connector:
+        success, ticket, result = _place_buy(connector)
+    
+    assert success is None and ticket is None
+    assert result.retcode == 10012
+    assert len(stub.sent_requests) == 1
+    print("[OK] 結果不明を返しました")
+
+
+def test_close_ambiguous_disconnected():
+    """決済で結果が不明なエラーの後にポジションを取得できない場合: 決済済みとは扱わない"""
+    print("\n--- 結果が不明な決済（確認できない）のテスト ---")
+    stub = StubMT5(account=SimpleNamespace(balance=10000.0),
+                   order_results=[_order_result(10012)], positions=[(_position(100),), None])
+    with _order_connector(stub) as connector:
+        success, profit, _ = connector.close_position(100)
+    
+    assert success is False and profit is None
+    print("[OK] 決済失敗を返しました")
+
+
+def test_pool_size_from_env():
+    """MT5_POOL_SIZEの値が不正な場合: 例外にならず既定値を使い、1未満は1にする"""
+    print("\n--- スレッドプールのサイズ（環境変数）のテスト ---")
+    original = os.environ.pop('MT5_POOL_SIZE', None)
+    try:
+        assert connector_module._pool_size_from_env() == connector_module.BATCH_MAX_WORKERS
+        os.environ['MT5_POOL_SIZE'] = "4"
+        assert connector_module._pool_size_from_env() == 4
+        os.environ['MT5_POOL_SIZE'] = "abc"
+        assert connector_module._pool_size_from_env() == connector_module.BATCH_MAX_WORKERS
+        os.environ['MT5_POOL_SIZE'] = "0"
+        assert connector_module._pool_size_from_env() == 1
+    finally:
+        os.environ.pop('MT5_POOL_SIZE', None)
+        if original is not None:
+            os.environ['MT5_POOL_SIZE'] = original
+    print("[OK] 不正な値でも有効なサイズを返しました")
+
+
+def main():
+    """メインテスト関数"""
+    print("\n" + "=" * 60)
+    print("MT5Connector テスト")
+    print("=" * 60)
+    
+    test_init_ipc_timeout()
+    test_init_unknown_error()
+    test_login_invalid_params()
+    test_login_ipc_timeout()
+    test_order_error_help()
+    test_order_retry_transient()
+    test_order_unrecoverable()
+    test_order_ambiguous_landed()
+    test_order_ambiguous_not_landed()
+    test_order_ambiguous_disconnected()
+    test_close_ambiguous_disconnected()
+    test_pool_size_from_env()
+    
+    print("\n" + "=" * 60)
+    print("テスト完了")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()